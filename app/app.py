@@ -1,32 +1,100 @@
 # app/app.py
 """
 Streamlit app for energy usage forecasting (recursive 168-hour forecast).
-- Shows processed df_hourly
+- Shows processed df_hourly over any range (downsampled via src/pyramid.py)
 - Runs recursive forecast using src/xg_model1.json
+- Or a direct multi-horizon forecast using src/xgb_direct.json (python -m src.direct)
+- Or a joint forecast of the target and its regressors using src/xgb_joint.json (python -m src.joint)
+- Optional P10/P50/P90 bands from Monte Carlo paths (src/probabilistic.py)
 """
 
+import time
+_RUN_START = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import numpy as np
 import os
 import sys
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import plotly.express as px
 import plotly.graph_objects as go
-from datetime import timedelta
 
-# project imports
-from src import preprocess, features, models, utils
+# project imports (xgboost is imported lazily by src.models when the model loads,
+# so the history view renders before it)
+from src import preprocess, models, forecast, hourly_cache, tracing, probabilistic
+from src.forecast_cache import ForecastCache
+from src.direct import DirectForecaster
+from src.joint import JointForecaster
+from src.feature_store import FeatureStore, FeatureMismatchError
+from src.pyramid import HistoryPyramid
 from src.config import PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH, DEFAULT_FORECAST_HORIZON
+from src.config import DIRECT_MODEL_JSON_PATH, DIRECT_FEATURES_JSON_PATH, JOINT_MODEL_JSON_PATH, JOINT_FEATURES_JSON_PATH
+
+_IMPORTS_DONE = time.perf_counter()
 
 st.set_page_config(page_title="Energy Usage Forecasting", layout="wide")
 
+# Process-wide resources: shared by every session and rerun. The stamp
+# argument (file mtime and size) makes a changed file load as a new entry.
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_hourly_resource(path, stamp):
+    return hourly_cache.load_hourly(path)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_model_resource(path, stamp):
+    return models.load_model_xgb(path)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_features_resource(path, stamp):
+    return models.load_features_list(path)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def feature_store_resource(data_path, data_stamp):
+    # Same stored features as training; only new hours are computed on a changed CSV
+    store = FeatureStore(data_path)
+    store.sync(load_hourly_resource(data_path, data_stamp), verbose=False)
+    return store
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def pyramid_resource(data_path, data_stamp):
+    # Day/week aggregates for the history chart; only new hours are aggregated on a changed CSV
+    pyramid = HistoryPyramid(data_path)
+    pyramid.sync(load_hourly_resource(data_path, data_stamp), verbose=False)
+    return pyramid
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def default_features_resource(data_path, data_stamp):
+    # Fallback feature list: every stored feature column except the target
+    store = feature_store_resource(data_path, data_stamp)
+    return [c for c in store.columns if c not in ('Global_active_power', 'datetime')]
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_direct_resource(path, stamp, features_stamp):
+    return DirectForecaster(models.load_model_xgb(path), models.load_features_list(DIRECT_FEATURES_JSON_PATH))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_joint_resource(path, stamp, features_stamp):
+    return JointForecaster(models.load_model_xgb(path), models.load_features_list(JOINT_FEATURES_JSON_PATH))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def residual_pool_resource(model_key, data_stamp, features_key, _model, _store):
+    # one-step residuals of the model on the last year of stored features
+    return probabilistic.fit_residuals(_model, list(features_key), store=_store, last_hours=24 * 365)
+
+@st.cache_resource(show_spinner=False)
+def startup_log():
+    # timings of the first run in this process (the cold start) and of the latest run
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def get_forecast_cache():
+    return ForecastCache()
+
 def load_or_prepare_data():
     if os.path.exists(PROCESSED_DATA_PATH):
-        df = pd.read_csv(PROCESSED_DATA_PATH, parse_dates=['datetime'], index_col='datetime')
+        df = load_hourly_resource(PROCESSED_DATA_PATH, hourly_cache.file_stamp(PROCESSED_DATA_PATH))
         # st.success("Loaded processed data.")
     else:
         with st.spinner("Preprocessing raw data (this may take a while)..."):
@@ -34,69 +102,28 @@ def load_or_prepare_data():
         st.success(f"Processed raw data and saved to {PROCESSED_DATA_PATH}")
     return df
 
-def recursive_forecast(df_history, model, features_list, horizon=DEFAULT_FORECAST_HORIZON):
-    # Adapted recursive forecasting that uses features functions
-    df_all = df_history.copy().sort_index()
-    df_all = features.add_time_features(df_all)
-    # Ensure some basic columns exist
-    for col in ['Sub_metering_1','Sub_metering_2','Sub_metering_3','Voltage','Global_intensity']:
-        if col not in df_all.columns:
-            df_all[col] = 0.0
-
-    # Precompute lags/rolls for history
-    df_all = features.add_lags(df_all, target='Global_active_power')
-    df_all = features.add_rollings(df_all, target='Global_active_power', windows=[24, 168])
-
-    future_index = pd.date_range(start=df_all.index[-1] + pd.Timedelta(hours=1), periods=horizon, freq='H')
-    preds = []
-
-    for t in future_index:
-        last = df_all.iloc[-1:].copy()
-        last.index = [t]
-
-        # update time features
-        last['hour'] = t.hour; last['day'] = t.day; last['weekday'] = t.weekday()
-        last['month'] = t.month; last['is_weekend'] = int(t.weekday()>=5)
-
-        # regressors: try to use last week's same hour if available
-        for col in ['Sub_metering_1','Sub_metering_2','Sub_metering_3','Voltage','Global_intensity']:
-            if col in df_all.columns and len(df_all) >= 168:
-                last[col] = df_all[col].iloc[-168 + (len(preds) % 168)]
-            elif col in df_all.columns:
-                last[col] = df_all[col].iloc[-1]
-            else:
-                last[col] = 0.0
-
-        # update lags
-        last['lag168'] = df_all['Global_active_power'].iloc[-168] if len(df_all) >= 168 else df_all['Global_active_power'].iloc[-1]
-        last['lag24'] = df_all['Global_active_power'].iloc[-24] if len(df_all) >= 24 else df_all['Global_active_power'].iloc[-1]
-        last['lag1'] = df_all['Global_active_power'].iloc[-1]
-
-        # update rolling 24 mean/std
-        window_vals = list(df_all['Global_active_power'].iloc[-23:]) + [last['lag1'].values[0]]
-        last['roll24_mean'] = np.mean(window_vals)
-        last['roll24_std'] = np.std(window_vals)
-
-        # ensure all model features exist
-        for f in features_list:
-            if f not in last.columns:
-                last[f] = 0.0
-
-        X_row = last[features_list].iloc[0].values.reshape(1, -1)
-        X_row = np.nan_to_num(X_row, nan=0.0, posinf=0.0, neginf=0.0)
-
-        yhat = model.predict(X_row)[0]
-        preds.append(yhat)
-
-        new_row = last.copy()
-        new_row['Global_active_power'] = yhat
-        new_row['Other_Consumption'] = max(0.0, new_row['Global_active_power'] - (
-            new_row.get('Sub_metering_1',0.0) + new_row.get('Sub_metering_2',0.0) + new_row.get('Sub_metering_3',0.0)
-        ))
-        df_all = pd.concat([df_all, new_row])
-
-    forecast_series = pd.Series(preds, index=future_index, name='Global_active_power_forecast')
-    return forecast_series, df_all
+def record_first_render():
+    """Time from script start to the history chart, shown in the sidebar."""
+    now = time.perf_counter()
+    run = {'imports_ms': (_IMPORTS_DONE - _RUN_START) * 1000, 'first_render_ms': (now - _RUN_START) * 1000}
+    log = startup_log()
+    log.setdefault('cold', run)
+    log['latest'] = run
+    st.sidebar.caption(f"Cold start: first render {log['cold']['first_render_ms']:.0f} ms "
+                       f"(imports {log['cold']['imports_ms']:.0f} ms) · this run {run['first_render_ms']:.0f} ms")
+
+def profiling_panel():
+    with st.expander("Profiling", expanded=False):
+        stats = tracing.snapshot()
+        if not stats:
+            st.caption("No traced calls yet. Run a forecast with profiling on.")
+            return
+        st.dataframe(pd.DataFrame.from_dict(stats, orient='index').rename_axis('stage'), width="stretch")
+        col_json, col_prom, col_reset = st.columns(3)
+        col_json.download_button("Export JSON", data=tracing.to_json(), file_name="trace.json", mime="application/json")
+        col_prom.download_button("Export Prometheus", data=tracing.to_prometheus(), file_name="trace.prom", mime="text/plain")
+        if col_reset.button("Reset"):
+            tracing.reset()
 
 def main():
     st.title("⚡ Energy Usage Forecasting")
@@ -105,14 +132,25 @@ def main():
     with st.sidebar:
         st.header("Controls")
         horizon_hours = st.slider("Forecast Horizon (Hours)", min_value=24, max_value=720, value=DEFAULT_FORECAST_HORIZON, step=24)
+        forecast_mode = st.radio("Forecast Mode", ["Recursive", "Direct", "Joint"], horizontal=True,
+                                 help="Recursive predicts hour by hour; Direct predicts the whole horizon at once (needs `python -m src.direct`); "
+                                      "Joint also forecasts the sub-meters, voltage and intensity (needs `python -m src.joint`).")
+        show_bands = st.checkbox("Uncertainty bands (P10–P90)", value=False, disabled=forecast_mode != "Recursive",
+                                 help="Monte Carlo paths with bootstrapped residuals, advanced together.")
+        n_paths = st.select_slider("Sample paths", options=[50, 100, 200, 500, 1000], value=probabilistic.DEFAULT_PATHS,
+                                   disabled=not show_bands)
         run_forecast = st.button("Predict Future Consumption", type="primary")
         
         st.divider()
         st.write(f"**Model Path:** `{os.path.basename(MODEL_JSON_PATH)}`")
+        profile = st.toggle("Profile stages", value=tracing.is_enabled(), help="Time CSV load, features, DMatrix, inference and chart rendering.")
+        track_memory = st.checkbox("Track allocations", value=False, disabled=not profile)
+        tracing.enable(profile, memory=track_memory)
 
     # Load Data
     try:
-        df = load_or_prepare_data()
+        with tracing.span('app.load_data'):
+            df = load_or_prepare_data()
     except Exception as e:
         st.error(f"Error loading data: {e}")
         st.stop()
@@ -127,39 +165,100 @@ def main():
         st.metric("Date Range End", df.index.max().strftime('%Y-%m-%d'))
     
     st.subheader("Historical Data Visualization")
-    # Plotly Chart for History (Last 30 days default to avoid lag)
-    df_plot = df.tail(24 * 30).reset_index()
-    fig_hist = px.line(df_plot, x='datetime', y='Global_active_power', title='Global Active Power (Last 30 Days)')
-    st.plotly_chart(fig_hist, width="stretch")
+    # Any range can be shown: the pyramid keeps the chart under a fixed point budget
+    first, last = df.index.min().to_pydatetime(), df.index.max().to_pydatetime()
+    default_start = max(first, (df.index.max() - pd.Timedelta(days=30)).to_pydatetime())
+    visible = st.slider("Visible range", min_value=first, max_value=last, value=(default_start, last),
+                        step=pd.Timedelta(hours=1).to_pytimedelta(), format="YYYY-MM-DD")
+    with tracing.span('app.render_history_chart'):
+        pyramid = pyramid_resource(PROCESSED_DATA_PATH, hourly_cache.file_stamp(PROCESSED_DATA_PATH))
+        line, envelope, level = pyramid.view(*visible)
+        fig_hist = go.Figure()
+        if envelope is not None:
+            fig_hist.add_trace(go.Scatter(x=envelope.index, y=envelope['max'], mode='lines', line=dict(width=0, shape='hv'),
+                                          showlegend=False, hoverinfo='skip'))
+            fig_hist.add_trace(go.Scatter(x=envelope.index, y=envelope['min'], mode='lines', line=dict(width=0, shape='hv'),
+                                          fill='tonexty', fillcolor='rgba(31, 119, 180, 0.2)', name=f'{level.capitalize()} min–max'))
+        fig_hist.add_trace(go.Scatter(x=line.index, y=line.values, mode='lines', name='Global_active_power',
+                                      line=dict(color='#1f77b4', width=1)))
+        span_days = (visible[1] - visible[0]).days
+        detail = 'hourly' if envelope is None else f'{len(line):,} LTTB points, {level} min–max'
+        fig_hist.update_layout(title=f"Global Active Power ({span_days} days, {detail})", xaxis_title="datetime",
+                               yaxis_title="Global_active_power")
+        st.plotly_chart(fig_hist, width="stretch")
+    record_first_render()
 
-    # Load Model
     # Load Model
     model = None
+    model_key = None
     try:
-        model = models.load_model_xgb(MODEL_JSON_PATH)
+        stamp = hourly_cache.file_stamp(MODEL_JSON_PATH)
+        model_key = f"{MODEL_JSON_PATH}:{stamp[0]}:{stamp[1]}"
+        model = load_model_resource(MODEL_JSON_PATH, stamp)
     except Exception as e:
         st.error(f"Could not load model assets. Ensure `{MODEL_JSON_PATH}` exists. Error: {e}")
 
     # Load Features
     features_list = []
     try:
-        features_list = models.load_features_list(FEATURES_JSON_PATH)
+        features_list = load_features_resource(FEATURES_JSON_PATH, hourly_cache.file_stamp(FEATURES_JSON_PATH))
         st.sidebar.success("Model & Features Loaded Successfully")
     except Exception:
         # Fallback: derive a sensible feature list using the features module
-        # st.warning("Features list not found. Using default feature set derived from data.")
         try:
-             # Create a dummy dataframe with all potential columns to see what we get
-             df_temp = features.build_features(df.head(200)) # Use a subset for speed
-             features_list = df_temp.drop(columns=['Global_active_power','datetime'] , errors='ignore').columns.tolist()
+             features_list = default_features_resource(PROCESSED_DATA_PATH, hourly_cache.file_stamp(PROCESSED_DATA_PATH))
              st.sidebar.warning("Using default features")
         except Exception as e:
              st.error(f"Failed to generate default features: {e}")
 
-    if run_forecast and model and features_list:
-        with st.spinner(f"Generating recursive forecast for {horizon_hours} hours..."):
-            forecast_series, df_all_forecast = recursive_forecast(df, model, features_list, horizon=horizon_hours)
+    # The model's feature list must match the stored features, or nothing is forecast
+    store = None
+    if features_list and os.path.exists(PROCESSED_DATA_PATH):
+        try:
+            store = feature_store_resource(PROCESSED_DATA_PATH, hourly_cache.file_stamp(PROCESSED_DATA_PATH))
+            store.check(features_list, model)
+        except FeatureMismatchError as e:
+            st.error(f"Model and feature store disagree: {e}")
+            features_list, store = [], None
+        except Exception as e:
+            st.sidebar.warning(f"Feature store unavailable, computing features on the fly: {e}")
+            store = None
 
+    forecast_series = None
+    df_future = None
+    bands = None
+    if run_forecast and forecast_mode == "Direct":
+        try:
+            direct_forecaster = load_direct_resource(DIRECT_MODEL_JSON_PATH, hourly_cache.file_stamp(DIRECT_MODEL_JSON_PATH),
+                                                     hourly_cache.file_stamp(DIRECT_FEATURES_JSON_PATH))
+        except Exception as e:
+            st.error(f"Could not load the direct model. Train it with `python -m src.direct`. Error: {e}")
+        else:
+            with st.spinner(f"Generating direct forecast for {horizon_hours} hours..."), tracing.span('app.forecast'):
+                forecast_series = direct_forecaster.forecast(df, horizon_hours)
+    elif run_forecast and forecast_mode == "Joint":
+        try:
+            joint_forecaster = load_joint_resource(JOINT_MODEL_JSON_PATH, hourly_cache.file_stamp(JOINT_MODEL_JSON_PATH),
+                                                   hourly_cache.file_stamp(JOINT_FEATURES_JSON_PATH))
+        except Exception as e:
+            st.error(f"Could not load the joint model. Train it with `python -m src.joint`. Error: {e}")
+        else:
+            with st.spinner(f"Generating joint forecast for {horizon_hours} hours..."), tracing.span('app.forecast'):
+                forecast_series, df_future = joint_forecaster.forecast(df, horizon_hours)
+    elif run_forecast and model and features_list:
+        with st.spinner(f"Generating recursive forecast for {horizon_hours} hours..."), tracing.span('app.forecast'):
+            # shorter horizons are sliced from a cached run, longer ones resume its recursion
+            forecaster = forecast.RecursiveForecaster(model, features_list, store=store)
+            forecast_series, df_future = get_forecast_cache().forecast(forecaster, df, horizon_hours, model_key)
+        if show_bands and store is not None:
+            with st.spinner(f"Sampling {n_paths} forecast paths..."), tracing.span('app.forecast_bands'):
+                pool = residual_pool_resource(model_key, hourly_cache.file_stamp(PROCESSED_DATA_PATH),
+                                              tuple(features_list), model, store)
+                bands = probabilistic.ProbabilisticForecaster(forecaster, pool, n_paths=n_paths).forecast(df, horizon_hours)
+        elif show_bands:
+            st.warning("Uncertainty bands need the feature store for the processed data.")
+
+    if forecast_series is not None:
         st.success("Forecast generated successfully!")
         
         # Combine history (last 7 days) and forecast for visualization
@@ -167,16 +266,31 @@ def main():
         
         hist_trace = go.Scatter(x=history_snippet.index, y=history_snippet, mode='lines', name='Historical (Last 7 Days)', line=dict(color='blue'))
         forecast_trace = go.Scatter(x=forecast_series.index, y=forecast_series, mode='lines', name='Forecast', line=dict(color='red', dash='dash'))
+        traces = [hist_trace]
+        if bands is not None:
+            traces += [
+                go.Scatter(x=bands.index, y=bands['p90'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                go.Scatter(x=bands.index, y=bands['p10'], mode='lines', line=dict(width=0), fill='tonexty',
+                           fillcolor='rgba(255, 0, 0, 0.15)', name='P10–P90'),
+                go.Scatter(x=bands.index, y=bands['p50'], mode='lines', name='P50', line=dict(color='darkred', width=1)),
+            ]
+        traces.append(forecast_trace)
         
-        fig_forecast = go.Figure(data=[hist_trace, forecast_trace])
-        fig_forecast.update_layout(title=f"Energy Consumption Forecast (Next {horizon_hours} Hours)", xaxis_title="Time", yaxis_title="Global Active Power (kW)")
-        st.plotly_chart(fig_forecast, width="stretch")
+        with tracing.span('app.render_forecast_chart'):
+            fig_forecast = go.Figure(data=traces)
+            fig_forecast.update_layout(title=f"Energy Consumption Forecast (Next {horizon_hours} Hours)", xaxis_title="Time", yaxis_title="Global Active Power (kW)")
+            st.plotly_chart(fig_forecast, width="stretch")
 
         # Data Preview & Download
         col_preview, col_download = st.columns([2, 1])
         with col_preview:
             st.subheader("Forecast Data")
             preview = forecast_series.reset_index().rename(columns={'index':'datetime','Global_active_power_forecast':'forecast'})
+            if bands is not None:
+                preview = preview.join(bands[['p10', 'p50', 'p90']].reset_index(drop=True))
+            if forecast_mode == "Joint" and df_future is not None:
+                regressors = ['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3', 'Voltage', 'Global_intensity', 'Other_Consumption']
+                preview = preview.join(df_future[regressors].reset_index(drop=True))
             st.dataframe(preview, height=200)
         
         with col_download:
@@ -184,5 +298,8 @@ def main():
             csv = preview.to_csv(index=False)
             st.download_button("Download CSV", data=csv, file_name=f"forecast_{horizon_hours}h.csv", mime="text/csv")
 
+    if tracing.is_enabled():
+        profiling_panel()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,323 @@
+# benchmarks/bench.py
+"""
+Performance benchmarks for every pipeline stage, on synthetic data.
+
+Stages: preprocess_to_hourly (minute rows), build_features, XGBWrapper.predict
+and the 168-hour recursive forecast (lockstep batch_forecast for
+multi-household sizes). predict_xgboost / predict_numpy compare the DMatrix
+path with src/tree_eval.py at 1, 32 and 4096 rows per call. forecast_paths runs
+the Monte Carlo forecast (src/probabilistic.py) with 1, 100 and 1000 paths;
+its series_hours/s should grow with the path count. Each stage is timed on every size it applies to:
+wall time (best of ``repeat``), throughput and peak traced memory
+(tracemalloc, one extra run; allocations inside xgboost are not traced).
+
+Results are written as JSON. ``--compare`` checks them against a stored
+baseline and exits non-zero when a stage is slower, or uses more memory,
+than the baseline by more than the given threshold.
+
+Run:
+    python -m benchmarks.bench --out benchmarks/results/latest.json
+    python -m benchmarks.bench --sizes 1m --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench --compare benchmarks/baseline.json --threshold 0.25
+"""
+
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+from src import features, forecast, models, preprocess, probabilistic
+from src.tree_eval import CompiledTrees
+
+SIZES = {
+    '1m': dict(days=30, households=1),
+    '4y': dict(days=4 * 365, households=1),
+    '100hh': dict(days=30, households=100),
+    # rows per predict call for the backend microbenchmarks
+    'b1': dict(batch=1),
+    'b32': dict(batch=32),
+    'b4096': dict(batch=4096),
+    # sample paths for the probabilistic forecast
+    'k1': dict(paths=1),
+    'k100': dict(paths=100),
+    'k1000': dict(paths=1000),
+}
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+MEM_SLACK_MB = 1.0    # peak-memory changes smaller than this are noise, not regressions
+FORECAST_HORIZON = 168
+MINUTE_COLUMNS = preprocess.RAW_COLUMNS[2:]
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def make_minutes(days, start='2007-01-01', seed=0, missing=0.01):
+    """Minute-level frame shaped like read_raw output, with daily seasonality and NaN gaps."""
+    rng = np.random.default_rng(seed)
+    n = days * 24 * 60
+    idx = pd.date_range(start=start, periods=n, freq='min')
+    hour = idx.hour.to_numpy() + idx.minute.to_numpy() / 60.0
+    gap = np.clip(1.0 + 0.8 * np.sin(2 * np.pi * hour / 24) + 0.5 * rng.standard_normal(n), 0.08, None)
+    df = pd.DataFrame({
+        'datetime': idx,
+        'Global_active_power': gap,
+        'Global_reactive_power': 0.1 * rng.random(n),
+        'Voltage': 240 + 2 * rng.standard_normal(n),
+        'Global_intensity': gap * 4.2,
+        'Sub_metering_1': rng.integers(0, 3, n).astype(float),
+        'Sub_metering_2': rng.integers(0, 3, n).astype(float),
+        'Sub_metering_3': rng.integers(0, 20, n).astype(float),
+    })
+    holes = rng.random(n) < missing
+    df.loc[holes, MINUTE_COLUMNS] = np.nan
+    return df
+
+def make_hourly(days, start='2007-01-01', seed=0):
+    """Hourly frame with the columns of df_hourly.csv (generated directly, not resampled)."""
+    rng = np.random.default_rng(seed)
+    n = days * 24
+    idx = pd.date_range(start=start, periods=n, freq='h', name='datetime')
+    hour = idx.hour.to_numpy()
+    gap = 1.0 + 0.8 * np.sin(2 * np.pi * hour / 24) + 0.3 * rng.random(n)
+    df = pd.DataFrame({
+        'Global_active_power': gap,
+        'Global_reactive_power': 0.1 * rng.random(n),
+        'Voltage': 240 + rng.random(n),
+        'Global_intensity': gap * 4.2,
+        'Sub_metering_1': 0.1 * rng.random(n),
+        'Sub_metering_2': 0.1 * rng.random(n),
+        'Sub_metering_3': 0.3 * rng.random(n),
+    }, index=idx)
+    subs = df[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].sum(axis=1)
+    df['Other_Consumption'] = (df['Global_active_power'] - subs).clip(lower=0)
+    return df
+
+def make_households(days, households, seed=0):
+    """{household_id: hourly frame}, one independent seed per household."""
+    return {f'hh{i:03d}': make_hourly(days, seed=seed + i) for i in range(households)}
+
+# ---------------------------------------------------------------------------
+# Stages: setup(size, ctx) -> (args, items); run(*args)
+# ---------------------------------------------------------------------------
+
+def _model(ctx):
+    """Small booster trained once per suite run on the default feature list."""
+    if 'model' not in ctx:
+        df = features.build_features(make_hourly(60, seed=99))
+        feature_list = features.default_feature_list(df)
+        reg = XGBRegressor(n_estimators=100, max_depth=6, verbosity=0, random_state=0)
+        reg.fit(df[feature_list].values, df['Global_active_power'].values)
+        ctx['model'] = models.XGBWrapper(reg.get_booster())
+        ctx['features_list'] = feature_list
+    return ctx['model'], ctx['features_list']
+
+def _histories(size, ctx):
+    key = ('hourly', size['days'], size['households'])
+    if key not in ctx:
+        ctx[key] = make_households(size['days'], size['households'])
+    return ctx[key]
+
+def _setup_preprocess(size, ctx):
+    df = make_minutes(size['days'])
+    return (df,), len(df)
+
+def _run_preprocess(df):
+    preprocess.preprocess_to_hourly(df.copy())
+
+def _setup_features(size, ctx):
+    frames = list(_histories(size, ctx).values())
+    return (frames,), sum(len(f) for f in frames)
+
+def _run_features(frames):
+    for df in frames:
+        features.build_features(df)
+
+def _setup_predict(size, ctx):
+    model, feature_list = _model(ctx)
+    frames = [features.build_features(df) for df in _histories(size, ctx).values()]
+    X = np.concatenate([f[feature_list].to_numpy(dtype=np.float64) for f in frames])
+    return (model, X), len(X)
+
+def _run_predict(model, X):
+    model.predict(X)
+
+def _setup_predict_batch(size, ctx, backend):
+    model, feature_list = _model(ctx)
+    if backend == 'numpy':
+        model = CompiledTrees(model.booster)
+    if 'batch_X' not in ctx:
+        ctx['batch_X'] = features.build_features(make_hourly(200, seed=7))[feature_list].to_numpy(dtype=np.float64)
+    X = ctx['batch_X'][:size.get('batch', 32)]
+    # time enough calls that the smallest batch is not just timer noise
+    calls = max(1, 4096 // len(X))
+    return (model, X, calls), len(X) * calls
+
+def _run_predict_batch(model, X, calls):
+    for _ in range(calls):
+        model.predict(X)
+
+def _setup_forecast(size, ctx):
+    model, feature_list = _model(ctx)
+    histories = _histories(size, ctx)
+    return (model, feature_list, histories), len(histories) * FORECAST_HORIZON
+
+def _run_forecast(model, feature_list, histories):
+    if len(histories) == 1:
+        forecast.recursive_forecast(next(iter(histories.values())), model, feature_list, FORECAST_HORIZON)
+    else:
+        forecast.batch_forecast(histories, model, feature_list, FORECAST_HORIZON)
+
+def _setup_paths(size, ctx):
+    model, feature_list = _model(ctx)
+    history = _histories({'days': size.get('days', 30), 'households': 1}, ctx)['hh000']
+    pool = probabilistic.fit_residuals(model, feature_list, history)
+    pf = probabilistic.ProbabilisticForecaster(forecast.RecursiveForecaster(model, feature_list), pool,
+                                               n_paths=size.get('paths', 10))
+    return (pf, history), pf.n_paths * FORECAST_HORIZON
+
+def _run_paths(pf, history):
+    pf.forecast(history, FORECAST_HORIZON)
+
+# name -> (setup, run, unit of throughput, sizes it runs on)
+STAGES = {
+    'preprocess_to_hourly': (_setup_preprocess, _run_preprocess, 'minute_rows', ('1m', '4y')),
+    'build_features': (_setup_features, _run_features, 'hourly_rows', ('1m', '4y', '100hh')),
+    'predict': (_setup_predict, _run_predict, 'rows', ('1m', '4y', '100hh')),
+    'recursive_forecast': (_setup_forecast, _run_forecast, 'series_hours', ('1m', '100hh')),
+    'predict_xgboost': (lambda size, ctx: _setup_predict_batch(size, ctx, 'xgboost'), _run_predict_batch,
+                        'rows', ('b1', 'b32', 'b4096')),
+    'predict_numpy': (lambda size, ctx: _setup_predict_batch(size, ctx, 'numpy'), _run_predict_batch,
+                      'rows', ('b1', 'b32', 'b4096')),
+    'forecast_paths': (_setup_paths, _run_paths, 'series_hours', ('k1', 'k100', 'k1000')),
+}
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(run, args, items, repeat=DEFAULT_REPEAT):
+    """Best-of-``repeat`` wall time, throughput and traced peak memory of ``run(*args)``."""
+    run(*args)   # warm-up: imports, caches, first-call allocations
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return {
+        'seconds': best,
+        'median_seconds': float(np.median(times)),
+        'items': int(items),
+        'items_per_s': items / max(best, 1e-12),
+        'peak_mb': peak / 2 ** 20,
+    }
+
+def run_suite(sizes=None, stages=None, repeat=DEFAULT_REPEAT, size_specs=SIZES, verbose=True):
+    """Run every selected stage on every selected size it applies to; returns the results document."""
+    sizes = list(sizes or size_specs)
+    stages = list(stages or STAGES)
+    ctx = {}
+    results = {}
+    for stage in stages:
+        setup, run, unit, applies = STAGES[stage]
+        for size in sizes:
+            if size not in applies and size in SIZES:
+                continue
+            args, items = setup(size_specs[size], ctx)
+            res = measure(run, args, items, repeat=repeat)
+            res['unit'] = unit
+            results[f'{stage}/{size}'] = res
+            if verbose:
+                print(f"{stage + '/' + size:32s} {res['seconds'] * 1000:10.2f} ms "
+                      f"{res['items_per_s']:14,.0f} {unit}/s {res['peak_mb']:9.1f} MB")
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, mem_threshold=None):
+    """Regressions of ``current`` against ``baseline`` as readable lines (empty if none).
+
+    A stage regresses when its best time exceeds the baseline by more than
+    ``threshold`` (0.25 = 25 % slower), or its peak memory by more than
+    ``mem_threshold`` (defaults to ``threshold``) and MEM_SLACK_MB. Stages missing from either
+    side are not compared.
+    """
+    mem_threshold = threshold if mem_threshold is None else mem_threshold
+    problems = []
+    for key, base in baseline['results'].items():
+        cur = current['results'].get(key)
+        if cur is None:
+            continue
+        ratio = cur['seconds'] / max(base['seconds'], 1e-12)
+        if ratio > 1 + threshold:
+            problems.append(f"{key}: {cur['seconds'] * 1000:.2f} ms vs baseline "
+                            f"{base['seconds'] * 1000:.2f} ms ({ratio - 1:+.0%})")
+        if cur['peak_mb'] - base['peak_mb'] > MEM_SLACK_MB:
+            mem_ratio = cur['peak_mb'] / max(base['peak_mb'], 1e-12)
+            if mem_ratio > 1 + mem_threshold:
+                problems.append(f"{key}: peak {cur['peak_mb']:.1f} MB vs baseline "
+                                f"{base['peak_mb']:.1f} MB ({mem_ratio - 1:+.0%})")
+    return problems
+
+def save(doc, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(doc, f, indent=2)
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the forecasting pipeline stages.")
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f"comma-separated subset of {list(SIZES)}")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"comma-separated subset of {list(STAGES)}")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--out', default=None, help="write results JSON here")
+    parser.add_argument('--save-baseline', default=None, help="write results JSON as the new baseline")
+    parser.add_argument('--compare', default=None, help="baseline JSON to check against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument('--mem-threshold', type=float, default=None, help="allowed peak-memory growth")
+    args = parser.parse_args(argv)
+
+    doc = run_suite(args.sizes.split(','), args.stages.split(','), repeat=args.repeat)
+    for path in (args.out, args.save_baseline):
+        if path:
+            save(doc, path)
+            print(f"Wrote {path}")
+    if args.compare:
+        problems = compare(doc, load(args.compare), args.threshold, args.mem_threshold)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        if problems:
+            return 1
+        print(f"No stage regressed beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# scripts/loadgen.py
+"""
+Load generator for the forecast service (src/service.py).
+
+Fires ``--requests`` forecast requests from ``--concurrency`` client threads,
+then prints client-side latency percentiles, throughput and the server's
+/metrics. Start the service first:
+
+    python -m src.service --port 8600
+    python scripts/loadgen.py --url http://127.0.0.1:8600 --requests 2000 --concurrency 64
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+import numpy as np
+
+def fetch(url, timeout=60):
+    with urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+def run(url, n_requests, concurrency, horizon, meters):
+    def one(i):
+        meter = meters[i % len(meters)]
+        start = time.perf_counter()
+        try:
+            fetch(f"{url}/forecast?meter_id={meter}&horizon={horizon}")
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    lat = np.array([r[0] for r in results]) * 1000.0
+    errors = sum(not r[1] for r in results)
+    return {
+        'requests': n_requests,
+        'errors': errors,
+        'concurrency': concurrency,
+        'horizon': horizon,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(n_requests / elapsed, 1),
+        'series_hours_per_s': round(n_requests * horizon / elapsed, 1),
+        'latency_ms': {p: round(float(np.percentile(lat, q)), 2) for p, q in (('p50', 50), ('p90', 90), ('p99', 99))},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the forecast service.")
+    parser.add_argument('--url', default='http://127.0.0.1:8600')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--horizon', type=int, default=168)
+    parser.add_argument('--meters', default=None, help="comma-separated meter ids (default: the service's only meter)")
+    args = parser.parse_args()
+
+    meters = args.meters.split(',') if args.meters else ['default']
+    fetch(f"{args.url}/health")
+    print("client:", json.dumps(run(args.url, args.requests, args.concurrency, args.horizon, meters), indent=2))
+    print("server:", json.dumps(fetch(f"{args.url}/metrics"), indent=2))
+
+if __name__ == "__main__":
+    main()
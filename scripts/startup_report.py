@@ -0,0 +1,84 @@
+# scripts/startup_report.py
+"""
+Startup-time report for the Streamlit app.
+
+Every measurement runs in a fresh interpreter so nothing is already imported
+or cached:
+- import time of each heavy module the app (or src) may pull in
+- a cold app run (streamlit.testing AppTest: the whole script, imports and
+  resource loads included) followed by a warm rerun in the same process,
+  plus the app's own time-to-first-render caption
+
+    python scripts/startup_report.py [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MODULES = ['pandas', 'plotly.express', 'streamlit', 'matplotlib.pyplot', 'xgboost',
+           'src.preprocess', 'src.features', 'src.models', 'src.forecast', 'src.direct']
+
+_IMPORT_SNIPPET = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'ms': (time.perf_counter() - start) * 1000,
+                  'heavy': sorted(m for m in ('xgboost', 'matplotlib', 'sklearn') if m in sys.modules)}}))
+"""
+
+_APP_SNIPPET = """
+import sys, time, json, warnings
+warnings.simplefilter('ignore')
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+warm = time.perf_counter() - start
+render = [c.value for c in at.sidebar.caption if c.value.startswith('Cold start')]
+print(json.dumps({{'cold_run_ms': cold * 1000, 'warm_rerun_ms': warm * 1000, 'first_render': render[:1],
+                  'exceptions': [str(e.value) for e in at.exception]}}))
+"""
+
+def _run(snippet):
+    out = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, cwd=ROOT)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "subprocess failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def import_times(modules=MODULES):
+    return {m: _run(_IMPORT_SNIPPET.format(root=ROOT, module=m)) for m in modules}
+
+def app_times(app_path=os.path.join(ROOT, 'app', 'app.py')):
+    return _run(_APP_SNIPPET.format(root=ROOT, app=app_path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app cold-start time.")
+    parser.add_argument('--json', default=None, help="also write the report to this file")
+    parser.add_argument('--skip-app', action='store_true', help="only time module imports")
+    args = parser.parse_args()
+
+    report = {'imports': import_times()}
+    for module, r in report['imports'].items():
+        heavy = f"  (loads {', '.join(r['heavy'])})" if r['heavy'] else ''
+        print(f"import {module:20s} {r['ms']:8.1f} ms{heavy}")
+    if not args.skip_app:
+        report['app'] = app_times()
+        print(f"app cold run  {report['app']['cold_run_ms']:8.1f} ms")
+        print(f"app warm rerun {report['app']['warm_rerun_ms']:7.1f} ms")
+        for line in report['app']['first_render']:
+            print(line)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
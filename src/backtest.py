@@ -0,0 +1,178 @@
+# src/backtest.py
+"""
+Walk-forward backtesting of the recursive forecaster over df_hourly.
+
+Forecasts are made from many rolling origins: every origin sees only the
+hours before it and is scored against the ``horizon`` hours after it.
+Origins are split into chunks and run on a process pool. Each worker loads
+the booster once (pool initializer) and memory-maps the dense hourly store
+(src/dense.py). The history therefore sits once in the OS page cache and is
+shared read-only by every worker; tasks only carry origin positions on the
+hourly grid, never frames, and an origin's history and actuals are slices of
+that grid, so any origin costs the same and gaps never shift the hours
+scored. Inside a chunk all origins are forecast in lockstep with
+RecursiveForecaster.init_batch/advance.
+
+Errors are aggregated by horizon step and by hour of day (RMSE, MAPE).
+
+Run: python -m src.backtest --horizon 24 --origins 500 --workers 8
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src import dense, models
+from src.forecast import RecursiveForecaster, TARGET, WEEK
+from src.config import PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH
+
+# hours handed to init_batch per origin: enough for lag168 and the 168-hour
+# rolling window, so the seeded row equals the one built from the full history
+CONTEXT = 2 * WEEK
+DEFAULT_CHUNK = 32
+
+_worker = {}
+
+def _init_worker(data_path, model_path, features_list, nthread=1):
+    store = dense.load_dense(data_path)
+    model = models.load_model_xgb(model_path)
+    if nthread:
+        model.booster.set_param({'nthread': nthread})   # one core per worker; the pool supplies the parallelism
+    _worker['store'] = store
+    _worker['forecaster'] = RecursiveForecaster(model, features_list)
+
+def _run_chunk(args):
+    """Forecast ``horizon`` hours from each origin grid position; returns (positions, preds)."""
+    positions, horizon = args
+    store, fc = _worker['store'], _worker['forecaster']
+    state = fc.init_batch({p: store.rows(p - CONTEXT, p) for p in positions})
+    _, preds, _ = fc.advance(state, horizon)
+    return np.asarray(positions), preds
+
+def origin_positions(n_hours, horizon, n_origins=None, step=24, valid=None):
+    """Grid positions of forecast origins (first forecast hour), oldest first.
+
+    Every origin has CONTEXT hours of history and ``horizon`` hours of actuals.
+    With ``n_origins`` the origins are spread evenly, else one every ``step`` hours.
+    With a ``valid`` mask, origins whose last history hour is missing are dropped.
+    """
+    first, last = CONTEXT, n_hours - horizon
+    if last < first:
+        raise ValueError(f"Need at least {CONTEXT + horizon} hours, got {n_hours}.")
+    if n_origins:
+        positions = np.unique(np.linspace(first, last, n_origins).astype(int))
+    else:
+        positions = np.arange(first, last + 1, step)
+    return positions if valid is None else positions[np.asarray(valid)[positions - 1]]
+
+def summarize(times, preds, actuals):
+    """RMSE/MAPE by horizon step and by target hour of day, plus overall figures.
+
+    All inputs have shape (n_origins, horizon). Hours whose actual is NaN (missing
+    from the data) are not scored; MAPE also skips hours whose actual is 0.
+    """
+    err = preds - actuals
+    sq = err ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(actuals > 0, np.abs(err) / actuals, np.nan)
+
+    def table(groups):
+        frame = pd.DataFrame({'group': groups.ravel(), 'sq': sq.ravel(), 'ape': ape.ravel()})
+        g = frame.groupby('group')
+        return pd.DataFrame({
+            'rmse': np.sqrt(g['sq'].mean()),
+            'mape': 100 * g['ape'].mean(),
+            'n': g['sq'].count(),
+        })
+
+    steps = np.broadcast_to(np.arange(1, preds.shape[1] + 1), preds.shape)
+    by_step = table(steps).rename_axis('step')
+    by_hour = table(pd.DatetimeIndex(times.ravel()).hour.to_numpy()).rename_axis('hour')
+    overall = {'rmse': float(np.sqrt(np.nanmean(sq))), 'mape': float(100 * np.nanmean(ape)),
+               'origins': int(preds.shape[0]), 'horizon': int(preds.shape[1])}
+    return {'by_step': by_step, 'by_hour': by_hour, 'overall': overall}
+
+def run_backtest(data_path=PROCESSED_DATA_PATH, model_path=MODEL_JSON_PATH, features_list=None,
+                 horizon=24, n_origins=None, step=24, n_workers=None, chunk=DEFAULT_CHUNK, verbose=True):
+    """Walk-forward backtest; returns summarize() output plus 'seconds' and 'workers'.
+
+    'times' and 'residuals' (actual - forecast, shape (n_origins, horizon)) are
+    included for residual bootstraps (src/probabilistic.py).
+    """
+    if features_list is None:
+        features_list = models.load_features_list(FEATURES_JSON_PATH)
+    store = dense.load_dense(data_path)   # also builds the shared store before workers start
+    positions = origin_positions(len(store), horizon, n_origins, step, valid=store.valid)
+    tasks = [(positions[i:i + chunk], horizon) for i in range(0, len(positions), chunk)]
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(tasks)))
+
+    start = time.perf_counter()
+    if n_workers == 1:
+        _init_worker(data_path, model_path, features_list, nthread=None)
+        try:
+            results = [_run_chunk(t) for t in tasks]
+        finally:
+            _worker.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(data_path, model_path, features_list)) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    seconds = time.perf_counter() - start
+
+    pos = np.concatenate([p for p, _ in results])
+    preds = np.concatenate([p for _, p in results])
+    window = pos[:, None] + np.arange(horizon)[None, :]
+    actuals = np.asarray(store.column(TARGET))[window]
+    times = store.times(window)
+    result = summarize(times, preds, actuals)
+    result['seconds'] = seconds
+    result['workers'] = n_workers
+    result['times'] = times
+    result['residuals'] = actuals - preds
+    if verbose:
+        o = result['overall']
+        print(f"Backtest: {o['origins']} origins x {horizon}h on {n_workers} worker(s) in {seconds:.1f}s "
+              f"| RMSE {o['rmse']:.4f} | MAPE {o['mape']:.2f}%")
+    return result
+
+def scaling_report(worker_counts, **kwargs):
+    """Run the same backtest on each worker count and print the speedup over the first."""
+    rows = []
+    for n in worker_counts:
+        res = run_backtest(n_workers=n, verbose=False, **kwargs)
+        rows.append({'workers': res['workers'], 'seconds': res['seconds']})
+    report = pd.DataFrame(rows).set_index('workers')
+    report['speedup'] = report['seconds'].iloc[0] / report['seconds']
+    print(report)
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the recursive forecaster.")
+    parser.add_argument('--data', default=PROCESSED_DATA_PATH)
+    parser.add_argument('--model', default=MODEL_JSON_PATH)
+    parser.add_argument('--features', default=FEATURES_JSON_PATH)
+    parser.add_argument('--horizon', type=int, default=24)
+    parser.add_argument('--origins', type=int, default=None, help="spread this many origins evenly")
+    parser.add_argument('--step', type=int, default=24, help="hours between origins when --origins is unset")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help="origins per task")
+    parser.add_argument('--scaling', action='store_true', help="time 1, 2, 4, ... workers up to --workers")
+    parser.add_argument('--out', default=None, help="directory for by_step.csv and by_hour.csv")
+    args = parser.parse_args()
+
+    kwargs = dict(data_path=args.data, model_path=args.model,
+                  features_list=models.load_features_list(args.features), horizon=args.horizon,
+                  n_origins=args.origins, step=args.step, chunk=args.chunk)
+    if args.scaling:
+        top = args.workers or os.cpu_count() or 1
+        scaling_report(sorted({min(2 ** i, top) for i in range(top.bit_length() + 1)}), **kwargs)
+    else:
+        res = run_backtest(n_workers=args.workers, **kwargs)
+        print(res['by_step'].to_string())
+        print(res['by_hour'].to_string())
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            res['by_step'].to_csv(os.path.join(args.out, 'by_step.csv'))
+            res['by_hour'].to_csv(os.path.join(args.out, 'by_hour.csv'))
@@ -14,6 +14,18 @@ SRC_DIR = os.path.join(PROJECT_ROOT, "src")
 MODEL_JSON_PATH = os.path.join(SRC_DIR, "xgb_model1.json")
 MODEL_JOBLIB_PATH = os.path.join(SRC_DIR, "xgboost_model1.pkl")
 FEATURES_JSON_PATH = os.path.join(SRC_DIR, "features_list.json")
+TRAIN_REPORT_PATH = os.path.join(DATA_DIR, "processed", "train_report.json")
+TRAIN_CACHE_DIR = os.path.join(DATA_DIR, "processed", "train_cache")
 
 # Forecasting Defaults
 DEFAULT_FORECAST_HORIZON = 168
+
+# Direct (multi-horizon) model
+DIRECT_MODEL_JSON_PATH = os.path.join(SRC_DIR, "xgb_direct.json")
+DIRECT_MODEL_JOBLIB_PATH = os.path.join(SRC_DIR, "xgb_direct.pkl")
+DIRECT_FEATURES_JSON_PATH = os.path.join(SRC_DIR, "direct_features_list.json")
+
+# Joint (multi-target) model
+JOINT_MODEL_JSON_PATH = os.path.join(SRC_DIR, "xgb_joint.json")
+JOINT_MODEL_JOBLIB_PATH = os.path.join(SRC_DIR, "xgb_joint.pkl")
+JOINT_FEATURES_JSON_PATH = os.path.join(SRC_DIR, "joint_features_list.json")
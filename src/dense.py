@@ -0,0 +1,254 @@
+# src/dense.py
+"""
+Dense hourly store: one slot per hour between the first and last hour of the
+data, addressed by epoch-hour offset, with a validity bitmap for the hours
+preprocess_to_hourly dropped.
+
+Layout (directory next to the CSV, e.g. data/processed/df_hourly.dense/):
+- values.npy  float64, shape (n_columns, n_hours), NaN in missing hours
+- valid.bits  np.packbits of the per-hour validity mask
+- meta.json   columns, first epoch hour, hour count and the CSV fingerprint
+
+Hour ``ts`` lives at position ``epoch_hour(ts) - start_hour``, so a timestamp
+lookup, a lag (position - lag) or a window (a slice) is plain array indexing
+instead of a DatetimeIndex search, and a lag after a gap still lands on the
+right hour. features.add_lags / add_rollings use the same grid, and
+backtest.py slices origin histories and actuals from a memory-mapped store.
+
+Run: python -m src.dense   (builds the store and times timestamp lookups)
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src import hourly_cache, tracing
+from src.hourly_cache import _NS_PER_HOUR, epoch_hours
+from src.config import PROCESSED_DATA_PATH
+
+DENSE_VERSION = 1
+
+def grid_positions(index):
+    """(positions, n_hours): grid slot of every row of a sorted hourly index."""
+    hours = epoch_hours(index)
+    if len(hours) == 0:
+        return hours, 0
+    pos = hours - hours[0]
+    if (np.diff(pos) <= 0).any():
+        raise ValueError("Hourly index must be sorted and unique.")
+    return pos, int(pos[-1]) + 1
+
+def to_grid(values, positions, n_hours):
+    """Scatter row ``values`` onto an ``n_hours`` grid, NaN in the slots no row fills."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == n_hours:     # no gaps: the rows already are the grid
+        return values
+    grid = np.full((n_hours,) + values.shape[1:], np.nan)
+    grid[positions] = values
+    return grid
+
+def fill_gaps(values):
+    """Linearly interpolate NaN hours between valid ones (leading/trailing NaN kept)."""
+    values = np.array(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values
+    idx = np.arange(len(values))
+    first, last = idx[valid][0], idx[valid][-1]
+    inner = ~valid & (idx > first) & (idx < last)
+    values[inner] = np.interp(idx[inner], idx[valid], values[valid])
+    return values
+
+def tail_grid(df, columns, hours, fill=0.0):
+    """(hours, n_columns) grid of the last ``hours`` hours ending at the last row of ``df``.
+
+    Interior gaps are interpolated (fill_gaps), hours before the first row
+    stay NaN and columns missing from ``df`` are ``fill``. Costs O(hours)
+    whatever the history length.
+    """
+    tail = df.iloc[-hours:]
+    grid = np.full((hours, len(columns)), np.nan)
+    if len(tail) == 0:
+        return grid
+    h = epoch_hours(tail.index)
+    slot = h - (h[-1] - hours + 1)
+    keep = slot >= 0
+    col_idx = tail.columns.get_indexer(columns)
+    present = [k for k in range(len(columns)) if col_idx[k] >= 0]
+    values = tail.iloc[:, col_idx[present]].to_numpy(dtype=np.float64)[keep]
+    grid[slot[keep][:, None], present] = values
+    grid[slot[keep][0]:, [k for k in range(len(columns)) if k not in present]] = fill
+    if len(values) < hours - slot[keep][0]:      # interior gaps
+        for k in present:
+            grid[:, k] = fill_gaps(grid[:, k])
+    return grid
+
+def span_hours(index):
+    """Hours from the first to the last timestamp of a sorted index, inclusive."""
+    if len(index) == 0:
+        return 0
+    return int((pd.Timestamp(index[-1]).value - pd.Timestamp(index[0]).value) // _NS_PER_HOUR) + 1
+
+class DenseHourly:
+    """Hourly columns on a gap-free grid with a validity mask."""
+
+    def __init__(self, start_hour, values, valid, columns):
+        self.start_hour = int(start_hour)
+        self.values = values            # (n_columns, n_hours)
+        self.valid = valid              # bool (n_hours,)
+        self.columns = list(columns)
+        self._col = {c: i for i, c in enumerate(self.columns)}
+        self._frame = None              # valid rows as a frame, built by rows() on first use
+        self._rank = None
+
+    @classmethod
+    def from_frame(cls, df_hourly):
+        df = df_hourly.sort_index()
+        pos, n = grid_positions(df.index)
+        values = np.full((len(df.columns), n), np.nan)
+        values[:, pos] = df.to_numpy(dtype=np.float64).T
+        valid = np.zeros(n, dtype=bool)
+        valid[pos] = True
+        start = epoch_hours(df.index[:1])[0] if len(df) else 0
+        return cls(start, values, valid, [str(c) for c in df.columns])
+
+    def __len__(self):
+        return len(self.valid)
+
+    @property
+    def start(self):
+        return pd.Timestamp(self.start_hour * _NS_PER_HOUR)
+
+    @property
+    def end(self):
+        return pd.Timestamp((self.start_hour + len(self) - 1) * _NS_PER_HOUR)
+
+    @property
+    def n_missing(self):
+        return int(len(self) - self.valid.sum())
+
+    def times(self, positions):
+        """datetime64 hour of each grid position (any shape)."""
+        return ((np.asarray(positions, dtype=np.int64) + self.start_hour) * _NS_PER_HOUR).view('datetime64[ns]')
+
+    def index(self):
+        """DatetimeIndex of every grid hour."""
+        return pd.DatetimeIndex(self.times(np.arange(len(self))), name='datetime')
+
+    def pos(self, ts):
+        """Grid position of hour ``ts`` (may lie outside [0, len) for hours outside the data)."""
+        return int(pd.Timestamp(ts).value // _NS_PER_HOUR) - self.start_hour
+
+    def column(self, name):
+        """Dense values of one column, NaN in missing hours (a view, do not modify)."""
+        return self.values[self._col[name]]
+
+    def at(self, ts, column):
+        """Value of ``column`` at hour ``ts``; NaN for missing or out-of-range hours."""
+        p = self.pos(ts)
+        return float(self.values[self._col[column], p]) if 0 <= p < len(self) else np.nan
+
+    def lag(self, column, lag, positions=None):
+        """Value ``lag`` hours before each position (all grid hours by default); NaN before the start."""
+        col = self.column(column)
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions)
+        src = positions - lag
+        ok = (src >= 0) & (src < len(self))
+        return np.where(ok, col[np.clip(src, 0, len(self) - 1)], np.nan)
+
+    def window(self, end, hours):
+        """Frame of the ``hours`` grid hours ending at ``end`` (inclusive), valid rows only.
+
+        This is the history a forecast made at ``end`` sees; slicing is by
+        position, so it costs the same for any origin.
+        """
+        hi = self.pos(end) + 1
+        return self.rows(hi - hours, hi)
+
+    def rows(self, lo, hi):
+        """Frame of the valid hours at grid positions [lo, hi) (a slice, do not modify).
+
+        The valid-rows frame is built once; the slice bounds come from the
+        running count of valid hours, so no per-call search or frame build.
+        """
+        lo, hi = max(0, lo), max(0, min(hi, len(self)))
+        if self._frame is None:
+            keep = np.flatnonzero(self.valid)
+            self._frame = pd.DataFrame(self.values[:, keep].T, columns=self.columns,
+                                       index=pd.DatetimeIndex(self.times(keep), name='datetime'))
+            self._rank = np.r_[0, np.cumsum(self.valid)]
+        return self._frame.iloc[self._rank[lo]:self._rank[max(lo, hi)]]
+
+    def to_frame(self, valid_only=True):
+        """Hourly frame: the valid hours (the original rows), or every grid hour with NaN gaps."""
+        if not valid_only:
+            return pd.DataFrame(self.values.T, index=self.index(), columns=self.columns)
+        return self.rows(0, len(self)).copy()
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, path, fingerprint=None):
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, 'values.npy'), np.ascontiguousarray(self.values))
+        np.packbits(self.valid).tofile(os.path.join(tmp, 'valid.bits'))
+        meta = {'version': DENSE_VERSION, 'columns': self.columns, 'start_hour': self.start_hour,
+                'n_hours': len(self), 'source_fingerprint': fingerprint}
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-mapped store saved by save(); returns (store, meta)."""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != DENSE_VERSION:
+            raise ValueError(f"Unsupported dense store version in {path}")
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+        bits = np.fromfile(os.path.join(path, 'valid.bits'), dtype=np.uint8)
+        valid = np.unpackbits(bits, count=meta['n_hours']).astype(bool)
+        return cls(meta['start_hour'], values, valid, meta['columns']), meta
+
+def dense_dir(csv_path=PROCESSED_DATA_PATH):
+    return os.path.splitext(csv_path)[0] + '.dense'
+
+@tracing.traced()
+def load_dense(csv_path=PROCESSED_DATA_PATH):
+    """Dense store of the processed CSV, rebuilt from load_hourly() when the CSV changed."""
+    path = dense_dir(csv_path)
+    fingerprint = hourly_cache.file_fingerprint(csv_path)
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        try:
+            store, meta = DenseHourly.load(path)
+            if meta.get('source_fingerprint') == fingerprint:
+                return store
+        except (OSError, ValueError):
+            pass
+    store = DenseHourly.from_frame(hourly_cache.load_hourly(csv_path))
+    try:
+        store.save(path, fingerprint)
+    except OSError as e:
+        print(f"Could not write dense store for {csv_path}: {e}")
+    return store
+
+if __name__ == "__main__":
+    import time
+    store = load_dense()
+    print(f"{len(store)} hours from {store.start} to {store.end}, {store.n_missing} missing "
+          f"({dense_dir()})")
+    df = hourly_cache.load_hourly()
+    rng = np.random.default_rng(0)
+    stamps = df.index[rng.integers(0, len(df), 10_000)]
+    start = time.perf_counter()
+    for ts in stamps:
+        df.index.get_loc(ts)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for ts in stamps:
+        store.pos(ts)
+    dense_s = time.perf_counter() - start
+    print(f"10k timestamp lookups: DatetimeIndex.get_loc {index_s * 1000:.1f} ms | dense offset {dense_s * 1000:.1f} ms")
@@ -0,0 +1,178 @@
+# src/direct.py
+"""
+Direct multi-horizon forecasting: one model with a horizon feature.
+
+Each training row pairs the features known at an origin hour t0 (the
+build_features row at t0 plus the value at t0) with a horizon h and the
+calendar features of t0 + h; the label is the target at t0 + h. Serving builds
+the origin row once, repeats it for h = 1..horizon and predicts the whole
+horizon with a single model.predict, instead of one call per hour.
+
+- build_direct_training_set / train_direct: training through models.train_xgb
+- DirectForecaster: serving, single series or a batch of meters
+- compare_modes: latency and RMSE of direct vs recursive on held-out origins
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src import dense, features, models
+from src.forecast import RecursiveForecaster, _time_features
+from src.config import DIRECT_MODEL_JSON_PATH, DIRECT_MODEL_JOBLIB_PATH, DIRECT_FEATURES_JSON_PATH
+
+TARGET = 'Global_active_power'
+TARGET_TIME_FEATURES = ['hour', 'day', 'weekday', 'month', 'is_weekend']
+MAX_HORIZON = 24 * 30
+# build_features needs max(ROLL_WINDOWS) rows before a row is complete
+ORIGIN_CONTEXT = max(features.ROLL_WINDOWS) + max(features.LAGS) + 1
+
+def direct_feature_list(origin_features):
+    return (list(origin_features) + ['origin_value', 'horizon']
+            + [f'target_{f}' for f in TARGET_TIME_FEATURES])
+
+def _target_time_features(times):
+    cols = _time_features(np.asarray(times).ravel())
+    return np.column_stack([cols[f] for f in TARGET_TIME_FEATURES]).astype(np.float64)
+
+def build_direct_training_set(df_hourly, origin_features=None, max_horizon=MAX_HORIZON,
+                              horizons_per_origin=8, seed=42):
+    """(X, y, feature_list) with ``horizons_per_origin`` random horizons per origin.
+
+    Sampling keeps the matrix at n_origins * horizons_per_origin rows instead
+    of n_origins * max_horizon.
+    """
+    df = features.build_features(df_hourly, drop_na=False)
+    if origin_features is None:
+        origin_features = features.default_feature_list(df)
+    origin = df[origin_features].to_numpy(dtype=np.float64)
+    y = df[TARGET].to_numpy(dtype=np.float64)
+    # a horizon is h hours, not h rows: targets are read from the dense grid,
+    # and pairs whose target hour is missing are dropped
+    grid_pos, n_hours = dense.grid_positions(df.index)
+    y_grid = dense.to_grid(y, grid_pos, n_hours)
+    ok = ~np.isnan(origin).any(axis=1) & ~np.isnan(y)
+    rng = np.random.default_rng(seed)
+    pos = np.flatnonzero(ok)
+    pos = np.repeat(pos, horizons_per_origin)
+    h = rng.integers(1, max_horizon + 1, size=len(pos))
+    target = grid_pos[pos] + h
+    keep = target < n_hours
+    pos, h, target = pos[keep], h[keep], target[keep]
+    keep = ~np.isnan(y_grid[target])
+    pos, h, target = pos[keep], h[keep], target[keep]
+    target_times = df.index.values[pos] + h.astype('timedelta64[h]')
+    X = np.column_stack([origin[pos], y[pos], h.astype(np.float64), _target_time_features(target_times)])
+    return X, y_grid[target], direct_feature_list(origin_features)
+
+def train_direct(df_hourly, origin_features=None, max_horizon=MAX_HORIZON, horizons_per_origin=8,
+                 path_json=DIRECT_MODEL_JSON_PATH, path_joblib=DIRECT_MODEL_JOBLIB_PATH,
+                 features_path=DIRECT_FEATURES_JSON_PATH, **params):
+    """Train and save the direct model and its feature list; returns (model, feature_list)."""
+    X, y, feature_list = build_direct_training_set(df_hourly, origin_features, max_horizon, horizons_per_origin)
+    model = models.train_xgb(X, y, path_json=path_json, path_joblib=path_joblib, **params)
+    models.save_features_list(feature_list, features_path)
+    return model, feature_list
+
+class DirectForecaster:
+    """Whole-horizon forecasts from a model trained by train_direct."""
+
+    def __init__(self, model, features_list):
+        self.model = model
+        self.features_list = list(features_list)
+        n_tail = 2 + len(TARGET_TIME_FEATURES)
+        self.origin_features = self.features_list[:-n_tail]
+        if self.features_list != direct_feature_list(self.origin_features):
+            raise ValueError("Feature list was not produced by train_direct.")
+
+    def origin_row(self, df_history):
+        """Features known at the last hour of ``df_history`` (origin features + origin value)."""
+        tail = df_history.sort_index().iloc[-ORIGIN_CONTEXT:]
+        last = features.build_features(tail, drop_na=False).iloc[-1]
+        row = [last[f] if f in last.index else 0.0 for f in self.origin_features]
+        return np.array(row + [last[TARGET]], dtype=np.float64), tail.index[-1]
+
+    def _matrix(self, origin_rows, origins, horizon):
+        n = len(origin_rows)
+        h = np.arange(1, horizon + 1, dtype=np.float64)
+        times = np.asarray(origins, dtype='datetime64[ns]')[:, None] + np.arange(1, horizon + 1).astype('timedelta64[h]')
+        X = np.empty((n * horizon, len(self.features_list)), dtype=np.float64)
+        k = origin_rows.shape[1]
+        X[:, :k] = np.repeat(origin_rows, horizon, axis=0)
+        X[:, k] = np.tile(h, n)
+        X[:, k + 1:] = _target_time_features(times)
+        return np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0), times
+
+    def forecast(self, df_history, horizon):
+        row, origin = self.origin_row(df_history)
+        X, times = self._matrix(row[None, :], [origin.to_datetime64()], horizon)
+        preds = self.model.predict(X)
+        return pd.Series(np.asarray(preds, dtype=np.float64), index=pd.DatetimeIndex(times[0]),
+                         name='Global_active_power_forecast')
+
+    def forecast_rows(self, origin_rows, origins, horizon):
+        """(times, preds) of shape (n_series, horizon) from precomputed origin rows."""
+        X, times = self._matrix(np.asarray(origin_rows), origins, horizon)
+        preds = np.asarray(self.model.predict(X), dtype=np.float64).reshape(len(origin_rows), horizon)
+        return times, preds
+
+def compare_modes(df_hourly, recursive_model, recursive_features, direct_model, direct_features,
+                  horizon=168, n_origins=20):
+    """Forecast from ``n_origins`` origins spread over the last part of ``df_hourly``.
+
+    Returns a frame with mean latency (ms) and RMSE per mode. Origins leave
+    ``horizon`` rows after them; forecasts are scored against the actuals at
+    the same timestamps, skipping hours missing from ``df_hourly``.
+    """
+    df_hourly = df_hourly.sort_index()
+    rec = RecursiveForecaster(recursive_model, recursive_features)
+    direct = DirectForecaster(direct_model, direct_features)
+    y = df_hourly[TARGET]
+    last = len(df_hourly) - horizon
+    positions = np.linspace(last - 24 * 90, last, n_origins).astype(int)
+    stats = {'recursive': ([], []), 'direct': ([], [])}
+    for p in positions:
+        history = df_hourly.iloc[:p]
+        for mode, fc in (('recursive', rec), ('direct', direct)):
+            start = time.perf_counter()
+            pred = fc.forecast(history, horizon)
+            stats[mode][0].append(time.perf_counter() - start)
+            # actuals by timestamp: a gap after the origin shifts rows, not hours
+            actual = y.reindex(pred.index).to_numpy()
+            seen = ~np.isnan(actual)
+            stats[mode][1].extend((pred.to_numpy()[seen] - actual[seen]) ** 2)
+    return pd.DataFrame({
+        mode: {'latency_ms': 1000 * np.mean(lat), 'rmse': float(np.sqrt(np.mean(se)))}
+        for mode, (lat, se) in stats.items()
+    }).T
+
+if __name__ == "__main__":
+    import argparse
+    from src import hourly_cache
+    from src.config import PROCESSED_DATA_PATH
+    parser = argparse.ArgumentParser(description="Train the direct model, or compare it with recursive.")
+    parser.add_argument('--compare', action='store_true',
+                        help="train both modes on all but the last 120 days and compare on them")
+    parser.add_argument('--horizon', type=int, default=168)
+    parser.add_argument('--n-estimators', type=int, default=500)
+    args = parser.parse_args()
+
+    df = hourly_cache.load_hourly(PROCESSED_DATA_PATH)
+    if not args.compare:
+        train_direct(df, n_estimators=args.n_estimators)
+        print(f"Saved direct model to {DIRECT_MODEL_JSON_PATH}")
+    else:
+        train = df.iloc[:-24 * 120]
+        with tempfile.TemporaryDirectory() as tmp:
+            feats = features.build_features(train)
+            rec_features = features.default_feature_list(feats)
+            models.train_xgb(feats[rec_features].values, feats[TARGET].values,
+                             os.path.join(tmp, 'rec.json'), os.path.join(tmp, 'rec.pkl'), n_estimators=args.n_estimators)
+            _, dir_features = train_direct(train, path_json=os.path.join(tmp, 'dir.json'),
+                                           path_joblib=os.path.join(tmp, 'dir.pkl'),
+                                           features_path=os.path.join(tmp, 'dir_features.json'),
+                                           n_estimators=args.n_estimators)
+            rec_model = models.load_model_xgb(os.path.join(tmp, 'rec.json'))
+            dir_model = models.load_model_xgb(os.path.join(tmp, 'dir.json'))
+        print(compare_modes(df, rec_model, rec_features, dir_model, dir_features, horizon=args.horizon))
@@ -0,0 +1,208 @@
+# src/external_train.py
+"""
+Out-of-core training for one global model pooled over many households.
+
+build_features + train_xgb hold the whole feature matrix in memory. Here
+HouseholdChunks (an xgboost.DataIter) loads a few households at a time, runs
+build_features on each and hands the chunk to XGBoost, which quantizes it
+into its own compressed pages. Only one chunk of float features exists at
+once, so peak memory is bounded by ``households_per_chunk`` rather than by
+the number of households.
+
+- external=True: ExtMemQuantileDMatrix, pages cached on disk under a temp dir
+  (xgboost < 3.0 has no ExtMemQuantileDMatrix; there the iterator goes to
+  DMatrix, which builds the same on-disk pages from ``cache_prefix``)
+- external=False: QuantileDMatrix built from the same iterator (pages in RAM,
+  still 1 byte per value instead of the float matrix)
+
+Sources may be hourly frames, paths to processed CSVs, or callables
+returning a frame.
+
+Run: python -m src.external_train --report --households 1,100,1000
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from src import features, hourly_cache
+
+TARGET = 'Global_active_power'
+DEFAULT_HOUSEHOLDS_PER_CHUNK = 16
+DEFAULT_PARAMS = {'objective': 'reg:squarederror', 'tree_method': 'hist', 'max_depth': 6,
+                  'learning_rate': 0.05, 'subsample': 0.8, 'colsample_bytree': 0.8, 'verbosity': 0}
+
+def _load(source):
+    if isinstance(source, pd.DataFrame):
+        return source
+    if callable(source):
+        return source()
+    return hourly_cache.load_hourly(source)
+
+class HouseholdChunks(xgb.DataIter):
+    """Feeds (X, y) feature chunks of ``households_per_chunk`` households to XGBoost."""
+
+    def __init__(self, sources, features_list, households_per_chunk=DEFAULT_HOUSEHOLDS_PER_CHUNK,
+                 cache_prefix=None):
+        self.sources = list(sources)
+        self.features_list = list(features_list)
+        self.households_per_chunk = households_per_chunk
+        self._pos = 0
+        self.rows = 0            # rows handed over in the last full pass
+        self.max_chunk_bytes = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def chunk(self, start):
+        Xs, ys = [], []
+        for source in self.sources[start:start + self.households_per_chunk]:
+            df = features.build_features(_load(source), dtype=np.float32)
+            Xs.append(df[self.features_list].to_numpy(dtype=np.float32))
+            ys.append(df[TARGET].to_numpy(dtype=np.float32))
+        return np.concatenate(Xs), np.concatenate(ys)
+
+    def next(self, input_data):
+        if self._pos >= len(self.sources):
+            return False
+        if self._pos == 0:
+            self.rows = 0
+        X, y = self.chunk(self._pos)
+        self.rows += len(y)
+        self.max_chunk_bytes = max(self.max_chunk_bytes, X.nbytes + y.nbytes)
+        # no feature_names: the saved booster must predict on plain arrays
+        input_data(data=X, label=y)
+        self._pos += self.households_per_chunk
+        return True
+
+    def reset(self):
+        self._pos = 0
+
+def train_external(sources, features_list=None, households_per_chunk=DEFAULT_HOUSEHOLDS_PER_CHUNK,
+                   num_boost_round=200, params=None, external=True, max_bin=256, cache_dir=None):
+    """Train one model over all ``sources``; returns (booster, features_list, stats)."""
+    sources = list(sources)
+    if features_list is None:
+        features_list = features.default_feature_list(features.build_features(_load(sources[0]).iloc[:400]))
+    params = {**DEFAULT_PARAMS, **(params or {}), 'max_bin': max_bin}
+    tmp = tempfile.mkdtemp(prefix='xgb-extmem-', dir=cache_dir) if external else None
+    try:
+        it = HouseholdChunks(sources, features_list, households_per_chunk,
+                             cache_prefix=os.path.join(tmp, 'cache') if tmp else None)
+        start = time.perf_counter()
+        if external and hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            dmat = xgb.ExtMemQuantileDMatrix(it, max_bin=max_bin)
+        elif external:
+            dmat = xgb.DMatrix(it)
+        else:
+            dmat = xgb.QuantileDMatrix(it, max_bin=max_bin)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        booster = xgb.train(params, dmat, num_boost_round=num_boost_round)
+        fit = time.perf_counter() - start
+        stats = {'households': len(sources), 'rows': it.rows, 'build_s': build, 'train_s': fit,
+                 'rows_per_s': it.rows * num_boost_round / max(fit, 1e-9),
+                 'max_chunk_mb': it.max_chunk_bytes / 2 ** 20}
+        del dmat
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return booster, features_list, stats
+
+def train_in_memory(sources, features_list=None, num_boost_round=200, params=None, max_bin=256):
+    """Reference path: every household's features in one float matrix, as train_xgb does."""
+    frames = [features.build_features(_load(s)) for s in sources]
+    if features_list is None:
+        features_list = features.default_feature_list(frames[0])
+    X = np.concatenate([f[features_list].to_numpy(dtype=np.float64) for f in frames])
+    y = np.concatenate([f[TARGET].to_numpy(dtype=np.float64) for f in frames])
+    del frames
+    start = time.perf_counter()
+    booster = xgb.train({**DEFAULT_PARAMS, **(params or {}), 'max_bin': max_bin}, xgb.DMatrix(X, label=y),
+                        num_boost_round=num_boost_round)
+    fit = time.perf_counter() - start
+    return booster, features_list, {'households': len(sources), 'rows': len(y), 'train_s': fit,
+                                    'rows_per_s': len(y) * num_boost_round / max(fit, 1e-9)}
+
+# ---------------------------------------------------------------------------
+# Scaling report on synthetic households
+# ---------------------------------------------------------------------------
+
+def synthetic_household(i, days=60):
+    """Hourly frame for household ``i``: daily/weekly cycles with a per-household scale."""
+    rng = np.random.default_rng(i)
+    n = days * 24
+    idx = pd.date_range('2008-01-01', periods=n, freq='h', name='datetime')
+    hour, weekday = idx.hour.to_numpy(), idx.weekday.to_numpy()
+    scale = 0.5 + rng.random()
+    gap = scale * (1.0 + 0.8 * np.sin(2 * np.pi * hour / 24) + 0.2 * (weekday >= 5)) + 0.2 * rng.random(n)
+    subs = 0.1 * rng.random((n, 3))
+    df = pd.DataFrame({
+        'Global_active_power': gap, 'Global_reactive_power': 0.1 * rng.random(n),
+        'Voltage': 240 + rng.random(n), 'Global_intensity': gap * 4.2,
+        'Sub_metering_1': subs[:, 0], 'Sub_metering_2': subs[:, 1], 'Sub_metering_3': subs[:, 2],
+    }, index=idx)
+    df['Other_Consumption'] = np.fmax(0.0, gap - subs.sum(axis=1))
+    return df
+
+def _peak_rss_mb():
+    try:
+        import resource    # Unix only
+    except ImportError:
+        return float('nan')
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def _report_one(mode, n_households, days, households_per_chunk, num_boost_round):
+    from functools import partial
+    sources = [partial(synthetic_household, i, days) for i in range(n_households)]
+    if mode == 'in_memory':
+        _, _, stats = train_in_memory(sources, num_boost_round=num_boost_round)
+    else:
+        _, _, stats = train_external(sources, households_per_chunk=households_per_chunk,
+                                     num_boost_round=num_boost_round, external=(mode == 'external'))
+    stats['mode'] = mode
+    stats['peak_rss_mb'] = _peak_rss_mb()
+    return stats
+
+def scaling_report(household_counts=(1, 100, 1000), modes=('in_memory', 'quantile', 'external'), days=60,
+                   households_per_chunk=DEFAULT_HOUSEHOLDS_PER_CHUNK, num_boost_round=50):
+    """Train at each household count in a fresh process per run (so peak RSS is per run)."""
+    from concurrent.futures import ProcessPoolExecutor
+    rows = []
+    for n in household_counts:
+        for mode in modes:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                stats = pool.submit(_report_one, mode, n, days, households_per_chunk, num_boost_round).result()
+            rows.append(stats)
+            print(f"{n:5d} households {mode:10s} rows {stats['rows']:>10,} train {stats['train_s']:7.2f}s "
+                  f"{stats['rows_per_s']:>14,.0f} row-rounds/s peak RSS {stats['peak_rss_mb']:8.1f} MB")
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    import argparse
+    from src.config import PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH
+    from src import models
+    parser = argparse.ArgumentParser(description="Out-of-core training over household feature chunks.")
+    parser.add_argument('--report', action='store_true', help="memory/throughput on synthetic households")
+    parser.add_argument('--households', default='1,100,1000')
+    parser.add_argument('--modes', default='in_memory,quantile,external')
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--chunk', type=int, default=DEFAULT_HOUSEHOLDS_PER_CHUNK, help="households per chunk")
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--sources', nargs='*', default=[PROCESSED_DATA_PATH], help="processed hourly CSVs")
+    parser.add_argument('--model', default=MODEL_JSON_PATH)
+    parser.add_argument('--features', default=FEATURES_JSON_PATH)
+    args = parser.parse_args()
+    if args.report:
+        scaling_report([int(n) for n in args.households.split(',')], args.modes.split(','), args.days,
+                       args.chunk, args.rounds)
+    else:
+        booster, feature_list, stats = train_external(args.sources, households_per_chunk=args.chunk,
+                                                      num_boost_round=args.rounds)
+        booster.save_model(args.model)
+        models.save_features_list(feature_list, args.features)
+        print(f"Trained on {stats['rows']:,} rows from {len(args.sources)} source(s); saved {args.model}")
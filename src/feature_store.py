@@ -0,0 +1,248 @@
+# src/feature_store.py
+"""
+Persisted feature matrix shared by training and serving.
+
+The build_features(drop_na=False) output for a processed hourly CSV is kept
+next to it, one raw float64 file per column (columnar, memory-mapped on
+load), under a directory named after the feature-definition hash:
+
+    data/processed/df_hourly.features/<definition hash>/
+        index.i8          int64 hours since the Unix epoch
+        <column>.f64      one file per column
+        meta.json         columns, row count, source digests
+
+- definition_hash() covers the code that computes features, so editing it
+  starts a new version instead of mixing old and new rows.
+- sync() extends the stored matrix when new hours arrive: the stored rows
+  must still match the source, then only the new rows (plus the last stored
+  hour, which an incremental preprocess may have rewritten) are computed
+  from enough preceding context for the longest lag/window.
+- check() raises FeatureMismatchError when a model's feature list asks for
+  a column the store does not have, so drift fails at load time.
+
+Run: python -m src.feature_store [--rebuild]
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src import dense, features, hourly_cache
+from src.hourly_cache import _NS_PER_HOUR, epoch_hours
+from src.config import PROCESSED_DATA_PATH
+
+TARGET = 'Global_active_power'
+# rows of history needed to recompute the newest row exactly
+CONTEXT = max(max(features.LAGS), max(features.ROLL_WINDOWS))
+_DEFINITION = [features.add_time_features, features.add_lags, features.rolling_kernel,
+               features.add_rollings, features.build_features, dense.grid_positions, dense.to_grid,
+               epoch_hours]
+
+class FeatureMismatchError(ValueError):
+    """A feature list does not match the stored feature columns."""
+
+def definition_hash():
+    """Hash of the feature code and its parameters."""
+    h = hashlib.sha1(f"{features.LAGS}|{features.ROLL_WINDOWS}".encode())
+    for fn in _DEFINITION:
+        h.update(inspect.getsource(inspect.unwrap(fn)).encode())
+    return h.hexdigest()
+
+def _digest(df, n):
+    """Digest of the first ``n`` rows of an hourly frame (index and values)."""
+    h = hashlib.sha1(','.join(map(str, df.columns)).encode())
+    h.update(df.index.values[:n].astype('datetime64[ns]').tobytes())
+    h.update(np.ascontiguousarray(df.iloc[:n].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+def _column_file(name):
+    return name.replace(os.sep, '_') + '.f64'
+
+class FeatureStore:
+    """Versioned, incrementally extended feature matrix for one processed CSV."""
+
+    def __init__(self, csv_path=PROCESSED_DATA_PATH, root=None):
+        self.csv_path = csv_path
+        self.root = root or os.path.splitext(csv_path)[0] + '.features'
+        self.version = definition_hash()
+        self.path = os.path.join(self.root, self.version[:16])
+        self._meta = None
+        self._index = None      # stored DatetimeIndex, kept between reads
+        self._maps = {}         # column name -> read-only memmap of the stored rows
+
+    # -- metadata --------------------------------------------------------
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def meta(self):
+        """The stored metadata, or None if the store is missing or damaged."""
+        if self._meta is None:
+            if not os.path.exists(self._meta_path()):
+                return None
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+            files = ['index.i8'] + [_column_file(c) for c in meta['columns']]
+            sizes = [os.path.getsize(os.path.join(self.path, f)) if os.path.exists(os.path.join(self.path, f)) else -1
+                     for f in files]
+            if meta.get('version') != self.version or any(s != 8 * meta['n_rows'] for s in sizes):
+                return None
+            self._meta = meta
+        return self._meta
+
+    @property
+    def columns(self):
+        meta = self.meta()
+        return list(meta['columns']) if meta else []
+
+    def __len__(self):
+        meta = self.meta()
+        return meta['n_rows'] if meta else 0
+
+    # -- writing ---------------------------------------------------------
+
+    def sync(self, df_hourly=None, verbose=True):
+        """Bring the store up to date with the source; returns 'current', 'extended' or 'built'."""
+        df = (hourly_cache.load_hourly(self.csv_path) if df_hourly is None else df_hourly).sort_index()
+        n = len(df)
+        meta = self.meta()
+        if meta is not None and meta['source_columns'] == [str(c) for c in df.columns] and 0 < meta['n_rows'] <= n:
+            n_old = meta['n_rows']
+            if n_old == n and _digest(df, n) == meta['source_digest']:
+                return 'current'
+            if _digest(df, n_old - 1) == meta['prefix_digest']:
+                self._extend(df, n_old - 1)
+                if verbose:
+                    print(f"Feature store extended by {n - n_old} hour(s) to {n} rows ({self.path})")
+                return 'extended'
+        self._build(df)
+        if verbose:
+            print(f"Feature store built: {n} rows x {len(self.columns)} columns ({self.path})")
+        return 'built'
+
+    def _drop_maps(self):
+        # release the memmaps before the files are rewritten; the index is reread after
+        self._index, self._maps = None, {}
+
+    def _build(self, df):
+        self._drop_maps()
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path)
+        feats = features.build_features(df, drop_na=False)
+        self._write(feats, start=0, df=df)
+
+    def _extend(self, df, start):
+        lo = max(0, start - CONTEXT)
+        feats = features.build_features(df.iloc[lo:], drop_na=False).iloc[start - lo:]
+        if list(feats.columns) != self.columns:
+            self._build(df)
+            return
+        self._drop_maps()
+        self._write(feats, start=start, df=df)
+
+    def _write(self, feats, start, df):
+        hours = epoch_hours(feats.index)
+        self._append('index.i8', hours.astype(np.int64), start)
+        for col in feats.columns:
+            self._append(_column_file(col), feats[col].to_numpy(dtype=np.float64), start)
+        n = start + len(feats)
+        meta = {
+            'version': self.version,
+            'columns': [str(c) for c in feats.columns],
+            'source_columns': [str(c) for c in df.columns],
+            'n_rows': n,
+            'prefix_digest': _digest(df, n - 1),
+            'source_digest': _digest(df, n),
+            'start': str(df.index[0]),
+            'end': str(df.index[-1]),
+        }
+        tmp = self._meta_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._meta_path())
+        self._meta = meta
+        self._drop_maps()
+
+    def _append(self, name, values, start):
+        path = os.path.join(self.path, name)
+        with open(path, 'ab') as f:
+            f.truncate(start * 8)
+            f.seek(start * 8)
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    # -- reading ---------------------------------------------------------
+
+    def load(self, columns=None):
+        """Memory-mapped, read-only frame of the stored features (all columns by default)."""
+        meta = self.meta()
+        if meta is None:
+            raise FileNotFoundError(f"No feature store at {self.path}; call sync() first.")
+        columns = list(columns) if columns is not None else meta['columns']
+        self.check(columns)
+        return pd.DataFrame({c: self._column(c) for c in columns}, index=self._stored_index(), copy=False)
+
+    def _stored_index(self):
+        if self._index is None:
+            n = self.meta()['n_rows']
+            hours = np.fromfile(os.path.join(self.path, 'index.i8'), dtype=np.int64, count=n)
+            self._index = pd.DatetimeIndex((hours * _NS_PER_HOUR).view('datetime64[ns]'), name='datetime')
+        return self._index
+
+    def _column(self, name):
+        if name not in self._maps:
+            self._maps[name] = np.memmap(os.path.join(self.path, _column_file(name)), dtype=np.float64, mode='r',
+                                         shape=(self.meta()['n_rows'],))
+        return self._maps[name]
+
+    def check(self, features_list, model=None):
+        """Raise FeatureMismatchError unless every name in ``features_list`` is stored.
+
+        With ``model``, a booster that was trained with feature names must
+        also have been trained on exactly ``features_list``.
+        """
+        missing = [f for f in features_list if f not in set(self.columns)]
+        if missing:
+            raise FeatureMismatchError(f"Feature store {self.version[:16]} lacks {len(missing)} feature(s) "
+                                       f"the model expects: {missing[:10]}")
+        names = getattr(getattr(model, 'booster', model), 'feature_names', None)
+        if names and list(names) != list(features_list):
+            unknown = [f for f in names if f not in set(self.columns)]
+            raise FeatureMismatchError(f"Model was trained on {len(names)} feature(s), the feature list has "
+                                       f"{len(features_list)}; not in the store: {unknown[:10]}")
+
+    def training_frame(self, features_list, target=TARGET):
+        """Rows where every requested feature and the target are present (like build_features' dropna)."""
+        df = self.load(list(dict.fromkeys(list(features_list) + [target])))
+        return df[~np.isnan(df.to_numpy()).any(axis=1)]
+
+    def row(self, ts, features_list, target_value=None):
+        """Feature row stored for hour ``ts``, or None if the hour is not stored.
+
+        With ``target_value`` the row is only returned when the stored target
+        at ``ts`` equals it, so a history from another source is never served
+        this source's features.
+        """
+        if self.meta() is None:
+            return None
+        self.check(list(features_list) + [TARGET])
+        index = self._stored_index()
+        pos = index.searchsorted(ts)
+        if pos >= len(index) or index[pos] != ts:
+            return None
+        if target_value is not None and not np.isclose(self._column(TARGET)[pos], target_value, equal_nan=True):
+            return None
+        return np.array([self._column(f)[pos] for f in features_list], dtype=np.float64)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or extend the feature store for the processed CSV.")
+    parser.add_argument('--csv', default=PROCESSED_DATA_PATH)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+    store = FeatureStore(args.csv)
+    if args.rebuild:
+        shutil.rmtree(store.path, ignore_errors=True)
+    print(store.sync())
@@ -5,17 +5,24 @@ Feature engineering functions:
 - add_lags
 - add_rollings
 - build_features (history -> features for training)
+- rolling_kernel / RollingState (vectorized rolling stats used by add_rollings)
+Lags and windows are taken by hour on the dense grid (src/dense.py): a lag
+that falls in a missing hour is NaN rather than an earlier row, and rolling
+windows skip missing hours.
 Also exports FEATURES list used by model (saved by models.py during training).
 """
 
 import pandas as pd
 import numpy as np
+from src import dense, tracing
 
 ROLL_WINDOWS = [3,6,12,24,48,72,96,168]
 LAGS = [1,24,168]
 
-def add_time_features(df):
-    df = df.copy()
+@tracing.traced()
+def add_time_features(df, copy=True):
+    if copy:
+        df = df.copy()
     if 'datetime' in df.columns:
         df['datetime'] = pd.to_datetime(df['datetime'])
         df = df.set_index('datetime')
@@ -29,26 +36,123 @@ def add_time_features(df):
     df['is_weekend'] = (df.index.weekday >= 5).astype(int)
     return df
 
-def add_lags(df, target='Global_active_power', lags=LAGS):
-    df = df.copy()
+@tracing.traced()
+def add_lags(df, target='Global_active_power', lags=LAGS, copy=True):
+    """Target ``lag`` hours earlier; NaN when that hour is missing or before the data."""
+    if copy:
+        df = df.copy()
+    pos, n = dense.grid_positions(df.index)
+    grid = dense.to_grid(df[target].to_numpy(dtype=np.float64), pos, n)
     for lag in lags:
-        df[f'lag{lag}'] = df[target].shift(lag)
+        src = pos - lag
+        df[f'lag{lag}'] = np.where(src >= 0, grid[np.maximum(src, 0)], np.nan)
     return df
 
-def add_rollings(df, target='Global_active_power', windows=ROLL_WINDOWS):
-    df = df.copy()
-    for w in windows:
-        df[f'roll{w}_mean'] = df[target].rolling(window=w).mean()
-        df[f'roll{w}_std']  = df[target].rolling(window=w).std()
-        df[f'roll{w}_sum']  = df[target].rolling(window=w).sum()
+def rolling_names(windows=ROLL_WINDOWS):
+    """Column names produced by rolling_kernel, in block order."""
+    return [f'roll{w}_{stat}' for w in windows for stat in ('mean', 'std', 'sum')]
+
+def rolling_kernel(values, windows=ROLL_WINDOWS, dtype=np.float64, out=None, skip=None):
+    """Rolling mean / std (ddof=1) / sum for every window in one pass.
+
+    Cumulative sums of the centred series and its square are taken once and
+    each window is a difference of two shifted slices of them. Results go into
+    one (n, 3 * len(windows)) block (``out`` if given) laid out as
+    rolling_names(windows). Matches ``Series.rolling(w).mean/std/sum`` to
+    float tolerance, including NaN for incomplete or NaN-containing windows.
+    float32 output still accumulates in float64.
+
+    ``skip`` marks slots that are not part of the series (missing hours of a
+    dense grid): a window is complete when all its other slots are valid, and
+    its stats are over those values only.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if out is None:
+        out = np.empty((n, 3 * len(windows)), dtype=dtype)
+    out[:] = np.nan
+    valid = ~np.isnan(x)
+    skip = np.zeros(n, dtype=bool) if skip is None else np.asarray(skip, dtype=bool)
+    valid &= ~skip
+    # centring keeps the cumulative sums small, which keeps the variance accurate
+    shift = x[valid].mean() if valid.any() else 0.0
+    xc = np.where(valid, x - shift, 0.0)
+    c1 = np.zeros(n + 1)
+    c2 = np.zeros(n + 1)
+    cn = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(xc, out=c1[1:])
+    np.cumsum(xc * xc, out=c2[1:])
+    ck = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(valid, out=cn[1:])
+    np.cumsum(skip, out=ck[1:])
+    for j, w in enumerate(windows):
+        if w > n:
+            continue
+        s = c1[w:] - c1[:-w]
+        q = c2[w:] - c2[:-w]
+        k = cn[w:] - cn[:-w]
+        full = (k + ck[w:] - ck[:-w] == w) & (k > 0)
+        kf = np.maximum(k, 1).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(k > 1, np.maximum(q - s * s / kf, 0.0) / (kf - 1), np.nan)
+        out[w - 1:, 3 * j] = np.where(full, s / kf + shift, np.nan)
+        out[w - 1:, 3 * j + 1] = np.where(full, np.sqrt(var), np.nan)
+        out[w - 1:, 3 * j + 2] = np.where(full, s + shift * k, np.nan)
+    return out
+
+class RollingState:
+    """Rolling stats for a series that grows one hour at a time.
+
+    Keeps the last max(windows) values; append() returns the new row of
+    rolling_names(windows) values, as rolling_kernel would compute for it.
+    """
+
+    def __init__(self, history=(), windows=ROLL_WINDOWS, dtype=np.float64):
+        self.windows = list(windows)
+        self.dtype = dtype
+        self._tail = np.asarray(history, dtype=np.float64)[-max(self.windows):].copy()
+
+    def append(self, value):
+        # keep max(windows) - 1 old values; a [1 - max:] slice keeps everything when max is 1
+        start = max(0, len(self._tail) - max(self.windows) + 1)
+        self._tail = np.append(self._tail[start:], float(value))
+        return self.row()
+
+    def row(self):
+        out = np.full(3 * len(self.windows), np.nan, dtype=self.dtype)
+        for j, w in enumerate(self.windows):
+            seg = self._tail[-w:]
+            if len(seg) < w or np.isnan(seg).any():
+                continue
+            out[3 * j] = seg.mean()
+            out[3 * j + 1] = seg.std(ddof=1) if w > 1 else np.nan
+            out[3 * j + 2] = seg.sum()
+        return out
+
+@tracing.traced()
+def add_rollings(df, target='Global_active_power', windows=ROLL_WINDOWS, copy=True, dtype=np.float64):
+    """Rolling stats over the last ``w`` hours of the target, missing hours skipped."""
+    pos, n = dense.grid_positions(df.index)
+    values = df[target].to_numpy(dtype=np.float64)
+    if n == len(df):
+        block = rolling_kernel(values, windows=windows, dtype=dtype)
+    else:
+        missing = np.ones(n, dtype=bool)
+        missing[pos] = False
+        block = rolling_kernel(dense.to_grid(values, pos, n), windows=windows, dtype=dtype, skip=missing)[pos]
+    rolls = pd.DataFrame(block, index=df.index, columns=rolling_names(windows))
+    if copy:
+        # existing roll columns (a frame fed back through) are replaced, not duplicated
+        return pd.concat([df.drop(columns=rolls.columns, errors='ignore'), rolls], axis=1)
+    df[rolls.columns] = rolls
     return df
 
-def build_features(df_hourly, drop_na=True):
+@tracing.traced()
+def build_features(df_hourly, drop_na=True, dtype=np.float64):
     """From hourly dataframe (index=datetime), create full feature matrix for training."""
-    df = df_hourly.copy()
-    df = add_time_features(df)
-    df = add_lags(df, target='Global_active_power')
-    df = add_rollings(df, target='Global_active_power')
+    df = add_time_features(df_hourly)   # the only full copy
+    df = add_lags(df, target='Global_active_power', copy=False)
+    df = add_rollings(df, target='Global_active_power', copy=False, dtype=dtype)
     if drop_na:
         df = df.dropna()
     return df
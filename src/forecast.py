@@ -0,0 +1,378 @@
+# src/forecast.py
+"""
+Recursive multi-step forecasting without re-building the history every step.
+
+The forecaster keeps the values it needs between steps (target history for
+lag1/lag24/lag168 and roll24, last week of regressors) in fixed-size ring
+buffers and assembles each feature row into one preallocated NumPy array, so
+a step costs the same no matter how long the history is. Many series (one
+per meter) can be advanced in lockstep with a single model.predict per step.
+
+Produces the same forecasts as the original pandas loop in app/app.py:
+- time features hour/day/weekday/month/is_weekend follow the forecast timestamp
+- regressors are copied from the previous week (same indexing as before)
+- lag1/lag24/lag168 and roll24_mean/std are rebuilt from the target buffer
+- Other_Consumption is derived from the previous step's prediction
+- every other feature keeps the value of the last history row
+
+Histories are read by hour, not by row (src/dense.py): lags and the seeded
+buffers come from the last WEEK hours before the origin, with missing hours
+interpolated, so a gap in the history does not shift lag24/lag168.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src import dense, features, tracing
+
+TARGET = 'Global_active_power'
+REGRESSORS = ['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3', 'Voltage', 'Global_intensity']
+SUB_METERS = ['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+TIME_FEATURES = ['hour', 'day', 'weekday', 'month', 'is_weekend']
+WEEK = 168
+DAY = 24
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO holding the newest ``capacity`` entries.
+
+    Entries may be scalars (``shape=()``) or fixed-shape arrays. Indexing is
+    relative to the newest entry: ``buf[-1]`` is the last value appended.
+    """
+
+    def __init__(self, capacity, shape=(), values=None, dtype=np.float64):
+        self.capacity = int(capacity)
+        self._data = np.zeros((self.capacity,) + tuple(shape), dtype=dtype)
+        self._head = 0      # position of the next write
+        self._size = 0
+        if values is not None:
+            self.extend(values)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        self._data[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)[-self.capacity:]
+        n = len(values)
+        if n == 0:
+            return
+        idx = (self._head + np.arange(n)) % self.capacity
+        self._data[idx] = values
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def __getitem__(self, i):
+        if not -self._size <= i < 0:
+            raise IndexError(f"ring buffer index {i} out of range for size {self._size}")
+        return self._data[(self._head + i) % self.capacity]
+
+    def tail(self, n):
+        """Return the newest ``n`` entries, oldest first."""
+        n = min(n, self._size)
+        idx = (self._head - n + np.arange(n)) % self.capacity
+        return self._data[idx]
+
+    def copy(self):
+        other = RingBuffer.__new__(RingBuffer)
+        other.capacity = self.capacity
+        other._data = self._data.copy()
+        other._head = self._head
+        other._size = self._size
+        return other
+
+
+def _time_features(times):
+    """Calendar features for an array of datetime64 values (any shape)."""
+    idx = pd.DatetimeIndex(np.asarray(times).ravel())
+    weekday = idx.weekday.to_numpy()
+    feats = {
+        'hour': idx.hour.to_numpy(),
+        'day': idx.day.to_numpy(),
+        'weekday': weekday,
+        'month': idx.month.to_numpy(),
+        'is_weekend': (weekday >= 5).astype(int),
+    }
+    return {f: v.reshape(np.shape(times)) for f, v in feats.items()}
+
+
+def _seed_values(df_history, features_list, recent=None):
+    """Feature values of the last history row, as app.recursive_forecast built them.
+
+    ``recent`` is the target over the last WEEK + 1 hours (dense.tail_grid);
+    lags are read from it by hour.
+    """
+    last = df_history.iloc[-1]
+    ts = df_history.index[-1]
+    if recent is None:
+        recent = dense.tail_grid(df_history, [TARGET], WEEK + 1)[:, 0]
+    span = dense.span_hours(df_history.index)
+    seed = {
+        'hour': ts.hour, 'day': ts.day, 'weekday': ts.weekday(),
+        'weekofyear': int(ts.isocalendar()[1]), 'month': ts.month, 'year': ts.year,
+        'is_weekend': int(ts.weekday() >= 5),
+    }
+    for lag in features.LAGS:
+        seed[f'lag{lag}'] = recent[-1 - lag] if span > lag and lag < len(recent) else np.nan
+    rolls = [f for f in features_list if f.startswith(f'roll{DAY}_') or f.startswith(f'roll{WEEK}_')]
+    if rolls:
+        df_roll = features.add_rollings(df_history[[TARGET]], target=TARGET, windows=[DAY, WEEK])
+        for f in rolls:
+            if f in df_roll.columns:
+                seed[f] = df_roll[f].iloc[-1]
+    values = []
+    for f in features_list:
+        if f in seed:
+            values.append(seed[f])
+        elif f in last.index:
+            values.append(last[f])
+        else:
+            values.append(0.0)
+    return values
+
+
+def _as_histories(histories, id_col):
+    """Normalise a dict of frames or a long frame keyed by ``id_col`` to (keys, frames)."""
+    if isinstance(histories, pd.DataFrame):
+        df = histories
+        if 'datetime' in df.columns:
+            df = df.set_index('datetime')
+        df = df.set_axis(pd.to_datetime(df.index), axis=0)   # new frame; the caller's index is untouched
+        groups = df.groupby(id_col, sort=False)
+        keys = list(groups.groups)
+        frames = [groups.get_group(k).drop(columns=id_col) for k in keys]
+    else:
+        keys = list(histories)
+        frames = [histories[k] for k in keys]
+    return keys, [f.sort_index() for f in frames]
+
+
+class ForecastState:
+    """Everything the recursion needs to take the next step, for a batch of series.
+
+    All series advance in lockstep; row ``j`` of every array belongs to ``keys[j]``.
+    """
+
+    def __init__(self, keys, target, regressors, rows, origins, n_rows):
+        self.keys = keys
+        self.target = target            # RingBuffer of the last WEEK target values, entries shape (n_series,)
+        self.regressors = regressors    # RingBuffer of the last WEEK regressor rows, entries shape (n_series, n_regressors)
+        self.rows = rows                # preallocated feature matrix, shape (n_series, n_features)
+        self.origins = origins          # datetime64 of the last known/forecast hour per series
+        self.n_rows = n_rows            # hours of history + forecast seen so far per series
+        self.steps = 0                  # forecast steps taken from this state
+
+    def __len__(self):
+        return len(self.keys)
+
+    def copy(self):
+        other = ForecastState(list(self.keys), self.target.copy(), self.regressors.copy(),
+                              self.rows.copy(), self.origins.copy(), self.n_rows.copy())
+        other.steps = self.steps
+        return other
+
+    @staticmethod
+    def stack(states):
+        """One batch state from several states that have taken the same number of steps."""
+        steps = {st.steps for st in states}
+        if len(steps) != 1:
+            raise ValueError("Only states at the same step count can be stacked.")
+        target = RingBuffer(WEEK, shape=(sum(len(st) for st in states),),
+                            values=np.concatenate([st.target.tail(WEEK) for st in states], axis=1))
+        regressors = RingBuffer(WEEK, shape=(target._data.shape[1], len(REGRESSORS)),
+                                values=np.concatenate([st.regressors.tail(WEEK) for st in states], axis=1))
+        stacked = ForecastState([k for st in states for k in st.keys], target, regressors,
+                                np.vstack([st.rows for st in states]),
+                                np.concatenate([st.origins for st in states]),
+                                np.concatenate([st.n_rows for st in states]))
+        stacked.steps = steps.pop()
+        return stacked
+
+
+class RecursiveForecaster:
+    """Hour-by-hour recursive forecaster for a model trained on ``features_list``.
+
+    Any number of series can be advanced together; each step stacks one feature
+    row per series and calls ``model.predict`` once.
+
+    >>> fc = RecursiveForecaster(model, features_list)
+    >>> series = fc.forecast(df_hourly, horizon=168)
+    >>> df_long = fc.forecast_many({'meter_a': df_a, 'meter_b': df_b}, horizon=168)
+    """
+
+    def __init__(self, model, features_list, store=None):
+        self.model = model
+        self.features_list = list(features_list)
+        # optional FeatureStore: seed rows are read from it instead of recomputed
+        self.store = store
+        if store is not None:
+            store.check(self.features_list, model)
+        pos = {f: i for i, f in enumerate(self.features_list)}
+        self._time_idx = [(pos[f], f) for f in TIME_FEATURES if f in pos]
+        self._reg_idx = [(pos[c], j) for j, c in enumerate(REGRESSORS) if c in pos]
+        self._lag_idx = [(pos[f'lag{lag}'], lag) for lag in (1, DAY, WEEK) if f'lag{lag}' in pos]
+        self._mean_idx = pos.get(f'roll{DAY}_mean')
+        self._std_idx = pos.get(f'roll{DAY}_std')
+        self._target_idx = pos.get(TARGET)
+        self._other_idx = pos.get('Other_Consumption')
+        self._sub_idx = [REGRESSORS.index(c) for c in SUB_METERS]
+
+    def init_state(self, df_history):
+        """Build the recursion state for a single hourly history (index=datetime)."""
+        return self.init_batch({0: df_history})
+
+    def init_batch(self, histories, id_col='meter_id'):
+        """Build one lockstep state from many hourly histories.
+
+        ``histories`` is a dict ``{key: df_hourly}`` or a long frame with an
+        ``id_col`` column and a datetime index (or ``datetime`` column).
+        """
+        keys, frames = _as_histories(histories, id_col)
+        n_series = len(frames)
+        rows = np.empty((n_series, len(self.features_list)), dtype=np.float64)
+        # the last WEEK hours of every history (gaps interpolated), NaN-padded on the left
+        target_hist = np.full((WEEK, n_series), np.nan)
+        reg_hist = np.full((WEEK, n_series, len(REGRESSORS)), np.nan)
+        origins = np.empty(n_series, dtype='datetime64[ns]')
+        n_rows = np.empty(n_series, dtype=np.int64)
+        for j, df in enumerate(frames):
+            recent = dense.tail_grid(df, [TARGET] + REGRESSORS, WEEK + 1)
+            n_rows[j] = dense.span_hours(df.index)
+            seed = None
+            if self.store is not None:
+                seed = self.store.row(df.index[-1], self.features_list, df[TARGET].iat[-1])
+            if seed is None:
+                rows[j] = _seed_values(df, self.features_list, recent[:, 0])
+            else:
+                rows[j] = seed
+                # stored lags are NaN for missing hours; use the interpolated ones
+                for i, lag in self._lag_idx:
+                    if np.isnan(rows[j, i]) and n_rows[j] > lag and lag <= WEEK:
+                        rows[j, i] = recent[-1 - lag, 0]
+            target_hist[:, j] = recent[1:, 0]
+            reg_hist[:, j, :] = recent[1:, 1:]
+            origins[j] = df.index[-1].to_datetime64()
+        target = RingBuffer(WEEK, shape=(n_series,), values=target_hist)
+        regressors = RingBuffer(WEEK, shape=(n_series, len(REGRESSORS)), values=reg_hist)
+        return ForecastState(keys, target, regressors, rows, origins, n_rows)
+
+    def _rolling_window(self, target, lag1, n):
+        # last 23 target values plus lag1 again, exactly as the pandas loop built it
+        window = np.empty((len(lag1), DAY), dtype=np.float64)
+        window[:, :DAY - 1] = target.tail(DAY - 1).T
+        window[:, DAY - 1] = lag1
+        mean = window.mean(axis=1)
+        std = window.std(axis=1)
+        for j in np.flatnonzero(n < DAY - 1):
+            w = window[j, DAY - 1 - n[j]:]
+            mean[j], std[j] = np.mean(w), np.std(w)
+        return mean, std
+
+    @tracing.traced('forecast.advance')
+    def advance(self, state, steps, noise=None):
+        """Take ``steps`` more forecast steps from ``state`` (mutated in place).
+
+        ``noise`` (n_series, steps), if given, is added to each prediction
+        before it is fed back, floored at 0 (sample paths, see src/probabilistic.py).
+
+        Returns (times, predictions, regressor_values) with shapes
+        (n_series, steps), (n_series, steps) and (n_series, steps, n_regressors).
+        """
+        offsets = np.arange(1, steps + 1).astype('timedelta64[h]')
+        times = state.origins[:, None] + offsets[None, :]
+        time_feats = _time_features(times)
+        n_series = len(state)
+        preds = np.empty((n_series, steps), dtype=np.float64)
+        regs_out = np.empty((n_series, steps, len(REGRESSORS)), dtype=np.float64)
+        X = state.rows
+        target, regressors = state.target, state.regressors
+        sub = self._sub_idx
+
+        for k in range(steps):
+            n = state.n_rows
+            for i, f in self._time_idx:
+                X[:, i] = time_feats[f][:, k]
+
+            # regressors: last week's value, indexed exactly like the pandas loop
+            reg = np.where((n >= WEEK)[:, None], regressors[-WEEK + (state.steps % WEEK)], regressors[-1])
+            regs_out[:, k] = reg
+            for i, j in self._reg_idx:
+                X[:, i] = reg[:, j]
+
+            lag1 = target[-1].copy()
+            for i, lag in self._lag_idx:
+                X[:, i] = np.where(n >= lag, target[-lag], lag1)
+
+            if self._mean_idx is not None or self._std_idx is not None:
+                mean, std = self._rolling_window(target, lag1, n)
+                if self._mean_idx is not None:
+                    X[:, self._mean_idx] = mean
+                if self._std_idx is not None:
+                    X[:, self._std_idx] = std
+
+            yhat = self.model.predict(np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0))
+            if noise is not None:
+                yhat = np.fmax(yhat + noise[:, k], 0.0)
+            preds[:, k] = yhat
+
+            # the predicted hour becomes history for the next step
+            if self._target_idx is not None:
+                X[:, self._target_idx] = yhat
+            if self._other_idx is not None:
+                X[:, self._other_idx] = np.fmax(0.0, yhat - (reg[:, sub[0]] + reg[:, sub[1]] + reg[:, sub[2]]))
+            target.append(yhat)
+            regressors.append(reg)
+            state.n_rows += 1
+            state.steps += 1
+
+        if steps:
+            state.origins = times[:, -1]
+        return times, preds, regs_out
+
+    def forecast(self, df_history, horizon):
+        """Forecast ``horizon`` hours after the end of ``df_history``."""
+        state = self.init_state(df_history)
+        times, preds, _ = self.advance(state, horizon)
+        return pd.Series(preds[0], index=pd.DatetimeIndex(times[0]), name='Global_active_power_forecast')
+
+    def forecast_many(self, histories, horizon, id_col='meter_id'):
+        """Forecast every history in lockstep; returns a long frame (id_col, datetime, forecast)."""
+        state = self.init_batch(histories, id_col=id_col)
+        times, preds, _ = self.advance(state, horizon)
+        return pd.DataFrame({
+            id_col: np.repeat(np.asarray(state.keys, dtype=object), horizon),
+            'datetime': times.ravel(),
+            'Global_active_power_forecast': preds.ravel(),
+        })
+
+
+def recursive_forecast(df_history, model, features_list, horizon):
+    """Functional wrapper returning (forecast_series, df_future).
+
+    df_future holds the forecast target, the regressor values used at each
+    step and the derived Other_Consumption.
+    """
+    fc = RecursiveForecaster(model, features_list)
+    state = fc.init_state(df_history)
+    times, preds, regs = fc.advance(state, horizon)
+    return to_frames(times[0], preds[0], regs[0])
+
+
+def to_frames(times, preds, regs):
+    """(forecast_series, df_future) for one series' advance() output."""
+    future_index = pd.DatetimeIndex(times)
+    df_future = pd.DataFrame(regs, index=future_index, columns=REGRESSORS)
+    df_future[TARGET] = preds
+    subs = df_future['Sub_metering_1'] + df_future['Sub_metering_2'] + df_future['Sub_metering_3']
+    df_future['Other_Consumption'] = np.fmax(0.0, preds - subs.to_numpy())
+    forecast_series = pd.Series(preds, index=future_index, name='Global_active_power_forecast')
+    return forecast_series, df_future
+
+
+def batch_forecast(histories, model, features_list, horizon, id_col='meter_id'):
+    """Forecast many meters at once; see RecursiveForecaster.forecast_many."""
+    return RecursiveForecaster(model, features_list).forecast_many(histories, horizon, id_col=id_col)
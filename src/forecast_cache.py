@@ -0,0 +1,116 @@
+# src/forecast_cache.py
+"""
+Memory-bounded cache of recursive forecasts.
+
+A recursive forecast for h hours is the first h points of any longer run from
+the same history, model and feature list, so one entry per
+(history, model, features, origin) serves every horizon:
+- a shorter horizon is a slice of the cached arrays
+- a longer horizon resumes from the saved ForecastState instead of restarting
+
+Entries are evicted least-recently-used once their total size passes
+``max_bytes``.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from src import forecast
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+def history_key(df_history):
+    """Content hash of an hourly history (index, columns and values)."""
+    h = hashlib.sha1()
+    h.update(','.join(map(str, df_history.columns)).encode())
+    h.update(df_history.index.values.astype('datetime64[ns]').tobytes())
+    h.update(np.ascontiguousarray(df_history.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+class _Entry:
+    def __init__(self, times, preds, regs, state):
+        self.times = times
+        self.preds = preds
+        self.regs = regs
+        self.state = state      # recursion state after the last cached step
+
+    @property
+    def horizon(self):
+        return len(self.preds)
+
+    @property
+    def nbytes(self):
+        st = self.state
+        return (self.times.nbytes + self.preds.nbytes + self.regs.nbytes + st.rows.nbytes
+                + st.target._data.nbytes + st.regressors._data.nbytes)
+
+class ForecastCache:
+    """Thread-safe LRU of forecasts keyed on history, model, features and origin."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0           # served by slicing
+        self.extensions = 0     # resumed from a saved state
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def _key(self, forecaster, df_history, model_key):
+        return (history_key(df_history), model_key, tuple(forecaster.features_list), df_history.index.max())
+
+    def forecast(self, forecaster, df_history, horizon, model_key):
+        """(forecast_series, df_future) for ``horizon`` hours, reusing cached work.
+
+        ``model_key`` identifies the model weights, e.g. a fingerprint of the
+        model file; the forecaster's model is assumed to match it.
+        """
+        key = self._key(forecaster, df_history, model_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry.horizon >= horizon:
+            self.hits += 1
+            return forecast.to_frames(entry.times[:horizon], entry.preds[:horizon], entry.regs[:horizon])
+
+        if entry is None:
+            self.misses += 1
+            state = forecaster.init_state(df_history)
+            times, preds, regs = forecaster.advance(state, horizon)
+            entry = _Entry(times[0], preds[0], regs[0], state)
+        else:
+            self.extensions += 1
+            state = entry.state.copy()
+            times, preds, regs = forecaster.advance(state, horizon - entry.horizon)
+            entry = _Entry(np.concatenate([entry.times, times[0]]), np.concatenate([entry.preds, preds[0]]),
+                           np.concatenate([entry.regs, regs[0]]), state)
+        self._store(key, entry)
+        return forecast.to_frames(entry.times, entry.preds, entry.regs)
+
+    def _store(self, key, entry):
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if old.horizon >= entry.horizon:
+                    return
+                self._nbytes -= old.nbytes
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._nbytes += entry.nbytes
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
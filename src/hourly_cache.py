@@ -0,0 +1,130 @@
+# src/hourly_cache.py
+"""
+Binary, memory-mapped copy of the processed hourly dataset.
+
+Layout (directory next to the CSV, e.g. data/processed/df_hourly.cache/):
+- index.npy   int64 hours since the Unix epoch
+- values.npy  float64, shape (n_columns, n_hours): one contiguous row per column
+- meta.json   column names and the fingerprint of the CSV it was built from
+
+load_hourly() maps values.npy read-only and wraps it in a DataFrame without
+copying, so a warm load costs a few file opens instead of a CSV parse. The
+cache is rebuilt automatically when the CSV fingerprint changes. Frames
+returned from the cache are backed by read-only memory; copy() before
+modifying a column in place.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from src import tracing
+from src.config import PROCESSED_DATA_PATH
+
+CACHE_VERSION = 1
+_NS_PER_HOUR = 3600 * 1_000_000_000
+_SAMPLE_BYTES = 64 * 1024
+
+def epoch_hours(index):
+    """Whole hours since the Unix epoch for a DatetimeIndex or datetime64 array."""
+    ns = np.asarray(getattr(index, 'values', index), dtype='datetime64[ns]').view(np.int64)
+    if (ns % _NS_PER_HOUR).any():
+        raise ValueError("Hourly data needs timestamps aligned to whole hours.")
+    return ns // _NS_PER_HOUR
+
+def file_fingerprint(path):
+    """Cheap content fingerprint: size, mtime and the first/last 64 KB."""
+    st = os.stat(path)
+    h = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(_SAMPLE_BYTES))
+        if st.st_size > _SAMPLE_BYTES:
+            f.seek(max(_SAMPLE_BYTES, st.st_size - _SAMPLE_BYTES))
+            h.update(f.read())
+    return h.hexdigest()
+
+def file_stamp(path):
+    """(mtime_ns, size) of ``path``: a stat-only cache key for resources reloaded on change."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def cache_dir(csv_path=PROCESSED_DATA_PATH):
+    return os.path.splitext(csv_path)[0] + '.cache'
+
+def write_cache(df, csv_path=PROCESSED_DATA_PATH):
+    """Store ``df`` (hourly, DatetimeIndex) as the binary cache of ``csv_path``."""
+    hours = epoch_hours(df.index)
+    target = cache_dir(csv_path)
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'index.npy'), hours)
+    np.save(os.path.join(tmp, 'values.npy'), np.ascontiguousarray(df.to_numpy(dtype=np.float64).T))
+    meta = {
+        'version': CACHE_VERSION,
+        'columns': [str(c) for c in df.columns],
+        'index_name': df.index.name,
+        'source_fingerprint': file_fingerprint(csv_path),
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+def read_cache(csv_path=PROCESSED_DATA_PATH):
+    """Memory-mapped frame for ``csv_path``, or None if the cache is missing or stale.
+
+    The columns are a read-only view of values.npy: assigning into them raises
+    "assignment destination is read-only"; copy() first.
+    """
+    target = cache_dir(csv_path)
+    meta_path = os.path.join(target, 'meta.json')
+    if not (os.path.exists(meta_path) and os.path.exists(csv_path)):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION or meta.get('source_fingerprint') != file_fingerprint(csv_path):
+        return None
+    hours = np.load(os.path.join(target, 'index.npy'))
+    values = np.load(os.path.join(target, 'values.npy'), mmap_mode='r')
+    index = pd.DatetimeIndex((hours * _NS_PER_HOUR).view('datetime64[ns]'), name=meta['index_name'])
+    return pd.DataFrame(values.T, index=index, columns=meta['columns'], copy=False)
+
+@tracing.traced()
+def load_hourly(csv_path=PROCESSED_DATA_PATH):
+    """Processed hourly data, from the binary cache when it is current, else from the CSV.
+
+    A CSV read refreshes the cache so the next call is a warm load. A warm
+    load is read-only (see read_cache); copy() before modifying it.
+    """
+    df = read_cache(csv_path)
+    if df is not None:
+        return df
+    df = pd.read_csv(csv_path, parse_dates=['datetime'], index_col='datetime')
+    try:
+        write_cache(df, csv_path)
+    except (OSError, ValueError) as e:
+        print(f"Could not write hourly cache for {csv_path}: {e}")
+    return df
+
+def report_load_times(csv_path=PROCESSED_DATA_PATH, repeat=5):
+    """Print and return best-of-``repeat`` seconds for a CSV parse vs a warm cache load."""
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+    cold = best(lambda: pd.read_csv(csv_path, parse_dates=['datetime'], index_col='datetime'))
+    load_hourly(csv_path)
+    warm = best(lambda: read_cache(csv_path))
+    print(f"CSV parse: {cold * 1000:.1f} ms | binary cache: {warm * 1000:.2f} ms | "
+          f"speedup: {cold / max(warm, 1e-9):.0f}x")
+    return cold, warm
+
+if __name__ == "__main__":
+    report_load_times()
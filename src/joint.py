@@ -0,0 +1,209 @@
+# src/joint.py
+"""
+Joint recursive forecasting of the target and its regressors.
+
+The recursive forecaster copies last week's Sub_metering_1..3, Voltage and
+Global_intensity into every future hour. Here one multi-output XGBoost model
+predicts all six series (JOINT_TARGETS) for the next hour from their own
+lags and 24-hour means plus calendar features, so each step is one
+model.predict returning an (n_series, 6) matrix:
+
+- lags of every target come from one ring buffer of (n_series, 6) rows, one
+  slice per lag copied into the feature matrix
+- the 24-hour means are one mean over the buffer's last day
+- lags and means are taken by hour on the dense grid (src/dense.py), so
+  gaps in the history neither shift lags nor enter the means
+- Other_Consumption is derived from the predicted target and sub-meters
+
+- build_joint_training_set / train_joint: training through models.train_xgb
+- JointForecaster: serving, single series or a batch of meters
+- compare_heuristic: per-target RMSE and per-step latency against the
+  recursive forecaster's last-week copies
+
+Run: python -m src.joint [--compare]
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from src import dense, features, models
+from src.forecast import (RingBuffer, REGRESSORS, SUB_METERS, TIME_FEATURES, DAY, WEEK, RecursiveForecaster,
+                          _as_histories, _time_features, to_frames)
+from src.config import JOINT_MODEL_JSON_PATH, JOINT_MODEL_JOBLIB_PATH, JOINT_FEATURES_JSON_PATH
+
+TARGET = 'Global_active_power'
+JOINT_TARGETS = [TARGET] + REGRESSORS
+JOINT_LAGS = (1, 2, DAY, WEEK)
+
+def joint_feature_list():
+    return (list(TIME_FEATURES)
+            + [f'{c}_lag{lag}' for lag in JOINT_LAGS for c in JOINT_TARGETS]
+            + [f'{c}_roll{DAY}_mean' for c in JOINT_TARGETS])
+
+def build_joint_training_set(df_hourly):
+    """(X, Y, feature_list): features known before each hour and the six targets at that hour."""
+    df = df_hourly.sort_index()
+    values = df[JOINT_TARGETS].to_numpy(dtype=np.float64)
+    time_feats = _time_features(df.index.values)
+    cols = [np.column_stack([time_feats[f] for f in TIME_FEATURES])]
+    pos, n = dense.grid_positions(df.index)
+    grid = dense.to_grid(values, pos, n)
+    for lag in JOINT_LAGS:
+        src = pos - lag
+        cols.append(np.where((src >= 0)[:, None], grid[np.maximum(src, 0)], np.nan))
+    # mean of the DAY hours before each hour, missing hours skipped
+    missing = np.ones(n + 1, dtype=bool)
+    missing[0] = False      # before the data: incomplete, not skipped
+    missing[pos + 1] = False
+    prev = np.vstack([np.full((1, len(JOINT_TARGETS)), np.nan), grid])
+    means = np.column_stack([features.rolling_kernel(prev[:, t], windows=[DAY], skip=missing)[:, 0]
+                             for t in range(len(JOINT_TARGETS))])
+    cols.append(means[pos])
+    X = np.column_stack(cols)
+    ok = ~np.isnan(X).any(axis=1) & ~np.isnan(values).any(axis=1)
+    return X[ok], values[ok], joint_feature_list()
+
+def train_joint(df_hourly, path_json=JOINT_MODEL_JSON_PATH, path_joblib=JOINT_MODEL_JOBLIB_PATH,
+                features_path=JOINT_FEATURES_JSON_PATH, **params):
+    """Train and save the multi-output model and its feature list; returns (model, feature_list)."""
+    X, Y, feature_list = build_joint_training_set(df_hourly)
+    params.setdefault('tree_method', 'hist')
+    model = models.train_xgb(X, Y, path_json=path_json, path_joblib=path_joblib, **params)
+    models.save_features_list(feature_list, features_path)
+    return model, feature_list
+
+class JointForecaster:
+    """Hour-by-hour forecasts of all JOINT_TARGETS with one predict per step.
+
+    >>> fc = JointForecaster(model, features_list)
+    >>> series, df_future = fc.forecast(df_hourly, horizon=168)
+    """
+
+    def __init__(self, model, features_list):
+        self.model = model
+        self.features_list = list(features_list)
+        if self.features_list != joint_feature_list():
+            raise ValueError("Feature list was not produced by train_joint.")
+        n_targets = len(JOINT_TARGETS)
+        self._lag_start = len(TIME_FEATURES)
+        self._roll_start = self._lag_start + len(JOINT_LAGS) * n_targets
+        self._sub_idx = [JOINT_TARGETS.index(c) for c in SUB_METERS]
+
+    def init_batch(self, histories, id_col='meter_id'):
+        """(keys, buffer, origins): the last WEEK hours of every target per series."""
+        keys, frames = _as_histories(histories, id_col)
+        hist = np.full((WEEK, len(frames), len(JOINT_TARGETS)), np.nan)
+        origins = np.empty(len(frames), dtype='datetime64[ns]')
+        for j, df in enumerate(frames):
+            hist[:, j] = dense.tail_grid(df, JOINT_TARGETS, WEEK)
+            origins[j] = df.index[-1].to_datetime64()
+        return keys, RingBuffer(WEEK, shape=hist.shape[1:], values=hist), origins
+
+    def advance(self, buffer, origins, steps):
+        """Forecast ``steps`` hours; returns (times, preds) of shapes (n, steps) and (n, steps, 6)."""
+        n_series = len(origins)
+        n_targets = len(JOINT_TARGETS)
+        times = origins[:, None] + np.arange(1, steps + 1).astype('timedelta64[h]')[None, :]
+        time_feats = _time_features(times)
+        X = np.empty((n_series, len(self.features_list)), dtype=np.float64)
+        preds = np.empty((n_series, steps, n_targets), dtype=np.float64)
+        for k in range(steps):
+            for i, f in enumerate(TIME_FEATURES):
+                X[:, i] = time_feats[f][:, k]
+            for li, lag in enumerate(JOINT_LAGS):
+                start = self._lag_start + li * n_targets
+                X[:, start:start + n_targets] = buffer[-lag]
+            X[:, self._roll_start:] = buffer.tail(DAY).mean(axis=0)
+            Y = np.asarray(self.model.predict(np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)), dtype=np.float64)
+            Y = np.fmax(Y.reshape(n_series, n_targets), 0.0)
+            preds[:, k] = Y
+            buffer.append(Y)
+        return times, preds
+
+    def forecast(self, df_history, horizon):
+        """(forecast_series, df_future) like forecast.recursive_forecast, with forecast regressors."""
+        _, buffer, origins = self.init_batch({0: df_history})
+        times, preds = self.advance(buffer, origins, horizon)
+        regs = preds[0][:, [JOINT_TARGETS.index(c) for c in REGRESSORS]]
+        return to_frames(times[0], preds[0][:, 0], regs)
+
+    def forecast_many(self, histories, horizon, id_col='meter_id'):
+        """Forecast every history in lockstep; long frame with id_col, datetime and one column per target."""
+        keys, buffer, origins = self.init_batch(histories, id_col=id_col)
+        times, preds = self.advance(buffer, origins, horizon)
+        out = pd.DataFrame(preds.reshape(-1, len(JOINT_TARGETS)), columns=JOINT_TARGETS)
+        sub = preds[:, :, self._sub_idx].sum(axis=2).ravel()
+        out['Other_Consumption'] = np.fmax(0.0, out[TARGET].to_numpy() - sub)
+        out.insert(0, 'datetime', times.ravel())
+        out.insert(0, id_col, np.repeat(np.asarray(keys, dtype=object), horizon))
+        return out
+
+def compare_heuristic(df_hourly, joint_model, joint_features, recursive_model, recursive_features,
+                      horizon=168, n_origins=20):
+    """Per-target RMSE and per-step latency of joint vs recursive (last-week regressor copies).
+
+    Origins are spread over the last 90 days that leave ``horizon`` rows of
+    actuals, each with at least a week of history. Forecasts are scored
+    against the actuals at the same timestamps, skipping missing hours.
+    """
+    df_hourly = df_hourly.sort_index()
+    rec = RecursiveForecaster(recursive_model, recursive_features)
+    joint = JointForecaster(joint_model, joint_features)
+    last = len(df_hourly) - horizon
+    positions = np.linspace(max(WEEK, last - 24 * 90), last, n_origins).astype(int)
+    stats = {mode: {'seconds': 0.0, 'se': {c: 0.0 for c in JOINT_TARGETS}, 'n': {c: 0 for c in JOINT_TARGETS}}
+             for mode in ('heuristic', 'joint')}
+    for p in positions:
+        history = df_hourly.iloc[:p]
+        for mode, fc in (('heuristic', rec), ('joint', joint)):
+            start = time.perf_counter()
+            if mode == 'heuristic':
+                _, df_future = to_frames(*[a[0] for a in fc.advance(fc.init_state(history), horizon)])
+            else:
+                _, df_future = fc.forecast(history, horizon)
+            stats[mode]['seconds'] += time.perf_counter() - start
+            # actuals by timestamp: a gap after the origin shifts rows, not hours
+            actual = df_hourly.reindex(df_future.index)
+            for c in JOINT_TARGETS:
+                err = (df_future[c] - actual[c]).dropna().to_numpy()
+                stats[mode]['se'][c] += float(np.sum(err ** 2))
+                stats[mode]['n'][c] += len(err)
+    rows = {}
+    for mode, s in stats.items():
+        row = {f'rmse_{c}': np.sqrt(se / max(s['n'][c], 1)) for c, se in s['se'].items()}
+        row['step_ms'] = 1000 * s['seconds'] / (len(positions) * horizon)
+        rows[mode] = row
+    return pd.DataFrame(rows).T
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+    from src import hourly_cache
+    from src.config import PROCESSED_DATA_PATH
+    parser = argparse.ArgumentParser(description="Train the joint multi-target model, or compare it with the heuristic.")
+    parser.add_argument('--compare', action='store_true',
+                        help="train both on all but the last 120 days and compare on them")
+    parser.add_argument('--horizon', type=int, default=168)
+    parser.add_argument('--n-estimators', type=int, default=500)
+    args = parser.parse_args()
+
+    df = hourly_cache.load_hourly(PROCESSED_DATA_PATH)
+    if not args.compare:
+        train_joint(df, n_estimators=args.n_estimators)
+        print(f"Saved joint model to {JOINT_MODEL_JSON_PATH}")
+    else:
+        train = df.iloc[:-24 * 120]
+        with tempfile.TemporaryDirectory() as tmp:
+            feats = features.build_features(train)
+            rec_features = features.default_feature_list(feats)
+            models.train_xgb(feats[rec_features].values, feats[TARGET].values,
+                             os.path.join(tmp, 'rec.json'), os.path.join(tmp, 'rec.pkl'), n_estimators=args.n_estimators)
+            _, joint_features = train_joint(train, path_json=os.path.join(tmp, 'joint.json'),
+                                            path_joblib=os.path.join(tmp, 'joint.pkl'),
+                                            features_path=os.path.join(tmp, 'joint_features.json'),
+                                            n_estimators=args.n_estimators)
+            rec_model = models.load_model_xgb(os.path.join(tmp, 'rec.json'))
+            joint_model = models.load_model_xgb(os.path.join(tmp, 'joint.json'))
+        print(compare_heuristic(df, joint_model, joint_features, rec_model, rec_features, horizon=args.horizon)
+              .to_string(float_format=lambda v: f"{v:.4f}"))
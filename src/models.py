@@ -1,10 +1,14 @@
 import os
 import json
-import joblib
-from xgboost import XGBRegressor
+from src import tracing
 from src.config import MODEL_JSON_PATH, MODEL_JOBLIB_PATH, FEATURES_JSON_PATH
 
+# xgboost (which pulls in scikit-learn) and joblib are imported inside the
+# functions that need them, so importing this module stays cheap for the app.
+
 def train_xgb(X_train, y_train, path_json=MODEL_JSON_PATH, path_joblib=MODEL_JOBLIB_PATH, **params):
+    import joblib
+    from xgboost import XGBRegressor
     params_default = dict(
         n_estimators=500,
         learning_rate=0.05,
@@ -23,23 +27,47 @@ def train_xgb(X_train, y_train, path_json=MODEL_JSON_PATH, path_joblib=MODEL_JOB
     joblib.dump(model, path_joblib)
     return model
 
-import xgboost as xgb
-
 class XGBWrapper:
     def __init__(self, booster):
+        import xgboost as xgb
         self.booster = booster
-        
+        self._DMatrix = xgb.DMatrix
+
     def predict(self, X):
         # Ensure X is DMatrix compatible (numpy array or similar)
-        dmatrix = xgb.DMatrix(X)
-        return self.booster.predict(dmatrix)
+        with tracing.span('models.dmatrix'):
+            dmatrix = self._DMatrix(X)
+        with tracing.span('models.booster_predict'):
+            return self.booster.predict(dmatrix)
+
+BACKENDS = ('xgboost', 'numpy', 'auto')
+
+@tracing.traced()
+def load_model_xgb(path_json=MODEL_JSON_PATH, backend='xgboost'):
+    """Load the booster.
 
-def load_model_xgb(path_json=MODEL_JSON_PATH):
+    backend: 'xgboost' (DMatrix + booster.predict), 'numpy' (src/tree_eval.py,
+    no DMatrix; fastest for the small batches of the recursive loop) or
+    'auto' (numpy for small batches, xgboost for large ones; xgboost only
+    when the NumPy evaluator rejects the model, e.g. trees too deep to pad).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}")
     if not os.path.exists(path_json):
         raise FileNotFoundError(f"XGBoost model not found at {path_json}")
+    import xgboost as xgb
     # Load as native Booster to avoid sklearn compatibility issues
     booster = xgb.Booster()
     booster.load_model(path_json)
+    if backend == 'numpy':
+        from src.tree_eval import CompiledTrees
+        return CompiledTrees(booster)
+    if backend == 'auto':
+        from src.tree_eval import CompiledTrees, AUTO_MAX_ROWS
+        try:
+            return CompiledTrees(booster, max_rows=AUTO_MAX_ROWS)
+        except ValueError:
+            pass
     return XGBWrapper(booster)
 
 def save_features_list(feature_list, path=FEATURES_JSON_PATH):
@@ -2,13 +2,28 @@
 """
 Preprocessing: read raw .txt dataset, clean, convert to hourly dataframe,
 compute Other_Consumption (kWh) and save processed CSV to data/processed/df_hourly.csv
+
+Two ways to get there:
+- read_raw + preprocess_to_hourly: whole file in memory
+- stream_to_hourly: chunked read, memory bounded by ``chunksize`` rows
+- append_new_hours: only the raw rows after the last processed hour
+read_raw_fast is a drop-in replacement for read_raw that parses byte ranges
+of the file in a process pool.
 """
 
+import hashlib
+import io
+import json
 import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from src.config import RAW_DATA_PATH, PROCESSED_DATA_PATH
+from src import hourly_cache, tracing
 
+@tracing.traced()
 def read_raw(txt_path=RAW_DATA_PATH):
     if not os.path.exists(txt_path):
         raise FileNotFoundError(f"Raw file not found at {txt_path}. Place the raw file there.")
@@ -22,6 +37,92 @@ def read_raw(txt_path=RAW_DATA_PATH):
     )
     return df
 
+RAW_COLUMNS = ['Date', 'Time', 'Global_active_power', 'Global_reactive_power', 'Voltage',
+               'Global_intensity', 'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+_NS_PER_SECOND = 1_000_000_000
+_MIN_BYTES_PER_WORKER = 4 * 1024 * 1024
+
+def _decode_dates(dates):
+    """'d/m/yyyy' strings -> int64 ns at midnight. Parsed once per distinct day."""
+    codes, uniques = pd.factorize(dates)
+    parts = pd.Series(uniques).str.split('/', expand=True).astype(np.int64)
+    days = pd.to_datetime(pd.DataFrame({'year': parts[2], 'month': parts[1], 'day': parts[0]}))
+    return days.to_numpy(dtype='datetime64[ns]').view(np.int64)[codes]
+
+def _decode_times(times):
+    """'hh:mm:ss' strings -> int64 ns since midnight, by fixed character offsets."""
+    codes, uniques = pd.factorize(times)
+    b = np.asarray(uniques, dtype='S8').view(np.uint8).reshape(-1, 8).astype(np.int64) - ord('0')
+    seconds = (b[:, 0] * 10 + b[:, 1]) * 3600 + (b[:, 3] * 10 + b[:, 4]) * 60 + b[:, 6] * 10 + b[:, 7]
+    return (seconds * _NS_PER_SECOND)[codes]
+
+def _parse_range(args):
+    """Parse raw lines in [start, end) of the file into a read_raw-shaped frame."""
+    txt_path, start, end = args
+    with open(txt_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if not data.strip():
+        empty = {c: pd.Series(dtype=float) for c in RAW_COLUMNS[2:]}
+        return pd.DataFrame({'datetime': pd.Series(dtype='datetime64[ns]'), **empty})
+    df = pd.read_csv(io.BytesIO(data), sep=';', header=None, names=RAW_COLUMNS,
+                     na_values=['nan', '?'], dtype={'Date': str, 'Time': str})
+    ns = _decode_dates(df['Date'].to_numpy()) + _decode_times(df['Time'].to_numpy())
+    df = df.drop(columns=['Date', 'Time'])
+    df.insert(0, 'datetime', ns.view('datetime64[ns]'))
+    return df
+
+def _byte_ranges(txt_path, n_parts):
+    """Split the data lines (after the header) into ~n_parts newline-aligned byte ranges."""
+    size = os.path.getsize(txt_path)
+    with open(txt_path, 'rb') as f:
+        f.readline()
+        first = f.tell()
+        bounds = [first]
+        for i in range(1, n_parts):
+            pos = first + (size - first) * i // n_parts
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(txt_path, a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+@tracing.traced()
+def read_raw_fast(txt_path=RAW_DATA_PATH, n_workers=None, verbose=True):
+    """Parallel read_raw for the fixed UCI ``Date;Time;...`` layout.
+
+    The file is split into newline-aligned byte ranges parsed in a process
+    pool; dates and times are decoded once per distinct value with integer
+    arithmetic instead of generic datetime inference. '?' becomes NaN as in
+    read_raw.
+    """
+    if not os.path.exists(txt_path):
+        raise FileNotFoundError(f"Raw file not found at {txt_path}. Place the raw file there.")
+    start = time.perf_counter()
+    n_workers = n_workers or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, os.path.getsize(txt_path) // _MIN_BYTES_PER_WORKER))
+    ranges = _byte_ranges(txt_path, n_workers)
+    if n_workers == 1 or len(ranges) == 1:
+        parts = [_parse_range(r) for r in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parts = list(pool.map(_parse_range, ranges))
+    if parts:
+        df = pd.concat(parts, ignore_index=True)
+    else:
+        df = _parse_range((txt_path, 0, 0))
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"Parsed {len(df):,} raw rows in {elapsed:.2f}s "
+              f"({len(df) / max(elapsed, 1e-9):,.0f} rows/s, {len(ranges)} worker(s))")
+    return df
+
+@tracing.traced()
 def preprocess_to_hourly(df):
     # ensure numeric
     cols_num = ['Global_active_power','Global_reactive_power','Voltage',
@@ -59,17 +160,272 @@ def preprocess_to_hourly(df):
     df_hourly = df_hourly.dropna()
     return df_hourly
 
-def process_and_save(raw_path=RAW_DATA_PATH, out_path=PROCESSED_DATA_PATH, force=False):
+RAW_DATETIME_FORMAT = '%d/%m/%Y %H:%M:%S'
+DEFAULT_CHUNKSIZE = 500_000
+
+def iter_raw_chunks(txt_path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, offset=0):
+    """Yield the raw file as frames of at most ``chunksize`` rows, shaped like read_raw output.
+
+    A non-zero ``offset`` must be the byte position of a data line; reading starts there.
+    """
+    if not os.path.exists(txt_path):
+        raise FileNotFoundError(f"Raw file not found at {txt_path}. Place the raw file there.")
+    with open(txt_path, 'rb') as f:
+        f.seek(offset)
+        if offset and not f.read(1):
+            return
+        f.seek(offset)
+        header = dict(header=None, names=RAW_COLUMNS) if offset else {}
+        reader = pd.read_csv(f, sep=';', na_values=['nan', '?'], chunksize=chunksize,
+                             dtype={'Date': str, 'Time': str}, **header)
+        for chunk in reader:
+            dt = pd.to_datetime(chunk['Date'] + ' ' + chunk['Time'], format=RAW_DATETIME_FORMAT)
+            chunk = chunk.drop(columns=['Date', 'Time'])
+            chunk.insert(0, 'datetime', dt)
+            yield chunk
+
+def stream_to_hourly(txt_path=RAW_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, offset=0):
+    """Yield finished hourly frames while reading the raw file in chunks.
+
+    Minutes of the last (possibly incomplete) hour of a chunk are held back and
+    aggregated together with the next chunk, so every hour is computed from all
+    of its minutes in one go and the result equals preprocess_to_hourly on the
+    whole file. The raw file must be in time order, as the UCI file is.
+    """
+    carry = None
+    for chunk in iter_raw_chunks(txt_path, chunksize=chunksize, offset=offset):
+        if carry is not None and len(carry):
+            if chunk['datetime'].min() < carry['datetime'].min().floor('h'):
+                raise ValueError("Raw file is not sorted by time; use the in-memory reader instead.")
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        hours = chunk['datetime'].dt.floor('h')
+        done = (hours < hours.max()).to_numpy()
+        carry = chunk.loc[~done].copy()
+        if done.any():
+            df_hourly = preprocess_to_hourly(chunk.loc[done].copy())
+            if len(df_hourly):
+                yield df_hourly
+    if carry is not None and len(carry):
+        df_hourly = preprocess_to_hourly(carry)
+        if len(df_hourly):
+            yield df_hourly
+
+HOURLY_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _write_parts(f, parts, header):
+    """Write hourly parts as they arrive, keeping none of them; returns the row count."""
+    n_rows = 0
+    for i, df_part in enumerate(parts):
+        # fixed date format: a part holding only midnight hours would otherwise print dates only
+        df_part.to_csv(f, header=header and i == 0, date_format=HOURLY_DATETIME_FORMAT)
+        n_rows += len(df_part)
+    return n_rows
+
+def _stream_and_save(raw_path, out_path, chunksize):
+    # write to a temp file so an interrupted run never leaves a truncated CSV behind
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        n_rows = _write_parts(f, stream_to_hourly(raw_path, chunksize=chunksize), header=True)
+    os.replace(tmp_path, out_path)
+    return n_rows
+
+def _read_hours_from(out_path, offset):
+    """Rows of the processed CSV from byte ``offset`` (a line start past the header) to the end."""
+    with open(out_path, 'rb') as f:
+        columns = f.readline().decode().rstrip('\r\n').split(',')
+        f.seek(offset)
+        return pd.read_csv(f, header=None, names=columns, parse_dates=[columns[0]], index_col=columns[0])
+
+# ---------------------------------------------------------------------------
+# Incremental refresh
+#
+# The watermark next to the processed CSV records where the last raw hour
+# starts in the raw file and where its row starts in the CSV. That hour may
+# still be receiving minutes, so the next refresh cuts its row off the CSV,
+# re-reads the raw file from the start of that hour and appends.
+#
+# Validation is cheap, not exhaustive: only the first 64 KB of the raw file
+# before the boundary are hashed, so an in-place edit further in that keeps
+# the file size is not detected. Rebuild with incremental=False after
+# rewriting old raw rows.
+# ---------------------------------------------------------------------------
+
+_TAIL_BLOCK = 64 * 1024
+
+def watermark_path(out_path=PROCESSED_DATA_PATH):
+    return os.path.splitext(out_path)[0] + '.watermark.json'
+
+def _head_digest(path, n=_TAIL_BLOCK):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(n)).hexdigest()
+
+def _tail_lines(path, data_start, stop):
+    """Yield (offset, line) for complete lines of ``path`` backwards from the end.
+
+    ``stop(line)`` ends the scan once it returns True.
+    """
+    size = os.path.getsize(path)
+    block = _TAIL_BLOCK
+    with open(path, 'rb') as f:
+        while True:
+            start = max(data_start, size - block)
+            f.seek(start)
+            data = f.read(size - start)
+            lines = data.split(b'\n')
+            offsets = [start]
+            for line in lines[:-1]:
+                offsets.append(offsets[-1] + len(line) + 1)
+            pairs = list(zip(offsets, lines))
+            if start > data_start:
+                pairs = pairs[1:]   # first piece may be a partial line
+            for off, line in reversed(pairs):
+                if line.strip() and stop(line):
+                    return off, line
+            if start == data_start:
+                return None, None
+            block *= 4
+
+def _raw_line_hour(line):
+    date, clock = line.decode().strip().split(';')[:2]
+    return datetime.strptime(f"{date} {clock}", RAW_DATETIME_FORMAT).replace(minute=0, second=0)
+
+def _last_raw_hour(raw_path):
+    """(byte offset of the first line of the last hour, that hour) in the raw file."""
+    with open(raw_path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+    _, last_line = _tail_lines(raw_path, data_start, lambda line: True)
+    if last_line is None:
+        return data_start, None
+    last_hour = _raw_line_hour(last_line)
+    before, line = _tail_lines(raw_path, data_start, lambda line: _raw_line_hour(line) < last_hour)
+    if before is None:
+        return data_start, last_hour
+    return before + len(line) + 1, last_hour
+
+def _save_watermark(raw_path, out_path):
+    raw_offset, last_hour = _last_raw_hour(raw_path)
+    csv_offset = os.path.getsize(out_path)
+    if last_hour is not None:
+        off, line = _tail_lines(out_path, 0, lambda line: True)
+        if off is not None and line.decode().split(',')[0] == last_hour.strftime(HOURLY_DATETIME_FORMAT):
+            csv_offset = off
+    wm = {
+        'last_hour': last_hour.strftime(HOURLY_DATETIME_FORMAT) if last_hour else None,
+        'raw_offset': raw_offset,
+        'raw_size': os.path.getsize(raw_path),
+        'raw_head_len': min(_TAIL_BLOCK, raw_offset),
+        'raw_head_sha1': _head_digest(raw_path, min(_TAIL_BLOCK, raw_offset)),
+        'csv_offset': csv_offset,
+        'csv_size': os.path.getsize(out_path),
+    }
+    with open(watermark_path(out_path), 'w') as f:
+        json.dump(wm, f, indent=2)
+    return wm
+
+def load_watermark(raw_path=RAW_DATA_PATH, out_path=PROCESSED_DATA_PATH):
+    """The saved watermark, or None if it is missing or no longer matches the files.
+
+    Checks the CSV size, that the raw file did not shrink and the hash of the
+    raw file's first 64 KB; edits past those 64 KB go unnoticed.
+    """
+    path = watermark_path(out_path)
+    if not (os.path.exists(path) and os.path.exists(out_path) and os.path.exists(raw_path)):
+        return None
+    with open(path) as f:
+        wm = json.load(f)
+    if (os.path.getsize(out_path) != wm['csv_size']
+            or os.path.getsize(raw_path) < wm['raw_size']
+            or _head_digest(raw_path, wm['raw_head_len']) != wm['raw_head_sha1']):
+        return None
+    return wm
+
+def append_new_hours(raw_path=RAW_DATA_PATH, out_path=PROCESSED_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Bring ``out_path`` up to date with the raw file, reading only rows past the watermark.
+
+    Falls back to a full streaming build when there is no valid watermark.
+    Returns the hours written by this call (the recomputed boundary hour first).
+    """
+    wm = load_watermark(raw_path, out_path)
+    if wm is None or wm['csv_offset'] == 0:
+        os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+        _stream_and_save(raw_path, out_path, chunksize)
+        _save_watermark(raw_path, out_path)
+        return hourly_cache.load_hourly(out_path).copy()
+    with open(out_path, 'r+', newline='') as f:
+        f.truncate(wm['csv_offset'])
+        f.seek(wm['csv_offset'])
+        _write_parts(f, stream_to_hourly(raw_path, chunksize=chunksize, offset=wm['raw_offset']), header=False)
+    _save_watermark(raw_path, out_path)
+    # only the appended rows are read back; the binary cache is rebuilt on the next load
+    return _read_hours_from(out_path, wm['csv_offset'])
+
+@tracing.traced()
+def process_and_save(raw_path=RAW_DATA_PATH, out_path=PROCESSED_DATA_PATH, force=False,
+                     stream=False, chunksize=DEFAULT_CHUNKSIZE, fast=False, n_workers=None,
+                     incremental=False):
+    """Build df_hourly.csv from the raw file.
+
+    With ``stream=True`` the raw file is read ``chunksize`` rows at a time and
+    finished hours are appended to ``out_path`` as they complete. With
+    ``fast=True`` the whole file is parsed by read_raw_fast on ``n_workers``
+    processes. With ``incremental=True`` only raw rows after the saved
+    watermark are processed and appended (see append_new_hours); the hours
+    written by this call are returned and the binary cache is rebuilt on the
+    next load.
+
+    The returned frame is an ordinary writable DataFrame; use
+    hourly_cache.load_hourly for the zero-copy, read-only memory-mapped view.
+    """
+    if stream and fast:
+        raise ValueError("stream and fast are separate readers; pick one.")
+    if incremental:
+        df_new = append_new_hours(raw_path, out_path, chunksize=chunksize)
+        print(f"Appended {len(df_new)} hour(s) to {out_path}")
+        return df_new
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     if os.path.exists(out_path) and not force:
         print(f"Processed file already exists at {out_path}. Use force=True to reprocess.")
-        return pd.read_csv(out_path, parse_dates=['datetime'], index_col='datetime')
-    df_raw = read_raw(raw_path)
-    df_hourly = preprocess_to_hourly(df_raw)
-    df_hourly.to_csv(out_path)
+        return hourly_cache.load_hourly(out_path).copy()
+    if stream:
+        _stream_and_save(raw_path, out_path, chunksize)
+    else:
+        df_raw = read_raw_fast(raw_path, n_workers=n_workers) if fast else read_raw(raw_path)
+        preprocess_to_hourly(df_raw).to_csv(out_path)
+        del df_raw
+    # rebuild the binary cache from the CSV itself and return that, so every
+    # path (and the streaming one without holding its output) gives identical values
+    df_hourly = hourly_cache.load_hourly(out_path).copy()
     print(f"Saved processed hourly data to {out_path} (shape: {df_hourly.shape})")
     return df_hourly
 
+def compare_readers(raw_path=RAW_DATA_PATH, n_workers=None):
+    """Time read_raw against read_raw_fast on the same file and print rows/s for both."""
+    start = time.perf_counter()
+    df_slow = read_raw(raw_path)
+    slow = time.perf_counter() - start
+    print(f"read_raw: {len(df_slow):,} rows in {slow:.2f}s ({len(df_slow) / max(slow, 1e-9):,.0f} rows/s)")
+    start = time.perf_counter()
+    df_fast = read_raw_fast(raw_path, n_workers=n_workers, verbose=False)
+    fast = time.perf_counter() - start
+    print(f"read_raw_fast: {len(df_fast):,} rows in {fast:.2f}s ({len(df_fast) / max(fast, 1e-9):,.0f} rows/s)")
+    print(f"speedup: {slow / max(fast, 1e-9):.1f}x")
+    return slow, fast
+
 if __name__ == "__main__":
-    process_and_save()
+    import argparse
+    parser = argparse.ArgumentParser(description="Build data/processed/df_hourly.csv from the raw file.")
+    parser.add_argument('--force', action='store_true', help="reprocess even if the output exists")
+    parser.add_argument('--stream', action='store_true', help="chunked read with bounded memory")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--fast', action='store_true', help="parallel byte-range parser")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--incremental', action='store_true', help="append hours past the saved watermark")
+    parser.add_argument('--compare-readers', action='store_true', help="only time read_raw vs read_raw_fast")
+    args = parser.parse_args()
+    if args.compare_readers:
+        compare_readers(n_workers=args.workers)
+    else:
+        process_and_save(force=args.force, stream=args.stream, chunksize=args.chunksize,
+                         fast=args.fast, n_workers=args.workers, incremental=args.incremental)
 
@@ -0,0 +1,149 @@
+# src/probabilistic.py
+"""
+Probabilistic recursive forecasts by residual bootstrap.
+
+A ResidualPool holds one-step residuals (actual - forecast), from the model's
+fit on the training features (fit_residuals) or from the first step of a
+backtest (from_backtest). ProbabilisticForecaster repeats one history's
+forecast state ``n_paths`` times and advances all paths together with
+RecursiveForecaster.advance: each step is one model.predict on an
+(n_paths, n_features) matrix, and a resampled residual is added to every
+path before it feeds the lags and rolling window of the next step. Quantiles
+over the paths give the P10/P50/P90 bands.
+
+Residuals are drawn from the same hour of day as the forecast hour when
+every hour has at least MIN_PER_HOUR of them. In-sample residuals are
+narrower than out-of-sample ones, so prefer from_backtest when a backtest is
+available.
+
+Run: python -m src.probabilistic --paths 1,10,100,1000
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from src import features, tracing
+from src.forecast import ForecastState, RecursiveForecaster
+
+TARGET = 'Global_active_power'
+DEFAULT_PATHS = 200
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+MIN_PER_HOUR = 20
+
+class ResidualPool:
+    """One-step residuals, grouped by hour of day for sampling."""
+
+    def __init__(self, residuals, times=None):
+        residuals = np.asarray(residuals, dtype=np.float64).ravel()
+        keep = np.isfinite(residuals)
+        if not keep.any():
+            raise ValueError("No finite residuals to bootstrap from.")
+        self.residuals = residuals[keep]
+        self.by_hour = False
+        if times is not None:
+            hours = pd.DatetimeIndex(np.asarray(times).ravel()[keep]).hour.to_numpy()
+            counts = np.bincount(hours, minlength=24)
+            if counts.min() >= MIN_PER_HOUR:
+                order = np.argsort(hours, kind='stable')
+                self.residuals = self.residuals[order]
+                self._start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                self._count = counts
+                self.by_hour = True
+
+    def __len__(self):
+        return len(self.residuals)
+
+    def sample(self, rng, times, n_paths):
+        """Residuals of shape (n_paths, len(times)) for forecast hours ``times``."""
+        u = rng.random((n_paths, len(times)))
+        if not self.by_hour:
+            return self.residuals[(u * len(self.residuals)).astype(np.intp)]
+        hours = pd.DatetimeIndex(times).hour.to_numpy()
+        idx = self._start[hours] + (u * self._count[hours]).astype(np.intp)
+        return self.residuals[idx]
+
+def fit_residuals(model, features_list, df_hourly=None, store=None, last_hours=None):
+    """ResidualPool of the model's one-step errors on the training features.
+
+    Rows come from ``store`` (a synced FeatureStore) or build_features(df_hourly);
+    ``last_hours`` limits them to the most recent hours.
+    """
+    if store is not None:
+        df = store.training_frame(features_list)
+    else:
+        df = features.build_features(df_hourly)
+    if last_hours:
+        df = df.iloc[-last_hours:]
+    preds = model.predict(df[list(features_list)].to_numpy(dtype=np.float64))
+    return ResidualPool(df[TARGET].to_numpy(dtype=np.float64) - preds, df.index.values)
+
+def from_backtest(result):
+    """ResidualPool from the first forecast step of a backtest.run_backtest result."""
+    return ResidualPool(result['residuals'][:, 0], result['times'][:, 0])
+
+class ProbabilisticForecaster:
+    """Quantile bands from ``n_paths`` bootstrap paths advanced in lockstep.
+
+    >>> pf = ProbabilisticForecaster(RecursiveForecaster(model, features_list), pool)
+    >>> bands = pf.forecast(df_hourly, horizon=168)      # columns p10, p50, p90, mean
+    """
+
+    def __init__(self, forecaster, pool, n_paths=DEFAULT_PATHS, quantiles=DEFAULT_QUANTILES, seed=0):
+        self.forecaster = forecaster
+        self.pool = pool
+        self.n_paths = int(n_paths)
+        self.quantiles = tuple(quantiles)
+        self.seed = seed
+
+    def paths(self, df_history, horizon):
+        """(times, paths) with shapes (horizon,) and (n_paths, horizon)."""
+        state = self.forecaster.init_state(df_history)
+        batch = ForecastState.stack([state] * self.n_paths)
+        times = state.origins[0] + np.arange(1, horizon + 1).astype('timedelta64[h]')
+        noise = self.pool.sample(np.random.default_rng(self.seed), times, self.n_paths)
+        _, paths, _ = self.forecaster.advance(batch, horizon, noise=noise)
+        return times, paths
+
+    @tracing.traced('probabilistic.forecast')
+    def forecast(self, df_history, horizon):
+        """Frame indexed by forecast hour with one column per quantile (p10, p50, p90) and the path mean."""
+        times, paths = self.paths(df_history, horizon)
+        bands = np.quantile(paths, self.quantiles, axis=0)
+        out = pd.DataFrame({f'p{round(q * 100):d}': b for q, b in zip(self.quantiles, bands)},
+                           index=pd.DatetimeIndex(times, name='datetime'))
+        out['mean'] = paths.mean(axis=0)
+        return out
+
+def scaling_report(model, features_list, df_history, pool, path_counts=(1, 10, 100, 1000), horizon=168):
+    """Time forecast() for each path count against K independent single-path runs."""
+    fc = RecursiveForecaster(model, features_list)
+    ProbabilisticForecaster(fc, pool, n_paths=1).forecast(df_history, horizon)   # warm-up
+    rows = []
+    for k in path_counts:
+        start = time.perf_counter()
+        ProbabilisticForecaster(fc, pool, n_paths=k).forecast(df_history, horizon)
+        seconds = time.perf_counter() - start
+        rows.append({'paths': k, 'seconds': seconds, 'ms_per_path': 1000 * seconds / k})
+    report = pd.DataFrame(rows).set_index('paths')
+    # K sequential runs would cost K times the single-path time
+    report['vs_sequential'] = report.index * report['seconds'].iloc[0] / report['seconds']
+    print(report.to_string(float_format=lambda v: f"{v:.3f}"))
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    from src import hourly_cache, models
+    from src.config import PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH
+    parser = argparse.ArgumentParser(description="Monte Carlo forecast bands and their cost per path count.")
+    parser.add_argument('--data', default=PROCESSED_DATA_PATH)
+    parser.add_argument('--model', default=MODEL_JSON_PATH)
+    parser.add_argument('--features', default=FEATURES_JSON_PATH)
+    parser.add_argument('--backend', default='auto', choices=models.BACKENDS)
+    parser.add_argument('--paths', default='1,10,100,1000')
+    parser.add_argument('--horizon', type=int, default=168)
+    args = parser.parse_args()
+    df = hourly_cache.load_hourly(args.data)
+    model = models.load_model_xgb(args.model, backend=args.backend)
+    feature_list = models.load_features_list(args.features)
+    pool = fit_residuals(model, feature_list, df, last_hours=24 * 365)
+    scaling_report(model, feature_list, df, pool, [int(k) for k in args.paths.split(',')], args.horizon)
@@ -0,0 +1,230 @@
+# src/pyramid.py
+"""
+Multi-resolution history for full-range charts.
+
+HistoryPyramid keeps per-day and per-week (Monday-aligned) aggregates of the
+hourly series, with mean, min and max per bucket, in one .npz per level next
+to the processed CSV (data/processed/df_hourly.pyramid/). sync() recomputes
+only the buckets from the last stored (possibly partial) day or week onwards
+when new hours arrive, and rebuilds when earlier hours changed.
+
+view(start, end, budget) returns what the chart draws for a visible range,
+at most ``budget`` points in total:
+- a line: the raw hours when they fit in half the budget, otherwise the
+  hours reduced with LTTB (largest triangle three buckets, which keeps peaks
+  and troughs a plain stride would drop), or the finest level's means when
+  the range holds more than LTTB_MAX_ROWS hours
+- an envelope: min/max of the finest level with at most a quarter of the
+  budget buckets in the range (None when the raw hours are shown)
+
+Run: python -m src.pyramid [--rebuild]
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from src import hourly_cache, tracing
+from src.hourly_cache import _NS_PER_HOUR, epoch_hours
+from src.forecast_cache import history_key
+from src.config import PROCESSED_DATA_PATH
+
+TARGET = 'Global_active_power'
+# level name -> bucket width in hours
+LEVELS = {'day': 24, 'week': 168}
+# 1970-01-01 was a Thursday; shifting by 3 days starts weeks on Monday
+_OFFSETS = {'day': 0, 'week': 72}
+DEFAULT_POINT_BUDGET = 6000
+LTTB_MAX_ROWS = 500_000
+
+def aggregate(hours, values, width, offset=0):
+    """Bucket start hours and per-bucket mean/min/max/count of ``values`` (NaN-aware).
+
+    ``hours`` must be sorted; empty buckets are not returned.
+    """
+    bucket = (hours + offset) // width
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    valid = ~np.isnan(values)
+    count = np.add.reduceat(valid.astype(np.int64), starts)
+    total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    lo = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+    hi = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+    empty = count == 0
+    lo[empty] = np.nan
+    hi[empty] = np.nan
+    return {'start': bucket[starts] * width - offset, 'mean': mean, 'min': lo, 'max': hi, 'count': count}
+
+def lttb(x, y, n_out):
+    """Indices of the ``n_out`` points LTTB keeps from (x, y); x increasing, y without NaN."""
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # the first and last points are kept; the rest is split into n_out - 2 buckets,
+    # each compared against the average of the bucket after it (the last point for the last one)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    sizes = np.diff(np.r_[edges, n])
+    avg_x = np.add.reduceat(x, edges) / sizes
+    avg_y = np.add.reduceat(y, edges) / sizes
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        # twice the area of the triangle (a, candidate, next bucket average)
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+class HistoryPyramid:
+    """Day and week aggregates of an hourly series, extended as hours arrive."""
+
+    def __init__(self, csv_path=PROCESSED_DATA_PATH, columns=(TARGET,), root=None):
+        self.csv_path = csv_path
+        self.columns = list(columns)
+        self.path = root or os.path.splitext(csv_path)[0] + '.pyramid'
+        self.levels = {}
+        self.hourly = None
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _read(self):
+        if not os.path.exists(self._meta_path()):
+            return None
+        with open(self._meta_path()) as f:
+            meta = json.load(f)
+        if meta.get('columns') != self.columns or meta.get('levels') != LEVELS:
+            return None
+        try:
+            levels = {}
+            for name in LEVELS:
+                with np.load(os.path.join(self.path, f'{name}.npz')) as z:
+                    levels[name] = {k: z[k] for k in z.files}
+        except (OSError, ValueError):
+            return None
+        return meta, levels
+
+    @tracing.traced('pyramid.sync')
+    def sync(self, df_hourly=None, verbose=True):
+        """Bring the levels up to date with the source; returns 'current', 'extended' or 'built'."""
+        df = (hourly_cache.load_hourly(self.csv_path) if df_hourly is None else df_hourly).sort_index()
+        self.hourly = df[self.columns]
+        n = len(df)
+        stored = self._read()
+        status = 'built'
+        if stored is not None:
+            meta, levels = stored
+            n_old = meta['n_rows']
+            if n_old == n and history_key(self.hourly) == meta['digest']:
+                self.levels = levels
+                return 'current'
+            if 0 < n_old <= n and history_key(self.hourly.iloc[:n_old]) == meta['digest']:
+                self.levels = {name: self._extend(levels[name], name) for name in LEVELS}
+                status = 'extended'
+        if status == 'built':
+            self.levels = {name: self._aggregate(self.hourly, name) for name in LEVELS}
+        self._write(n)
+        if verbose:
+            sizes = ', '.join(f"{len(self.levels[name]['start'])} {name}s" for name in LEVELS)
+            print(f"History pyramid {status}: {n} hours -> {sizes} ({self.path})")
+        return status
+
+    def _aggregate(self, frame, name):
+        hours = epoch_hours(frame.index)
+        level = {}
+        for col in self.columns:
+            agg = aggregate(hours, frame[col].to_numpy(dtype=np.float64), LEVELS[name], _OFFSETS[name])
+            level['start'] = agg.pop('start')
+            level.update({f'{col}:{stat}': v for stat, v in agg.items()})
+        return level
+
+    def _extend(self, level, name):
+        # the last stored bucket may have been partial: recompute from its start
+        keep = len(level['start']) - 1
+        first = level['start'][keep] if keep >= 0 else np.iinfo(np.int64).min
+        pos = np.searchsorted(epoch_hours(self.hourly.index), first)
+        tail = self._aggregate(self.hourly.iloc[pos:], name)
+        return {k: np.concatenate([v[:keep], tail[k]]) for k, v in level.items()}
+
+    def _write(self, n):
+        os.makedirs(self.path, exist_ok=True)
+        for name, level in self.levels.items():
+            tmp = os.path.join(self.path, f'{name}.tmp.npz')
+            np.savez(tmp, **level)
+            os.replace(tmp, os.path.join(self.path, f'{name}.npz'))
+        meta = {'columns': self.columns, 'levels': LEVELS, 'n_rows': n, 'digest': history_key(self.hourly),
+                'start': str(self.hourly.index[0]) if n else None, 'end': str(self.hourly.index[-1]) if n else None}
+        with open(self._meta_path() + '.tmp', 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(self._meta_path() + '.tmp', self._meta_path())
+
+    def level_frame(self, name, column=TARGET):
+        """Aggregates of one level as a frame indexed by bucket start."""
+        level = self.levels[name]
+        index = pd.DatetimeIndex((level['start'] * _NS_PER_HOUR).view('datetime64[ns]'), name='datetime')
+        return pd.DataFrame({stat: level[f'{column}:{stat}'] for stat in ('mean', 'min', 'max', 'count')},
+                            index=index)
+
+    @tracing.traced('pyramid.view')
+    def view(self, start=None, end=None, budget=DEFAULT_POINT_BUDGET, column=TARGET):
+        """(line, envelope, level) for the visible range [start, end].
+
+        line is a Series; envelope a frame with min/max columns or None; level
+        names the resolution of the envelope ('hour' when raw hours are drawn).
+        """
+        if self.hourly is None:
+            raise RuntimeError("Call sync() before view().")
+        series = self.hourly[column]
+        lo = series.index.searchsorted(pd.Timestamp(start)) if start is not None else 0
+        hi = series.index.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(series)
+        window = series.iloc[lo:hi]
+        line_budget, env_budget = budget // 2, budget // 4
+        if len(window) <= line_budget:
+            return window, None, 'hour'
+
+        first, last = window.index[0], window.index[-1]
+        level = None
+        for name in LEVELS:
+            frame = self.level_frame(name, column)
+            frame = frame.loc[(frame.index + pd.Timedelta(hours=LEVELS[name]) > first) & (frame.index <= last)]
+            if len(frame) <= env_budget:
+                level = name
+                break
+        # coarsest level still too long: merge neighbouring buckets
+        if level is None:
+            step = -(-len(frame) // env_budget)
+            merged = frame.groupby(np.arange(len(frame)) // step).agg({'min': 'min', 'max': 'max', 'mean': 'mean'})
+            merged.index = frame.index[::step]
+            frame, level = merged, f'{step} {name}s'
+        envelope = frame[['min', 'max']]
+
+        values = window.to_numpy(dtype=np.float64)
+        finite = ~np.isnan(values)
+        if len(window) <= LTTB_MAX_ROWS:
+            x = epoch_hours(window.index)[finite]
+            keep = lttb(x, values[finite], line_budget)
+            line = window[finite].iloc[keep]
+        else:
+            means = frame['mean'].dropna()
+            line = means.iloc[lttb(epoch_hours(means.index), means.to_numpy(), line_budget)]
+        return line, envelope, level
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+    parser = argparse.ArgumentParser(description="Build or extend the downsampled history pyramid.")
+    parser.add_argument('--csv', default=PROCESSED_DATA_PATH)
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args()
+    pyramid = HistoryPyramid(args.csv)
+    if args.rebuild:
+        shutil.rmtree(pyramid.path, ignore_errors=True)
+    pyramid.sync()
@@ -0,0 +1,322 @@
+# src/service.py
+"""
+Headless HTTP forecasting service (standard library only).
+
+The booster, the feature list and one ready-to-run ForecastState per meter stay
+in memory. Requests that arrive within ``window_ms`` of each other are
+coalesced by a MicroBatcher into one lockstep batch, so every horizon step is a
+single model.predict for all of them. When a direct model (src/direct.py) is
+loaded, ``mode=direct`` answers from one vectorized predict over the horizon.
+
+Endpoints:
+- GET  /forecast?meter_id=default&horizon=168[&mode=direct]
+- POST /forecast  {"meter_id": "default", "horizon": 168, "mode": "recursive"}
+- GET  /metrics   latency percentiles, throughput and batching counters (JSON)
+- GET  /health
+
+Run: python -m src.service --port 8600
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from src import forecast, hourly_cache, models
+from src.feature_store import FeatureStore
+from src.direct import DirectForecaster
+from src.config import (PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH, DEFAULT_FORECAST_HORIZON,
+                        DIRECT_MODEL_JSON_PATH, DIRECT_FEATURES_JSON_PATH)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8600
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 1024
+MAX_HORIZON = 24 * 30
+DEFAULT_METER = 'default'
+MODES = ('recursive', 'direct')
+
+class Metrics:
+    """Request latencies (last ``keep`` requests) and running counters."""
+
+    def __init__(self, keep=10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=keep)
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.series_hours = 0
+        self.predict_calls = 0
+
+    def record_request(self, seconds, ok=True):
+        with self._lock:
+            self.requests += 1
+            self.errors += not ok
+            self._latencies.append(seconds)
+
+    def record_batch(self, n_series, horizon, predict_calls=None):
+        """``predict_calls`` defaults to ``horizon`` (one call per recursive step)."""
+        with self._lock:
+            self.batches += 1
+            self.series_hours += n_series * horizon
+            self.predict_calls += horizon if predict_calls is None else predict_calls
+
+    def snapshot(self):
+        with self._lock:
+            lat = np.array(self._latencies) * 1000.0
+            uptime = time.monotonic() - self.started
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99]) if len(lat) else (0.0, 0.0, 0.0)
+            return {
+                'uptime_s': round(uptime, 3),
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'predict_calls': self.predict_calls,
+                'series_hours': self.series_hours,
+                'requests_per_s': round(self.requests / uptime, 2) if uptime else 0.0,
+                'series_hours_per_s': round(self.series_hours / uptime, 1) if uptime else 0.0,
+                'latency_ms': {'p50': round(float(p50), 3), 'p90': round(float(p90), 3),
+                               'p99': round(float(p99), 3), 'max': round(float(lat.max()), 3) if len(lat) else 0.0},
+            }
+
+class MicroBatcher:
+    """Collects forecast requests for up to ``window_ms`` and runs them as one batch."""
+
+    def __init__(self, forecaster, states, metrics, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.forecaster = forecaster
+        self.states = states            # meter_id -> single-series ForecastState at the history end
+        self.metrics = metrics
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='forecast-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, meter_id, horizon):
+        if meter_id not in self.states:
+            raise KeyError(f"Unknown meter_id {meter_id!r}")
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+        fut = Future()
+        self._queue.put((meter_id, horizon, fut))
+        return fut
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch):
+        try:
+            meters = list(dict.fromkeys(m for m, _, _ in batch))   # one row per meter, first-seen order
+            horizon = max(h for _, h, _ in batch)
+            state = forecast.ForecastState.stack([self.states[m] for m in meters])
+            times, preds, _ = self.forecaster.advance(state, horizon)
+            self.metrics.record_batch(len(meters), horizon)
+            row = {m: j for j, m in enumerate(meters)}
+            for meter_id, h, fut in batch:
+                j = row[meter_id]
+                fut.set_result((times[j, :h], preds[j, :h]))
+        except Exception as e:     # hand the failure to every waiting request
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+class ForecastService:
+    """Model, per-meter states, batcher and metrics; independent of the HTTP layer."""
+
+    def __init__(self, model, features_list, histories, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 direct=None, store=None):
+        _check_feature_count(model, features_list)
+        self.forecaster = forecast.RecursiveForecaster(model, features_list, store=store)
+        self.states = {key: self.forecaster.init_batch({key: df}) for key, df in histories.items()}
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(self.forecaster, self.states, self.metrics, window_ms, max_batch)
+        self.direct = direct
+        self.origins = {}
+        if direct is not None:
+            _check_feature_count(direct.model, direct.features_list)
+            self.origins = {key: direct.origin_row(df) for key, df in histories.items()}
+
+    def _direct(self, meter_id, horizon):
+        if self.direct is None:
+            raise ValueError("No direct model loaded; use mode=recursive.")
+        if meter_id not in self.origins:
+            raise KeyError(f"Unknown meter_id {meter_id!r}")
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+        row, origin = self.origins[meter_id]
+        times, preds = self.direct.forecast_rows(row[None, :], [origin.to_datetime64()], horizon)
+        self.metrics.record_batch(1, horizon, predict_calls=1)
+        return times[0], preds[0]
+
+    def forecast(self, meter_id=DEFAULT_METER, horizon=DEFAULT_FORECAST_HORIZON, mode='recursive', timeout=30.0):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        start = time.perf_counter()
+        ok = False
+        try:
+            if mode == 'direct':
+                times, preds = self._direct(meter_id, int(horizon))
+            else:
+                times, preds = self.batcher.submit(meter_id, int(horizon)).result(timeout=timeout)
+            ok = True
+        finally:
+            self.metrics.record_request(time.perf_counter() - start, ok=ok)
+        return {
+            'meter_id': meter_id,
+            'mode': mode,
+            'datetime': [str(t) for t in times.astype('datetime64[s]')],
+            'forecast': preds.tolist(),
+        }
+
+    def close(self):
+        self.batcher.stop()
+
+def _check_feature_count(model, features_list):
+    n_model = getattr(getattr(model, 'booster', None), 'num_features', lambda: None)()
+    if n_model is not None and n_model != len(features_list):
+        raise ValueError(f"Model expects {n_model} features but the feature list has {len(features_list)}.")
+
+def load_histories(path=PROCESSED_DATA_PATH, id_col='meter_id'):
+    """{meter_id: hourly frame} from a processed CSV (single meter unless it has ``id_col``)."""
+    df = hourly_cache.load_hourly(path)
+    if id_col in df.columns:
+        return {k: g.drop(columns=id_col) for k, g in df.groupby(id_col, sort=False)}
+    return {DEFAULT_METER: df}
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):   # keep the hot path quiet
+            pass
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _forecast(self, params):
+            try:
+                meter_id = str(params.get('meter_id', DEFAULT_METER))
+                horizon = int(params.get('horizon', DEFAULT_FORECAST_HORIZON))
+                mode = str(params.get('mode', 'recursive'))
+                self._send(200, service.forecast(meter_id, horizon, mode=mode))
+            except KeyError as e:
+                self._send(404, {'error': str(e)})
+            except ValueError as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/forecast':
+                self._forecast({k: v[0] for k, v in parse_qs(url.query).items()})
+            elif url.path == '/metrics':
+                self._send(200, service.metrics.snapshot())
+            elif url.path == '/health':
+                self._send(200, {'status': 'ok', 'meters': len(service.states)})
+            else:
+                self._send(404, {'error': f"no route {url.path}"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/forecast':
+                self._send(404, {'error': f"no route {self.path}"})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                params = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                self._send(400, {'error': f"invalid JSON: {e}"})
+                return
+            self._forecast(params)
+
+    return Handler
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128    # default of 5 drops SYNs under bursts and adds 1 s client retries
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = _Server((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve recursive forecasts over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data', default=PROCESSED_DATA_PATH)
+    parser.add_argument('--model', default=MODEL_JSON_PATH)
+    parser.add_argument('--features', default=FEATURES_JSON_PATH)
+    parser.add_argument('--direct-model', default=DIRECT_MODEL_JSON_PATH, help="loaded if the file exists")
+    parser.add_argument('--direct-features', default=DIRECT_FEATURES_JSON_PATH)
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--no-feature-store', action='store_true', help="recompute seed features from the history")
+    args = parser.parse_args()
+
+    direct = None
+    if os.path.exists(args.direct_model):
+        direct = DirectForecaster(models.load_model_xgb(args.direct_model), models.load_features_list(args.direct_features))
+    histories = load_histories(args.data)
+    store = None
+    if not args.no_feature_store and list(histories) == [DEFAULT_METER]:
+        store = FeatureStore(args.data)
+        store.sync(histories[DEFAULT_METER])
+    service = ForecastService(models.load_model_xgb(args.model), models.load_features_list(args.features),
+                              histories, window_ms=args.window_ms, max_batch=args.max_batch,
+                              direct=direct, store=store)
+    server = make_server(service, args.host, args.port)
+    print(f"Forecast service on http://{args.host}:{server.server_address[1]} "
+          f"({len(service.states)} meter(s), batch window {args.window_ms} ms, "
+          f"direct mode {'on' if direct else 'off'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# src/tracing.py
+"""
+Lightweight stage tracing for the forecasting hot paths.
+
+    with tracing.span('features.build_features'):
+        ...
+
+    @tracing.traced('pyramid.view')
+    def view(...): ...
+
+Per stage name it records the call count, cumulative and percentile latency
+(over the last ``KEEP`` calls) and, when enabled with ``memory=True``, the
+net bytes allocated (tracemalloc). snapshot() returns the numbers, to_json()
+and to_prometheus() export them.
+
+Tracing is off unless FORECAST_TRACE=1 or enable() is called. While off, span()
+returns a shared no-op context manager and traced() wrappers call straight
+through after one flag check, so instrumented code pays well under a
+microsecond per call.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from functools import wraps
+import numpy as np
+
+KEEP = 4096
+_NULL = contextlib.nullcontext()
+
+class _Config:
+    enabled = os.environ.get('FORECAST_TRACE', '') == '1'
+    memory = False
+    owns_tracemalloc = False    # only stop tracemalloc if enable() started it
+
+_config = _Config()
+
+class _Stage:
+    __slots__ = ('calls', 'total', 'latencies', 'alloc')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.latencies = deque(maxlen=KEEP)
+        self.alloc = 0
+
+_lock = threading.Lock()
+_stages = {}
+
+def enable(flag=True, memory=False):
+    """Turn tracing on or off; ``memory=True`` also tracks allocations (much slower)."""
+    _config.enabled = bool(flag)
+    _config.memory = bool(flag and memory)
+    if _config.memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _config.owns_tracemalloc = True
+    elif not _config.memory and _config.owns_tracemalloc:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _config.owns_tracemalloc = False
+
+def is_enabled():
+    return _config.enabled
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+def _record(name, seconds, alloc):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = _Stage()
+        stage.calls += 1
+        stage.total += seconds
+        stage.latencies.append(seconds)
+        stage.alloc += alloc
+
+class _Span:
+    __slots__ = ('name', 'start', 'mem')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.mem = tracemalloc.get_traced_memory()[0] if _config.memory else 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        alloc = tracemalloc.get_traced_memory()[0] - self.mem if _config.memory else 0
+        _record(self.name, elapsed, alloc)
+        return False
+
+def span(name):
+    """Context manager timing the block as stage ``name`` (no-op while disabled)."""
+    return _Span(name) if _config.enabled else _NULL
+
+def traced(name=None):
+    """Decorator timing every call as stage ``name`` (default: module.qualname)."""
+    def decorate(fn):
+        stage = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _config.enabled:
+                return fn(*args, **kwargs)
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def snapshot():
+    """{stage: stats} with latencies in milliseconds, sorted by cumulative time."""
+    with _lock:
+        items = [(n, s.calls, s.total, np.array(s.latencies), s.alloc) for n, s in _stages.items()]
+    out = {}
+    for name, calls, total, lat, alloc in sorted(items, key=lambda t: -t[2]):
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99]) * 1000 if len(lat) else (0.0, 0.0, 0.0)
+        out[name] = {
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / calls, 4) if calls else 0.0,
+            'p50_ms': round(float(p50), 4),
+            'p90_ms': round(float(p90), 4),
+            'p99_ms': round(float(p99), 4),
+            'alloc_bytes': int(alloc),
+        }
+    return out
+
+def to_json(indent=2):
+    return json.dumps({'enabled': _config.enabled, 'memory': _config.memory, 'stages': snapshot()}, indent=indent)
+
+def to_prometheus(prefix='forecast_stage'):
+    """Prometheus text exposition of snapshot(): counters plus a latency summary per stage."""
+    snap = snapshot()
+    lines = [
+        f"# HELP {prefix}_calls_total Calls per traced stage.",
+        f"# TYPE {prefix}_calls_total counter",
+    ]
+    lines += [f'{prefix}_calls_total{{stage="{n}"}} {s["calls"]}' for n, s in snap.items()]
+    lines += [f"# HELP {prefix}_seconds Latency per traced stage (recent calls).",
+              f"# TYPE {prefix}_seconds summary"]
+    for n, s in snap.items():
+        for q, key in (('0.5', 'p50_ms'), ('0.9', 'p90_ms'), ('0.99', 'p99_ms')):
+            lines.append(f'{prefix}_seconds{{stage="{n}",quantile="{q}"}} {s[key] / 1000:.9f}')
+        lines.append(f'{prefix}_seconds_sum{{stage="{n}"}} {s["total_ms"] / 1000:.9f}')
+        lines.append(f'{prefix}_seconds_count{{stage="{n}"}} {s["calls"]}')
+    lines += [f"# HELP {prefix}_alloc_bytes_total Net bytes allocated per traced stage.",
+              f"# TYPE {prefix}_alloc_bytes_total counter"]
+    lines += [f'{prefix}_alloc_bytes_total{{stage="{n}"}} {s["alloc_bytes"]}' for n, s in snap.items()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,256 @@
+# src/train.py
+"""
+Training pipeline: cached training matrix, time-series hyperparameter search
+with early stopping, and export of the winning model with its feature list.
+
+1. Features come from the feature store (src/feature_store.py), the same
+   stored matrix serving reads; X/y are written as an XGBoost binary DMatrix
+   under data/processed/train_cache/, keyed by the data and feature list.
+   Later runs and every search worker load that file instead of rebuilding;
+   writing a new key removes the entries of older ones.
+2. The last ``holdout`` fraction of hours is kept aside. Each candidate is
+   scored on expanding-window folds of the earlier hours (train on blocks
+   0..k, validate on block k+1) with early stopping on the validation block.
+3. Candidates run on a process pool with a fixed xgboost thread budget per
+   worker (workers x threads <= CPUs).
+4. The best candidate is retrained on everything before the holdout for the
+   round count early stopping chose on its last (largest) fold, scored once
+   on the untouched holdout, and saved as JSON with features_list.json and a
+   report.
+
+Run: python -m src.train --trials 16 --workers 4
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from src import features, hourly_cache, models
+from src.feature_store import FeatureStore
+from src.forecast_cache import history_key
+from src.config import (PROCESSED_DATA_PATH, MODEL_JSON_PATH, FEATURES_JSON_PATH, TRAIN_CACHE_DIR,
+                        TRAIN_REPORT_PATH)
+
+TARGET = 'Global_active_power'
+SEARCH_SPACE = {
+    'max_depth': [4, 6, 8],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'subsample': [0.7, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 5, 10],
+    'reg_lambda': [1.0, 5.0],
+}
+BASE_PARAMS = {'objective': 'reg:squarederror', 'eval_metric': 'rmse', 'tree_method': 'hist', 'verbosity': 0}
+MAX_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 50
+
+# ---------------------------------------------------------------------------
+# Training matrix cache
+# ---------------------------------------------------------------------------
+
+def training_matrix(df_hourly, features_list=None, cache_dir=TRAIN_CACHE_DIR, store=None):
+    """Path of the cached binary DMatrix for ``df_hourly`` and its feature list.
+
+    With a synced FeatureStore for ``df_hourly`` the rows are read from it
+    instead of running build_features. Returns (buffer_path, features_list,
+    n_rows). Rows are in time order.
+    """
+    df_hourly = df_hourly.sort_index()
+    key_src = history_key(df_hourly) + '|' + ','.join(features_list or ['<default>'])
+    if store is not None:
+        key_src += '|' + store.version
+    key = hashlib.sha1(key_src.encode()).hexdigest()[:16]
+    buffer_path = os.path.join(cache_dir, f'{key}.buffer')
+    meta_path = os.path.join(cache_dir, f'{key}.json')
+    if os.path.exists(buffer_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return buffer_path, meta['features_list'], meta['n_rows']
+
+    if store is not None:
+        if features_list is None:
+            features_list = features.default_feature_list(pd.DataFrame(columns=store.columns))
+        df = store.training_frame(features_list)
+    else:
+        df = features.build_features(df_hourly)
+        if features_list is None:
+            features_list = features.default_feature_list(df)
+    # no feature_names: the saved booster must predict on the plain arrays the serving paths pass
+    dmat = xgb.DMatrix(df[features_list].to_numpy(dtype=np.float32), label=df[TARGET].to_numpy(dtype=np.float32))
+    os.makedirs(cache_dir, exist_ok=True)
+    dmat.save_binary(buffer_path + '.tmp')
+    os.replace(buffer_path + '.tmp', buffer_path)
+    with open(meta_path, 'w') as f:
+        json.dump({'features_list': list(features_list), 'n_rows': len(df),
+                   'start': str(df.index[0]), 'end': str(df.index[-1])}, f, indent=2)
+    _remove_stale(cache_dir, key)
+    return buffer_path, list(features_list), len(df)
+
+def _remove_stale(cache_dir, key):
+    """Delete cached matrices of other data or feature lists; only ``key`` is kept."""
+    for name in os.listdir(cache_dir):
+        if name.split('.', 1)[0] != key and name.endswith(('.buffer', '.json', '.tmp')):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def sample_params(n_trials, seed=42, space=SEARCH_SPACE):
+    """``n_trials`` distinct random configurations from ``space``."""
+    rng = np.random.default_rng(seed)
+    n_total = int(np.prod([len(v) for v in space.values()]))
+    picks = rng.choice(n_total, size=min(n_trials, n_total), replace=False)
+    trials = []
+    for p in picks:
+        params = {}
+        for name, values in space.items():
+            p, i = divmod(int(p), len(values))
+            params[name] = values[i]
+        trials.append(params)
+    return trials
+
+def fold_bounds(n_rows, n_folds=3, holdout=0.1):
+    """(train_end, valid_end) row bounds of the expanding folds, and the holdout start."""
+    holdout_start = int(n_rows * (1 - holdout))
+    block = holdout_start // (n_folds + 1)
+    if block < 1:
+        raise ValueError(f"Too few rows ({n_rows}) for {n_folds} folds.")
+    folds = [(block * (k + 1), block * (k + 2)) for k in range(n_folds)]
+    return folds, holdout_start
+
+_worker = {}
+
+def _init_worker(buffer_path, nthread):
+    _worker['dmat'] = xgb.DMatrix(buffer_path)
+    _worker['nthread'] = nthread
+
+def _fit(dmat, params, train_rows, valid_rows, nthread, max_rounds, early_stopping_rounds):
+    """Early-stopped on ``valid_rows``, or exactly ``max_rounds`` trees when it is None."""
+    dtrain = dmat.slice(train_rows)
+    if valid_rows is None:
+        return xgb.train({**BASE_PARAMS, **params, 'nthread': nthread}, dtrain, num_boost_round=max_rounds)
+    booster = xgb.train({**BASE_PARAMS, **params, 'nthread': nthread}, dtrain, num_boost_round=max_rounds,
+                        evals=[(dmat.slice(valid_rows), 'valid')], early_stopping_rounds=early_stopping_rounds,
+                        verbose_eval=False)
+    return booster
+
+def _run_trial(args):
+    params, folds, max_rounds, early_stopping_rounds = args
+    dmat, nthread = _worker['dmat'], _worker['nthread']
+    start = time.perf_counter()
+    scores, rounds = [], []
+    for train_end, valid_end in folds:
+        booster = _fit(dmat, params, np.arange(train_end), np.arange(train_end, valid_end),
+                       nthread, max_rounds, early_stopping_rounds)
+        scores.append(booster.best_score)
+        rounds.append(booster.best_iteration + 1)
+    return {'params': params, 'rmse': float(np.mean(scores)), 'fold_rmse': [float(s) for s in scores],
+            'rounds': rounds, 'seconds': round(time.perf_counter() - start, 3)}
+
+def search(buffer_path, n_rows, n_trials=12, n_workers=None, threads_per_worker=None, n_folds=3, holdout=0.1,
+           max_rounds=MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS, seed=42, verbose=True):
+    """Score ``n_trials`` sampled configurations; returns trial dicts, best first."""
+    cpus = os.cpu_count() or 1
+    trials = sample_params(n_trials, seed=seed)
+    n_workers = max(1, min(n_workers or cpus, len(trials)))
+    nthread = threads_per_worker or max(1, cpus // n_workers)
+    folds, _ = fold_bounds(n_rows, n_folds, holdout)
+    tasks = [(params, folds, max_rounds, early_stopping_rounds) for params in trials]
+    if n_workers == 1:
+        _init_worker(buffer_path, nthread)
+        try:
+            results = [_run_trial(t) for t in tasks]
+        finally:
+            _worker.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(buffer_path, nthread)) as pool:
+            results = list(pool.map(_run_trial, tasks))
+    results.sort(key=lambda r: r['rmse'])
+    if verbose:
+        for r in results:
+            print(f"rmse {r['rmse']:.4f} rounds {r['rounds']} {r['seconds']:6.1f}s {r['params']}")
+    return results
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def train_pipeline(df_hourly=None, features_list=None, n_trials=12, n_workers=None, threads_per_worker=None,
+                   n_folds=3, holdout=0.1, max_rounds=MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                   model_path=MODEL_JSON_PATH, features_path=FEATURES_JSON_PATH, report_path=TRAIN_REPORT_PATH,
+                   cache_dir=TRAIN_CACHE_DIR, seed=42, verbose=True):
+    """Search, retrain the winner up to the holdout and save model, feature list and report.
+
+    The holdout is never used for early stopping, so ``holdout_rmse`` is an
+    unbiased score of the saved model.
+
+    Returns (booster, features_list, report).
+    """
+    start = time.perf_counter()
+    store = None
+    if df_hourly is None:
+        df_hourly = hourly_cache.load_hourly(PROCESSED_DATA_PATH)
+        store = FeatureStore(PROCESSED_DATA_PATH)
+        store.sync(df_hourly, verbose=verbose)
+    buffer_path, features_list, n_rows = training_matrix(df_hourly, features_list, cache_dir, store)
+    results = search(buffer_path, n_rows, n_trials, n_workers, threads_per_worker, n_folds, holdout,
+                     max_rounds, early_stopping_rounds, seed, verbose)
+    best = results[0]
+
+    _, holdout_start = fold_bounds(n_rows, n_folds, holdout)
+    dmat = xgb.DMatrix(buffer_path)
+    # round count from the last fold, whose training blocks are closest in size to the final fit
+    booster = _fit(dmat, best['params'], np.arange(holdout_start), None,
+                   threads_per_worker or os.cpu_count() or 1, best['rounds'][-1], early_stopping_rounds)
+    holdout_rmse = float(booster.eval(dmat.slice(np.arange(holdout_start, n_rows))).split(':')[-1])
+    booster.feature_names = None    # matrices cached before names were dropped still carry them
+
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    booster.save_model(model_path)
+    models.save_features_list(features_list, features_path)
+    report = {
+        'best_params': best['params'],
+        'search_rmse': best['rmse'],
+        'holdout_rmse': holdout_rmse,
+        'n_trees': booster.num_boosted_rounds(),
+        'n_rows': n_rows,
+        'holdout_rows': n_rows - holdout_start,
+        'features': len(features_list),
+        'feature_version': store.version[:16] if store is not None else None,
+        'seconds': round(time.perf_counter() - start, 2),
+        'trials': results,
+    }
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if verbose:
+        print(f"Best {best['params']} | search RMSE {best['rmse']:.4f} | holdout RMSE {report['holdout_rmse']:.4f} "
+              f"| {report['n_trees']} trees | saved {model_path} and {features_path}")
+    return booster, features_list, report
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Hyperparameter search and training for the forecasting model.")
+    parser.add_argument('--trials', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threads-per-worker', type=int, default=None)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--holdout', type=float, default=0.1, help="fraction of the latest hours held out")
+    parser.add_argument('--max-rounds', type=int, default=MAX_ROUNDS)
+    parser.add_argument('--early-stopping', type=int, default=EARLY_STOPPING_ROUNDS)
+    parser.add_argument('--model', default=MODEL_JSON_PATH)
+    parser.add_argument('--features', default=FEATURES_JSON_PATH)
+    args = parser.parse_args()
+    train_pipeline(n_trials=args.trials, n_workers=args.workers, threads_per_worker=args.threads_per_worker,
+                   n_folds=args.folds, holdout=args.holdout, max_rounds=args.max_rounds,
+                   early_stopping_rounds=args.early_stopping, model_path=args.model, features_path=args.features)
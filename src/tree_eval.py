@@ -0,0 +1,158 @@
+# src/tree_eval.py
+"""
+Pure-NumPy evaluator for XGBoost tree ensembles.
+
+XGBWrapper.predict builds an xgb.DMatrix on every call, which dominates the
+cost of the 1-row (or n_series-row) predictions made at each recursive step.
+CompiledTrees reads the booster's JSON once and flattens every tree into one
+set of node tables (feature index, float32 threshold, left/right child,
+default-left flag for missing values, leaf value). Prediction walks all trees
+for all rows at once: each round moves the (rows, trees) cursor matrix one
+level down, and leaves point to themselves so finished trees stay put.
+
+Supports gbtree models with numerical splits, one output and an identity
+objective (reg:squarederror and friends); anything else raises ValueError.
+Select it with models.load_model_xgb(path, backend='numpy'); backend='auto'
+uses it up to AUTO_MAX_ROWS rows per call and the booster above that.
+
+Every tree is padded to a complete heap of the ensemble's depth, so the
+tables grow as n_trees * 2**depth. Ensembles deeper than MAX_DEPTH or whose
+padded tables exceed MAX_TABLE_BYTES are rejected (backend='auto' then keeps
+the booster).
+"""
+
+import json
+import numpy as np
+import xgboost as xgb
+from src import tracing
+
+# objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:squaredlogerror', 'reg:absoluteerror',
+                       'reg:pseudohubererror', 'reg:quantileerror'}
+DEFAULT_CHUNK_ROWS = 256
+# backend='auto' hands batches larger than this to xgboost, which is faster there
+AUTO_MAX_ROWS = 1024
+MAX_DEPTH = 12
+# padded node + leaf tables; 500 trees of depth 12 take about 41 MB
+MAX_TABLE_BYTES = 256 * 2 ** 20
+
+def _parse_float(value):
+    # xgboost >= 2 writes base_score as e.g. "[1.0798546E0]"
+    return float(str(value).strip('[]'))
+
+class CompiledTrees:
+    """Flat node tables for an XGBoost booster, evaluated with NumPy."""
+
+    def __init__(self, booster, chunk_rows=DEFAULT_CHUNK_ROWS, max_rows=None):
+        self.booster = booster      # kept for num_features(), set_param() and large batches
+        self.chunk_rows = chunk_rows
+        self.max_rows = max_rows    # larger batches go to booster.predict (None: never)
+        learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objective {objective!r} is not supported by the NumPy evaluator.")
+        params = learner['learner_model_param']
+        if int(params.get('num_class', 0)) > 1 or int(params.get('num_target', 1)) > 1:
+            raise ValueError("Multi-output models are not supported by the NumPy evaluator.")
+        gb = learner['gradient_booster']
+        if gb['name'] != 'gbtree':
+            raise ValueError(f"Booster type {gb['name']!r} is not supported by the NumPy evaluator.")
+        self.base_score = _parse_float(params['base_score'])
+        self.n_features = int(params['num_feature'])
+        self._compile(gb['model']['trees'])
+
+    def _compile(self, trees):
+        if not trees:
+            raise ValueError("Booster has no trees.")
+        self.depth = max(_tree_depth(np.asarray(t['left_children']), np.asarray(t['right_children'])) for t in trees)
+        if self.depth > MAX_DEPTH:
+            raise ValueError(f"Trees deeper than {MAX_DEPTH} are not supported by the NumPy evaluator.")
+        n_trees = len(trees)
+        n_inner, n_leaves = 2 ** self.depth - 1, 2 ** self.depth
+        # feature (intp) + threshold (float32) + default_left (bool) per inner node, float64 per leaf
+        table_bytes = n_trees * (n_inner * (np.dtype(np.intp).itemsize + 4 + 1) + n_leaves * 8)
+        if table_bytes > MAX_TABLE_BYTES:
+            raise ValueError(f"Padded tree tables would take {table_bytes / 2 ** 20:.0f} MB "
+                             f"(limit {MAX_TABLE_BYTES / 2 ** 20:.0f} MB) in the NumPy evaluator.")
+        # every tree becomes a complete binary tree in heap order (children of i at
+        # 2i+1 and 2i+2); a leaf above the bottom level is repeated down to it
+        self.feature = np.zeros((n_trees, n_inner), dtype=np.intp)
+        self.threshold = np.zeros((n_trees, n_inner), dtype=np.float32)
+        self.default_left = np.ones((n_trees, n_inner), dtype=bool)
+        self.leaf_value = np.zeros((n_trees, n_leaves), dtype=np.float64)
+        for t, tree in enumerate(trees):
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported by the NumPy evaluator.")
+            left, right = tree['left_children'], tree['right_children']
+            cond, split, dleft = tree['split_conditions'], tree['split_indices'], tree['default_left']
+            stack = [(0, 0, 0)]     # (node id, heap position, level)
+            while stack:
+                node, pos, level = stack.pop()
+                if left[node] == -1:
+                    first = pos
+                    for _ in range(self.depth - level):
+                        first = 2 * first + 1
+                    span = 2 ** (self.depth - level)
+                    self.leaf_value[t, first - n_inner:first - n_inner + span] = cond[node]
+                    continue
+                self.feature[t, pos] = split[node]
+                self.threshold[t, pos] = cond[node]
+                self.default_left[t, pos] = bool(dleft[node])
+                stack.append((left[node], 2 * pos + 1, level + 1))
+                stack.append((right[node], 2 * pos + 2, level + 1))
+        self._n_inner = n_inner
+        # flat views used by _predict_chunk
+        self._feature = self.feature.ravel()
+        self._threshold = self.threshold.ravel()
+        self._default_right = ~self.default_left.ravel()
+        self._leaf_value = self.leaf_value.ravel()
+        self._tree_base = np.arange(n_trees, dtype=np.intp) * n_inner
+        self._leaf_base = np.arange(n_trees, dtype=np.intp) * n_leaves - n_inner
+
+    @property
+    def n_trees(self):
+        return len(self.feature)
+
+    def _predict_chunk(self, X):
+        n = len(X)
+        row_base = (np.arange(n, dtype=np.intp) * X.shape[1])[:, None]
+        flat_x = X.ravel()
+        pos = np.zeros((n, self.n_trees), dtype=np.intp)
+        for _ in range(self.depth):
+            node = self._tree_base + pos
+            x = np.take(flat_x, row_base + np.take(self._feature, node))
+            right = np.where(np.isnan(x), np.take(self._default_right, node), x >= np.take(self._threshold, node))
+            pos = 2 * pos + 1 + right
+        return np.take(self._leaf_value, self._leaf_base + pos).sum(axis=1) + self.base_score
+
+    @tracing.traced('tree_eval.predict')
+    def predict(self, X):
+        """Predictions for a 2-D array of rows; float32 like booster.predict."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Model expects {self.n_features} features, got {X.shape[1]}.")
+        if self.max_rows is not None and len(X) > self.max_rows:
+            return self.booster.predict(xgb.DMatrix(X, feature_names=self.booster.feature_names))
+        if len(X) <= self.chunk_rows:
+            return self._predict_chunk(X).astype(np.float32)
+        out = np.empty(len(X), dtype=np.float32)
+        for i in range(0, len(X), self.chunk_rows):
+            out[i:i + self.chunk_rows] = self._predict_chunk(X[i:i + self.chunk_rows])
+        return out
+
+def _tree_depth(left, right):
+    """Number of splits on the longest root-to-leaf path."""
+    depth = np.zeros(len(left), dtype=np.int64)
+    best = 0
+    stack = [0]
+    while stack:
+        i = stack.pop()
+        if left[i] == -1:
+            best = max(best, depth[i])
+            continue
+        for child in (left[i], right[i]):
+            depth[child] = depth[i] + 1
+            stack.append(child)
+    return int(best)
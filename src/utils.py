@@ -3,11 +3,10 @@
 Helper utilities for plotting and IO used by the app.
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
 
 def plot_history_and_forecast(history_series, forecast_series, savepath=None, title="History + Forecast"):
+    import matplotlib.pyplot as plt     # heavy; only needed for static plots
     plt.figure(figsize=(14,5))
     plt.plot(history_series.index, history_series.values, label='History', linewidth=2)
     plt.plot(forecast_series.index, forecast_series.values, label='Forecast', linewidth=2, linestyle='--')
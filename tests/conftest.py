@@ -0,0 +1,45 @@
+import pytest
+import pandas as pd
+import numpy as np
+from xgboost import XGBRegressor
+from src import features, models
+
+FEATURES = [
+    'hour','day','weekday','weekofyear','month','year','is_weekend',
+    'lag1','lag24','lag168',
+    'roll24_mean','roll24_std','roll24_sum','roll168_mean',
+    'Sub_metering_1','Sub_metering_2','Sub_metering_3',
+    'Voltage','Global_intensity','Global_reactive_power','Other_Consumption'
+]
+
+def make_hourly(n_hours=600, start='2009-01-01', seed=0):
+    """Synthetic hourly frame with the same columns as df_hourly.csv."""
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start=start, periods=n_hours, freq='h', name='datetime')
+    hour = idx.hour.to_numpy()
+    gap = 1.0 + 0.8 * np.sin(2 * np.pi * hour / 24) + 0.2 * rng.random(n_hours)
+    df = pd.DataFrame({
+        'Voltage': 240 + rng.random(n_hours),
+        'Global_intensity': gap * 4.2,
+        'Global_active_power': gap,
+        'Global_reactive_power': 0.1 * rng.random(n_hours),
+        'Sub_metering_1': 0.1 * rng.random(n_hours),
+        'Sub_metering_2': 0.1 * rng.random(n_hours),
+        'Sub_metering_3': 0.3 * rng.random(n_hours),
+    }, index=idx)
+    df['Other_Consumption'] = (df['Global_active_power'] - df[['Sub_metering_1','Sub_metering_2','Sub_metering_3']].sum(axis=1)).clip(lower=0)
+    return df
+
+@pytest.fixture(scope='session')
+def hourly_df():
+    return make_hourly()
+
+@pytest.fixture(scope='session')
+def small_model(hourly_df, tmp_path_factory):
+    """A tiny booster trained on FEATURES, loaded the same way the app loads it."""
+    df = features.add_rollings(features.add_lags(features.add_time_features(hourly_df)), windows=[24, 168]).dropna()
+    reg = XGBRegressor(n_estimators=20, max_depth=4, verbosity=0)
+    reg.fit(df[FEATURES].values, df['Global_active_power'].values)
+    path = str(tmp_path_factory.mktemp('model') / 'model.json')
+    reg.save_model(path)
+    return models.load_model_xgb(path)
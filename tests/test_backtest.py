@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from xgboost import XGBRegressor
+from src import backtest, features, models
+from src.forecast import RecursiveForecaster
+from tests.conftest import FEATURES, make_hourly
+
+@pytest.fixture(scope='module')
+def assets(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('backtest')
+    df = make_hourly(n_hours=900, seed=5)
+    csv_path = str(tmp / 'df_hourly.csv')
+    df.to_csv(csv_path)
+    feats = features.build_features(df)
+    reg = XGBRegressor(n_estimators=10, max_depth=3, verbosity=0)
+    reg.fit(feats[FEATURES].values, feats['Global_active_power'].values)
+    model_path = str(tmp / 'model.json')
+    reg.save_model(model_path)
+    return df, csv_path, model_path
+
+def test_origin_positions():
+    pos = backtest.origin_positions(1000, 24, step=24)
+    assert pos[0] == backtest.CONTEXT and pos[-1] <= 1000 - 24
+    assert len(backtest.origin_positions(1000, 24, n_origins=10)) == 10
+    with pytest.raises(ValueError):
+        backtest.origin_positions(backtest.CONTEXT + 10, 24)
+
+def test_backtest_matches_full_history_forecasts(assets):
+    df, csv_path, model_path = assets
+    res = backtest.run_backtest(csv_path, model_path, FEATURES, horizon=12, n_origins=6, n_workers=1, verbose=False)
+    assert list(res['by_step'].index) == list(range(1, 13))
+    assert res['by_step']['n'].sum() == 6 * 12 == res['by_hour']['n'].sum()
+
+    # recompute every origin from its full history with the single-series forecaster
+    fc = RecursiveForecaster(models.load_model_xgb(model_path), FEATURES)
+    y = df['Global_active_power'].to_numpy()
+    sq = [(fc.forecast(df.iloc[:p], 12).to_numpy() - y[p:p + 12]) ** 2
+          for p in backtest.origin_positions(len(df), 12, n_origins=6)]
+    assert res['overall']['rmse'] == pytest.approx(np.sqrt(np.mean(sq)), rel=1e-6)
+    np.testing.assert_allclose(res['by_step']['rmse'], np.sqrt(np.mean(sq, axis=0)), rtol=1e-6)
+
+def test_process_pool_equals_single_process(assets):
+    _, csv_path, model_path = assets
+    kwargs = dict(features_list=FEATURES, horizon=24, step=48, chunk=2, verbose=False)
+    one = backtest.run_backtest(csv_path, model_path, n_workers=1, **kwargs)
+    two = backtest.run_backtest(csv_path, model_path, n_workers=2, **kwargs)
+    assert two['workers'] == 2
+    np.testing.assert_allclose(one['by_hour'].to_numpy(), two['by_hour'].to_numpy(), rtol=1e-6)
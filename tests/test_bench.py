@@ -0,0 +1,26 @@
+import copy
+from benchmarks import bench
+from src import preprocess
+
+def test_generators():
+    minutes = bench.make_minutes(2)
+    assert len(minutes) == 2 * 24 * 60
+    assert minutes['Global_active_power'].isna().any()
+    hourly = preprocess.preprocess_to_hourly(minutes.copy())
+    assert len(hourly) == 48
+    homes = bench.make_households(10, 3)
+    assert sorted(homes) == ['hh000', 'hh001', 'hh002']
+    assert all(len(df) == 240 and 'Other_Consumption' in df for df in homes.values())
+
+def test_suite_and_compare():
+    doc = bench.run_suite(sizes=['tiny'], repeat=1, size_specs={'tiny': dict(days=10, households=2)}, verbose=False)
+    assert set(doc['results']) == {f'{stage}/tiny' for stage in bench.STAGES}
+    assert all(r['seconds'] > 0 and r['items_per_s'] > 0 for r in doc['results'].values())
+    assert bench.compare(doc, doc) == []
+
+    slower = copy.deepcopy(doc)
+    slower['results']['predict/tiny']['seconds'] *= 2
+    slower['results']['build_features/tiny']['seconds'] *= 1.1
+    problems = bench.compare(slower, doc, threshold=0.25)
+    assert len(problems) == 1 and problems[0].startswith('predict/tiny')
+    assert bench.compare(slower, doc, threshold=1.5) == []
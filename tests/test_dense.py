@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import backtest, dense, features
+from src.forecast import RecursiveForecaster, WEEK
+from tests.conftest import FEATURES, make_hourly
+
+TARGET = 'Global_active_power'
+
+def gappy(n_hours=600, seed=3):
+    """make_hourly with a 5-hour outage and a few single missing hours."""
+    df = make_hourly(n_hours=n_hours, seed=seed)
+    drop = list(range(200, 205)) + [300, 333, 450]
+    return df.drop(df.index[drop]), df.index[drop]
+
+def test_round_trip_and_lookups(tmp_path):
+    df, missing = gappy()
+    store = dense.DenseHourly.from_frame(df)
+    assert len(store) == 600 and store.n_missing == len(missing)
+    assert store.start == df.index[0] and store.end == df.index[-1]
+    store.save(str(tmp_path / 'd'), fingerprint='x')
+    loaded, meta = dense.DenseHourly.load(str(tmp_path / 'd'))
+    assert meta['source_fingerprint'] == 'x'
+    assert (loaded.valid == store.valid).all() and not loaded.valid[store.pos(missing[0])]
+    pd.testing.assert_frame_equal(loaded.to_frame(), df, check_freq=False)
+
+    ts = df.index[400]
+    assert loaded.at(ts, TARGET) == df[TARGET].iat[400]
+    assert np.isnan(loaded.at(missing[-1], TARGET)) and np.isnan(loaded.at(df.index[0] - pd.Timedelta(hours=1), TARGET))
+    after = [loaded.pos(ts), loaded.pos(missing[0] + pd.Timedelta(hours=24))]
+    lags = loaded.lag(TARGET, 24, after)
+    assert lags[0] == df.loc[ts - pd.Timedelta(hours=24), TARGET] and np.isnan(lags[1])
+    window = loaded.window(missing[0] + pd.Timedelta(hours=6), 10)
+    assert len(window) == 5 and window.index[0] == missing[0] - pd.Timedelta(hours=3)
+
+def test_load_dense_follows_the_csv(tmp_path):
+    df, _ = gappy()
+    csv_path = str(tmp_path / 'df_hourly.csv')
+    df.to_csv(csv_path)
+    assert dense.load_dense(csv_path).n_missing == 8
+    df.iloc[:-10].to_csv(csv_path)
+    assert dense.load_dense(csv_path).end == df.index[-11]
+
+def test_lags_are_taken_by_hour():
+    df, missing = gappy()
+    feats = features.build_features(df, drop_na=False)
+    y = df[TARGET]
+    for lag in features.LAGS:
+        expected = y.reindex(feats.index - pd.Timedelta(hours=lag)).to_numpy()
+        np.testing.assert_array_equal(feats[f'lag{lag}'].to_numpy(), expected)
+    after = missing[0] + pd.Timedelta(hours=24)
+    assert np.isnan(feats.loc[after, 'lag24'])
+
+def test_rollings_skip_missing_hours():
+    df, _ = gappy()
+    feats = features.add_rollings(df[[TARGET]], windows=[3, 24, 168])
+    y = df[TARGET]
+    for w in (3, 24, 168):
+        ok = df.index >= df.index[0] + pd.Timedelta(hours=w - 1)
+        roll = y.rolling(f'{w}h')
+        for stat in ('mean', 'std', 'sum'):
+            got = feats[f'roll{w}_{stat}'].to_numpy()
+            np.testing.assert_allclose(got[ok], getattr(roll, stat)().to_numpy()[ok], rtol=1e-9, atol=1e-9)
+            assert np.isnan(got[~ok]).all()
+
+def test_contiguous_features_unchanged():
+    df = make_hourly(500)
+    feats = features.build_features(df, drop_na=False)
+    for lag in features.LAGS:
+        pd.testing.assert_series_equal(feats[f'lag{lag}'], df[TARGET].shift(lag), check_names=False)
+
+def test_forecaster_seeds_by_hour(small_model):
+    df, missing = gappy()
+    state = RecursiveForecaster(small_model, FEATURES).init_state(df.iloc[:300])
+    assert state.n_rows[0] == (df.index[299] - df.index[0]) / pd.Timedelta(hours=1) + 1 > 300
+    grid = dense.fill_gaps(dense.DenseHourly.from_frame(df.iloc[:300]).column(TARGET))
+    np.testing.assert_allclose(state.target.tail(WEEK)[:, 0], grid[-WEEK:])
+
+def test_backtest_scores_only_present_hours(tmp_path, small_model):
+    df, missing = gappy(n_hours=900)
+    csv_path = str(tmp_path / 'df_hourly.csv')
+    df.to_csv(csv_path)
+    model_path = str(tmp_path / 'model.json')
+    small_model.booster.save_model(model_path)
+    res = backtest.run_backtest(csv_path, model_path, FEATURES, horizon=24, step=24, n_workers=1, verbose=False)
+    store = dense.load_dense(csv_path)
+    positions = backtest.origin_positions(len(store), 24, step=24)
+    scored = sum(store.valid[p:p + 24].sum() for p in positions if store.valid[p - 1])
+    assert res['by_step']['n'].sum() == scored < len(res['times']) * 24
+    assert np.isfinite(res['overall']['rmse'])
+    with pytest.raises(ValueError):
+        dense.grid_positions(df.index[::-1])
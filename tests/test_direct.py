@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from src import direct, models, service
+from tests.conftest import FEATURES, make_hourly
+
+@pytest.fixture(scope='module')
+def direct_forecaster(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('direct')
+    df = make_hourly(n_hours=1200, seed=3)
+    _, feature_list = direct.train_direct(df, origin_features=FEATURES, max_horizon=168,
+                                          path_json=str(tmp / 'd.json'), path_joblib=str(tmp / 'd.pkl'),
+                                          features_path=str(tmp / 'd.json.features'), n_estimators=20)
+    return direct.DirectForecaster(models.load_model_xgb(str(tmp / 'd.json')), feature_list)
+
+def test_training_set_shape(hourly_df):
+    X, y, feature_list = direct.build_direct_training_set(hourly_df, origin_features=FEATURES,
+                                                          max_horizon=48, horizons_per_origin=4)
+    assert X.shape == (len(y), len(FEATURES) + 2 + len(direct.TARGET_TIME_FEATURES))
+    assert feature_list == direct.direct_feature_list(FEATURES)
+    h = X[:, len(FEATURES) + 1]
+    assert h.min() >= 1 and h.max() <= 48
+    assert not np.isnan(X).any() and not np.isnan(y).any()
+
+def test_training_set_horizon_is_hours_across_gaps():
+    df = make_hourly(n_hours=800, seed=2)
+    df['Global_active_power'] = np.arange(len(df), dtype=np.float64)    # value = hours since start
+    df = df.drop(df.index[400:430])
+    X, y, _ = direct.build_direct_training_set(df, origin_features=FEATURES, max_horizon=96, horizons_per_origin=8)
+    origin_value, h = X[:, len(FEATURES)], X[:, len(FEATURES) + 1]
+    np.testing.assert_array_equal(y - origin_value, h)
+    assert not np.isin(y, np.arange(400, 430)).any()
+
+def test_forecast_index_and_batch_rows(direct_forecaster, hourly_df):
+    fc = direct_forecaster.forecast(hourly_df, 72)
+    assert len(fc) == 72
+    assert fc.index[0] == hourly_df.index[-1] + np.timedelta64(1, 'h')
+    assert (np.diff(fc.index.values) == np.timedelta64(1, 'h')).all()
+    row, origin = direct_forecaster.origin_row(hourly_df)
+    times, preds = direct_forecaster.forecast_rows(np.stack([row, row]), [origin.to_datetime64()] * 2, 72)
+    assert preds.shape == (2, 72)
+    np.testing.assert_allclose(preds[1], fc.values, rtol=1e-6)
+
+def test_service_direct_mode(direct_forecaster, hourly_df, small_model):
+    svc = service.ForecastService(small_model, FEATURES, {'a': hourly_df}, direct=direct_forecaster)
+    try:
+        out = svc.forecast('a', 24, mode='direct')
+        assert out['mode'] == 'direct' and len(out['forecast']) == 24
+        np.testing.assert_allclose(out['forecast'], direct_forecaster.forecast(hourly_df, 24).values, rtol=1e-6)
+        assert (svc.metrics.series_hours, svc.metrics.predict_calls) == (24, 1)
+        with pytest.raises(ValueError):
+            svc.forecast('a', 24, mode='nope')
+    finally:
+        svc.close()
+    svc = service.ForecastService(small_model, FEATURES, {'a': hourly_df})
+    try:
+        with pytest.raises(ValueError):
+            svc.forecast('a', 24, mode='direct')
+    finally:
+        svc.close()
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+from src import external_train, features, models
+from tests.conftest import FEATURES
+
+@pytest.mark.parametrize('external', [True, False])
+def test_chunked_training_covers_every_household(external, tmp_path):
+    sources = [external_train.synthetic_household(i, days=20) for i in range(5)]
+    booster, feature_list, stats = external_train.train_external(
+        sources, FEATURES, households_per_chunk=2, num_boost_round=20, external=external, cache_dir=str(tmp_path))
+    n_rows = sum(len(features.build_features(df)) for df in sources)
+    assert stats['rows'] == n_rows
+    assert stats['max_chunk_mb'] * 2 ** 20 <= 2 * (n_rows / 5) * (len(FEATURES) + 1) * 4 + 1
+    assert booster.num_features() == len(FEATURES) and booster.feature_names is None
+    df = features.build_features(sources[0])
+    pred = models.XGBWrapper(booster).predict(df[FEATURES].to_numpy())
+    assert np.corrcoef(pred, df['Global_active_power'])[0, 1] > 0.9
+    assert list(tmp_path.iterdir()) == []   # external-memory pages are cleaned up
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import features, forecast
+from src.feature_store import FeatureStore, FeatureMismatchError
+from tests.conftest import FEATURES, make_hourly
+
+def _store(tmp_path):
+    return FeatureStore(str(tmp_path / 'df_hourly.csv'))
+
+def test_build_matches_build_features(tmp_path, hourly_df):
+    store = _store(tmp_path)
+    assert store.sync(hourly_df, verbose=False) == 'built'
+    assert store.sync(hourly_df, verbose=False) == 'current'
+    expected = features.build_features(hourly_df, drop_na=False)
+    got = store.load()
+    assert list(got.columns) == list(expected.columns)
+    assert got.index.equals(expected.index)
+    np.testing.assert_allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True)
+
+def test_extend_matches_rebuild(tmp_path):
+    df = make_hourly(n_hours=700, seed=5)
+    store = _store(tmp_path)
+    store.sync(df.iloc[:500], verbose=False)
+    # the last stored hour may be rewritten by an incremental preprocess
+    grown = df.copy()
+    grown.iloc[499, grown.columns.get_loc('Global_active_power')] += 1.0
+    assert store.sync(grown, verbose=False) == 'extended'
+    assert len(store) == 700
+    expected = features.build_features(grown, drop_na=False)
+    np.testing.assert_allclose(store.load().to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True)
+
+def test_changed_history_rebuilds(tmp_path):
+    df = make_hourly(n_hours=400, seed=6)
+    store = _store(tmp_path)
+    store.sync(df, verbose=False)
+    edited = df.copy()
+    edited.iloc[10, 0] += 1.0
+    assert store.sync(edited, verbose=False) == 'built'
+    assert FeatureStore(store.csv_path).sync(edited, verbose=False) == 'current'
+
+def test_check_and_training_frame(tmp_path, hourly_df):
+    store = _store(tmp_path)
+    store.sync(hourly_df, verbose=False)
+    store.check(FEATURES)
+    with pytest.raises(FeatureMismatchError):
+        store.check(FEATURES + ['lag999'])
+    with pytest.raises(FeatureMismatchError):
+        forecast.RecursiveForecaster(None, FEATURES + ['lag999'], store=store)
+    frame = store.training_frame(FEATURES)
+    assert not frame.isna().any().any()
+    assert frame.index[0] == hourly_df.index[168]
+
+def test_store_seeded_forecast_matches(tmp_path, hourly_df, small_model):
+    store = _store(tmp_path)
+    store.sync(hourly_df, verbose=False)
+    assert store.row(hourly_df.index[-1], FEATURES, target_value=-1.0) is None
+    assert store.row(hourly_df.index[-1] + pd.Timedelta(hours=1), FEATURES) is None
+    plain = forecast.RecursiveForecaster(small_model, FEATURES).forecast(hourly_df, 48)
+    seeded = forecast.RecursiveForecaster(small_model, FEATURES, store=store).forecast(hourly_df, 48)
+    np.testing.assert_allclose(seeded.values, plain.values, rtol=1e-6)
+
+def test_row_keeps_index_and_sees_extensions(tmp_path, hourly_df):
+    store = _store(tmp_path)
+    store.sync(hourly_df.iloc[:-5], verbose=False)
+    assert store.row(hourly_df.index[-6], FEATURES) is not None
+    index = store._stored_index()
+    assert store.row(hourly_df.index[-1], FEATURES) is None
+    assert store._stored_index() is index      # not reread per call
+    assert store.sync(hourly_df, verbose=False) == 'extended'
+    row = store.row(hourly_df.index[-1], FEATURES, target_value=hourly_df['Global_active_power'].iloc[-1])
+    np.testing.assert_array_equal(row, store.load(FEATURES).iloc[-1].to_numpy())
+
+def test_check_rejects_model_trained_on_other_features(tmp_path, hourly_df, small_model):
+    import xgboost as xgb
+    store = _store(tmp_path)
+    store.sync(hourly_df, verbose=False)
+    X = np.zeros((4, 2))
+    booster = xgb.train({'verbosity': 0}, xgb.DMatrix(X, label=np.zeros(4), feature_names=['lag1', 'old_roll']), 1)
+    with pytest.raises(FeatureMismatchError, match='old_roll'):
+        store.check(['lag1', 'lag24'], booster)
+    store.check(FEATURES, small_model)     # no feature names recorded: only the store is checked
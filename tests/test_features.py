@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from src import features
+from tests.conftest import make_hourly
+
+def pandas_rollings(y, windows):
+    cols = {}
+    for w in windows:
+        cols[f'roll{w}_mean'] = y.rolling(window=w).mean()
+        cols[f'roll{w}_std'] = y.rolling(window=w).std()
+        cols[f'roll{w}_sum'] = y.rolling(window=w).sum()
+    return pd.DataFrame(cols)
+
+def test_rolling_kernel_matches_pandas():
+    y = make_hourly(1000)['Global_active_power']
+    y.iloc[[5, 400, 401]] = np.nan
+    expected = pandas_rollings(y, features.ROLL_WINDOWS)
+    block = features.rolling_kernel(y.values)
+    assert list(expected.columns) == features.rolling_names()
+    np.testing.assert_allclose(block, expected.values, rtol=1e-9, atol=1e-6)
+    block32 = features.rolling_kernel(y.values, dtype=np.float32)
+    assert block32.dtype == np.float32
+    np.testing.assert_allclose(block32, expected.values, rtol=1e-5, atol=1e-5)
+
+def test_rolling_kernel_short_series_is_nan():
+    block = features.rolling_kernel(np.arange(5.0), windows=[3, 6])
+    assert np.isnan(block[:2, :3]).all() and not np.isnan(block[2:, :3]).any()
+    assert np.isnan(block[:, 3:]).all()
+
+def test_rolling_state_appends_one_hour():
+    y = make_hourly(400)['Global_active_power'].to_numpy()
+    state = features.RollingState(y[:300])
+    for v in y[300:]:
+        row = state.append(v)
+    np.testing.assert_allclose(row, features.rolling_kernel(y)[-1], rtol=1e-9, atol=1e-9)
+
+def test_rolling_state_tail_is_bounded():
+    state = features.RollingState(windows=[1])
+    for v in range(10):
+        row = state.append(float(v))
+    assert len(state._tail) == 1 and row[0] == 9.0 and row[2] == 9.0
+    state = features.RollingState(np.arange(5.0), windows=[3])
+    state.append(5.0)
+    np.testing.assert_array_equal(state._tail, [3.0, 4.0, 5.0])
+
+def test_build_features_matches_pandas():
+    df = make_hourly(500)
+    feats = features.build_features(df)
+    expected = pandas_rollings(df['Global_active_power'], features.ROLL_WINDOWS).loc[feats.index]
+    np.testing.assert_allclose(feats[expected.columns].values, expected.values, rtol=1e-9, atol=1e-9)
+    assert len(feats) == len(df) - 168
+    assert list(df.columns) == list(make_hourly(10).columns)   # input untouched
+
+def test_add_rollings_refeed_replaces_columns():
+    once = features.add_rollings(make_hourly(300))
+    twice = features.add_rollings(once)
+    assert not twice.columns.duplicated().any()
+    assert sorted(twice.columns) == sorted(once.columns)
+    pd.testing.assert_frame_equal(twice[once.columns], once)
@@ -0,0 +1,100 @@
+import pytest
+import pandas as pd
+import numpy as np
+from src import features, forecast
+from tests.conftest import FEATURES
+
+def legacy_recursive_forecast(df_history, model, features_list, horizon):
+    # The original app loop, kept as the reference for the ring-buffer engine
+    df_all = df_history.copy().sort_index()
+    df_all = features.add_time_features(df_all)
+    for col in ['Sub_metering_1','Sub_metering_2','Sub_metering_3','Voltage','Global_intensity']:
+        if col not in df_all.columns:
+            df_all[col] = 0.0
+    df_all = features.add_lags(df_all, target='Global_active_power')
+    df_all = features.add_rollings(df_all, target='Global_active_power', windows=[24, 168])
+
+    future_index = pd.date_range(start=df_all.index[-1] + pd.Timedelta(hours=1), periods=horizon, freq='h')
+    preds = []
+    for t in future_index:
+        last = df_all.iloc[-1:].copy()
+        last.index = [t]
+        last['hour'] = t.hour; last['day'] = t.day; last['weekday'] = t.weekday()
+        last['month'] = t.month; last['is_weekend'] = int(t.weekday()>=5)
+        for col in ['Sub_metering_1','Sub_metering_2','Sub_metering_3','Voltage','Global_intensity']:
+            if len(df_all) >= 168:
+                last[col] = df_all[col].iloc[-168 + (len(preds) % 168)]
+            else:
+                last[col] = df_all[col].iloc[-1]
+        last['lag168'] = df_all['Global_active_power'].iloc[-168] if len(df_all) >= 168 else df_all['Global_active_power'].iloc[-1]
+        last['lag24'] = df_all['Global_active_power'].iloc[-24] if len(df_all) >= 24 else df_all['Global_active_power'].iloc[-1]
+        last['lag1'] = df_all['Global_active_power'].iloc[-1]
+        window_vals = list(df_all['Global_active_power'].iloc[-23:]) + [last['lag1'].values[0]]
+        last['roll24_mean'] = np.mean(window_vals)
+        last['roll24_std'] = np.std(window_vals)
+        for f in features_list:
+            if f not in last.columns:
+                last[f] = 0.0
+        X_row = last[features_list].iloc[0].values.reshape(1, -1).astype(float)
+        X_row = np.nan_to_num(X_row, nan=0.0, posinf=0.0, neginf=0.0)
+        yhat = model.predict(X_row)[0]
+        preds.append(yhat)
+        new_row = last.copy()
+        new_row['Global_active_power'] = yhat
+        subs = new_row['Sub_metering_1'].iloc[0] + new_row['Sub_metering_2'].iloc[0] + new_row['Sub_metering_3'].iloc[0]
+        new_row['Other_Consumption'] = max(0.0, yhat - subs)
+        df_all = pd.concat([df_all, new_row])
+    return pd.Series(preds, index=future_index)
+
+def test_ring_buffer_keeps_newest_values():
+    buf = forecast.RingBuffer(4, values=np.arange(6, dtype=float))
+    assert len(buf) == 4
+    assert buf[-1] == 5.0 and buf[-4] == 2.0
+    buf.append(6.0)
+    assert list(buf.tail(3)) == [4.0, 5.0, 6.0]
+    with pytest.raises(IndexError):
+        buf[-5]
+
+@pytest.mark.parametrize('n_history', [500, 100, 15])
+def test_matches_legacy_loop(hourly_df, small_model, n_history):
+    history = hourly_df.iloc[:n_history]
+    features_list = FEATURES
+    expected = legacy_recursive_forecast(history, small_model, features_list, horizon=200)
+    result, df_future = forecast.recursive_forecast(history, small_model, features_list, horizon=200)
+    np.testing.assert_allclose(result.values, expected.values, rtol=1e-6)
+    assert result.index.equals(expected.index)
+    assert (df_future['Other_Consumption'] >= 0).all()
+
+def test_advance_continues_the_same_recursion(hourly_df, small_model):
+    fc = forecast.RecursiveForecaster(small_model, FEATURES)
+    full = fc.forecast(hourly_df, horizon=48)
+    state = fc.init_state(hourly_df)
+    _, first, _ = fc.advance(state, 20)
+    times, rest, _ = fc.advance(state, 28)
+    np.testing.assert_array_equal(np.concatenate([first[0], rest[0]]), full.values)
+    assert times[0, -1] == full.index[-1]
+
+def test_batch_matches_single_series(hourly_df, small_model):
+    histories = {'a': hourly_df, 'b': hourly_df.iloc[:-37], 'c': hourly_df.iloc[:15]}
+    fc = forecast.RecursiveForecaster(small_model, FEATURES)
+    result = forecast.batch_forecast(histories, small_model, FEATURES, horizon=30)
+    assert list(result.columns) == ['meter_id', 'datetime', 'Global_active_power_forecast']
+    assert len(result) == 3 * 30
+    for key, df in histories.items():
+        got = result[result['meter_id'] == key]
+        expected = fc.forecast(df, horizon=30)
+        np.testing.assert_array_equal(got['Global_active_power_forecast'].values, expected.values)
+        assert (pd.DatetimeIndex(got['datetime']) == expected.index).all()
+
+def test_batch_accepts_long_frame(hourly_df, small_model):
+    long = pd.concat([hourly_df.assign(meter_id=m) for m in ('x', 'y')]).reset_index()
+    result = forecast.batch_forecast(long, small_model, FEATURES, horizon=5)
+    assert set(result['meter_id']) == {'x', 'y'}
+    a, b = (result[result['meter_id'] == m]['Global_active_power_forecast'].values for m in ('x', 'y'))
+    np.testing.assert_array_equal(a, b)
+
+def test_long_frame_index_left_untouched(hourly_df, small_model):
+    long = pd.concat([hourly_df.assign(meter_id=m) for m in ('x', 'y')])
+    long.index = long.index.astype(str)
+    forecast.batch_forecast(long, small_model, FEATURES, horizon=5)
+    assert not isinstance(long.index, pd.DatetimeIndex)
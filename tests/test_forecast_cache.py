@@ -0,0 +1,45 @@
+import numpy as np
+from src import forecast
+from src.forecast_cache import ForecastCache
+from tests.conftest import FEATURES
+
+class CountingModel:
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return self.model.predict(X)
+
+def test_shorter_horizon_is_a_slice(hourly_df, small_model):
+    model = CountingModel(small_model)
+    fc = forecast.RecursiveForecaster(model, FEATURES)
+    cache = ForecastCache()
+    long_series, _ = cache.forecast(fc, hourly_df, 72, model_key='m')
+    calls = model.calls
+    short_series, df_future = cache.forecast(fc, hourly_df, 24, model_key='m')
+    assert model.calls == calls and cache.hits == 1
+    assert short_series.equals(long_series.iloc[:24])
+    assert len(df_future) == 24
+
+def test_longer_horizon_resumes_saved_state(hourly_df, small_model):
+    model = CountingModel(small_model)
+    fc = forecast.RecursiveForecaster(model, FEATURES)
+    cache = ForecastCache()
+    cache.forecast(fc, hourly_df, 30, model_key='m')
+    extended, _ = cache.forecast(fc, hourly_df, 100, model_key='m')
+    assert model.calls == 100 and cache.extensions == 1
+    expected, _ = forecast.recursive_forecast(hourly_df, small_model, FEATURES, 100)
+    np.testing.assert_array_equal(extended.values, expected.values)
+
+def test_key_changes_and_eviction(hourly_df, small_model):
+    fc = forecast.RecursiveForecaster(small_model, FEATURES)
+    cache = ForecastCache()
+    cache.forecast(fc, hourly_df, 24, model_key='m')
+    cache.forecast(fc, hourly_df.iloc[:-1], 24, model_key='m')
+    cache.forecast(fc, hourly_df, 24, model_key='other')
+    assert cache.misses == 3 and len(cache) == 3
+    cache.max_bytes = cache.nbytes // 2
+    cache.forecast(fc, hourly_df.iloc[:-2], 24, model_key='m')
+    assert cache.nbytes <= cache.max_bytes and len(cache) < 4
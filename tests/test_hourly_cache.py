@@ -0,0 +1,31 @@
+import os
+import numpy as np
+import pandas as pd
+from src import hourly_cache
+from tests.conftest import make_hourly
+
+def write_csv(path, df):
+    df.to_csv(path)
+    return pd.read_csv(path, parse_dates=['datetime'], index_col='datetime')
+
+def test_cache_round_trip_is_memory_mapped(tmp_path):
+    csv = str(tmp_path / 'df_hourly.csv')
+    expected = write_csv(csv, make_hourly(300))
+    cold = hourly_cache.load_hourly(csv)
+    assert os.path.isdir(hourly_cache.cache_dir(csv))
+    warm = hourly_cache.read_cache(csv)
+    pd.testing.assert_frame_equal(cold, expected)
+    pd.testing.assert_frame_equal(warm, expected, check_freq=False)
+    arr = warm['Voltage'].to_numpy()
+    while arr is not None and not isinstance(arr, np.memmap):
+        arr = arr.base
+    assert isinstance(arr, np.memmap)
+
+def test_cache_invalidates_when_csv_changes(tmp_path):
+    csv = str(tmp_path / 'df_hourly.csv')
+    write_csv(csv, make_hourly(300))
+    hourly_cache.load_hourly(csv)
+    expected = write_csv(csv, make_hourly(320, seed=3))
+    assert hourly_cache.read_cache(csv) is None
+    pd.testing.assert_frame_equal(hourly_cache.load_hourly(csv), expected)
+    assert hourly_cache.read_cache(csv) is not None
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from src import joint, models
+from tests.conftest import FEATURES, make_hourly
+
+class _Lag24Model:
+    """Predicts every target as its value 24 hours earlier (reads the lag24 block)."""
+
+    def __init__(self):
+        names = joint.joint_feature_list()
+        self.cols = [names.index(f'{c}_lag24') for c in joint.JOINT_TARGETS]
+
+    def predict(self, X):
+        return X[:, self.cols]
+
+def test_training_set_alignment(hourly_df):
+    X, Y, names = joint.build_joint_training_set(hourly_df)
+    assert X.shape == (len(Y), len(names)) and Y.shape[1] == len(joint.JOINT_TARGETS)
+    assert len(Y) == len(hourly_df) - 168
+    values = hourly_df[joint.JOINT_TARGETS].to_numpy()
+    row = X[0]
+    for lag in joint.JOINT_LAGS:
+        got = [row[names.index(f'{c}_lag{lag}')] for c in joint.JOINT_TARGETS]
+        np.testing.assert_allclose(got, values[168 - lag])
+    np.testing.assert_allclose(row[names.index('Voltage_roll24_mean')], values[144:168, joint.JOINT_TARGETS.index('Voltage')].mean())
+
+def test_forecast_reads_lags_from_the_buffer(hourly_df):
+    fc = joint.JointForecaster(_Lag24Model(), joint.joint_feature_list())
+    series, df_future = fc.forecast(hourly_df, 72)
+    last_day = hourly_df[joint.JOINT_TARGETS].iloc[-24:].to_numpy()
+    expected = np.tile(last_day, (3, 1))
+    np.testing.assert_allclose(df_future[joint.JOINT_TARGETS].to_numpy(), expected)
+    np.testing.assert_allclose(series.values, expected[:, 0])
+    subs = df_future[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].sum(axis=1)
+    np.testing.assert_allclose(df_future['Other_Consumption'], np.fmax(0.0, series.values - subs.values))
+    with pytest.raises(ValueError):
+        joint.JointForecaster(_Lag24Model(), ['hour'])
+
+def test_trained_model_batch_matches_single(tmp_path, hourly_df, small_model):
+    df = make_hourly(n_hours=900, seed=8)
+    _, names = joint.train_joint(df, path_json=str(tmp_path / 'j.json'), path_joblib=str(tmp_path / 'j.pkl'),
+                                 features_path=str(tmp_path / 'j_features.json'), n_estimators=15)
+    fc = joint.JointForecaster(models.load_model_xgb(str(tmp_path / 'j.json')), models.load_features_list(str(tmp_path / 'j_features.json')))
+    other = make_hourly(n_hours=400, seed=9)
+    long = fc.forecast_many({'a': df, 'b': other}, 48)
+    assert list(long.columns) == ['meter_id', 'datetime'] + joint.JOINT_TARGETS + ['Other_Consumption']
+    series, df_future = fc.forecast(other, 48)
+    b = long[long['meter_id'] == 'b']
+    np.testing.assert_allclose(b[joint.JOINT_TARGETS].to_numpy(), df_future[joint.JOINT_TARGETS].to_numpy(), rtol=1e-6)
+    assert (df_future[joint.JOINT_TARGETS].to_numpy() >= 0).all()
+    report = joint.compare_heuristic(hourly_df, fc.model, names, small_model, FEATURES, horizon=24, n_origins=3)
+    assert list(report.index) == ['heuristic', 'joint']
+    assert {f'rmse_{c}' for c in joint.JOINT_TARGETS} < set(report.columns)
+    assert (report['step_ms'] > 0).all()
+    gapped = hourly_df.drop(hourly_df.index[-20:-10])   # horizons that span a gap score only real hours
+    report = joint.compare_heuristic(gapped, fc.model, names, small_model, FEATURES, horizon=24, n_origins=3)
+    assert np.isfinite(report.drop(columns='step_ms').to_numpy()).all()
@@ -2,7 +2,7 @@
 import pytest
 import pandas as pd
 import numpy as np
-from src import preprocess
+from src import hourly_cache, preprocess
 
 def test_preprocess_to_hourly_basic():
     # Create sample DataFrame
@@ -57,3 +57,106 @@ def test_other_consumption_calculation():
     
     assert np.isclose(df_hourly['Global_active_power'].iloc[0], 1.0)
     assert np.isclose(df_hourly['Other_Consumption'].iloc[0], 1.0)
+
+def write_raw(path, n_minutes=600, start='2008-03-30 00:00:00'):
+    """Write a small file in the UCI ';'-separated raw format, with '?' gaps."""
+    rng = np.random.default_rng(1)
+    dates = pd.date_range(start=start, periods=n_minutes, freq='min')
+    dates = dates.delete(range(200, 290))  # a missing block spanning an hour boundary
+    n = len(dates)
+    vals = {
+        'Global_active_power': rng.random(n) * 3,
+        'Global_reactive_power': rng.random(n) * 0.3,
+        'Voltage': 235 + rng.random(n) * 10,
+        'Global_intensity': rng.random(n) * 12,
+        'Sub_metering_1': rng.integers(0, 30, n).astype(float),
+        'Sub_metering_2': rng.integers(0, 30, n).astype(float),
+        'Sub_metering_3': rng.integers(0, 20, n).astype(float),
+    }
+    lines = ['Date;Time;' + ';'.join(vals)]
+    for i, t in enumerate(dates):
+        row = [f"{vals[c][i]:.3f}" for c in vals]
+        if i % 97 == 0:
+            row = ['?'] * len(row)
+        lines.append(f"{t.day}/{t.month}/{t.year};{t.strftime('%H:%M:%S')};" + ';'.join(row))
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+@pytest.mark.parametrize('chunksize', [37, 60, 10_000])
+def test_streaming_matches_in_memory(tmp_path, chunksize):
+    raw = str(tmp_path / 'raw.txt')
+    write_raw(raw)
+    expected_path = str(tmp_path / 'expected.csv')
+    streamed_path = str(tmp_path / 'streamed.csv')
+    expected = preprocess.process_and_save(raw, expected_path, force=True)
+    streamed = preprocess.process_and_save(raw, streamed_path, force=True, stream=True, chunksize=chunksize)
+    with open(expected_path) as a, open(streamed_path) as b:
+        assert a.read() == b.read()
+    pd.testing.assert_frame_equal(streamed, expected, check_freq=False)
+
+def test_fast_reader_matches_read_raw(tmp_path):
+    raw = str(tmp_path / 'raw.txt')
+    write_raw(raw)
+    expected = preprocess.read_raw(raw)
+    ranges = preprocess._byte_ranges(raw, 5)
+    assert len(ranges) == 5
+    parts = pd.concat([preprocess._parse_range(r) for r in ranges], ignore_index=True)
+    pd.testing.assert_frame_equal(parts, expected)
+    pd.testing.assert_frame_equal(preprocess.read_raw_fast(raw, verbose=False), expected)
+
+def test_fast_reader_process_pool_matches_read_raw(tmp_path, monkeypatch):
+    raw = str(tmp_path / 'raw.txt')
+    write_raw(raw)
+    # the test file is far below the per-worker minimum; lower it so the pool path runs
+    monkeypatch.setattr(preprocess, '_MIN_BYTES_PER_WORKER', 1)
+    fast = preprocess.read_raw_fast(raw, n_workers=3, verbose=False)
+    assert len(preprocess._byte_ranges(raw, 3)) == 3
+    pd.testing.assert_frame_equal(fast, preprocess.read_raw(raw))
+
+def test_process_and_save_fast(tmp_path):
+    raw = str(tmp_path / 'raw.txt')
+    write_raw(raw)
+    expected = preprocess.process_and_save(raw, str(tmp_path / 'a.csv'), force=True)
+    fast = preprocess.process_and_save(raw, str(tmp_path / 'b.csv'), force=True, fast=True)
+    pd.testing.assert_frame_equal(fast, expected)
+    with pytest.raises(ValueError):
+        preprocess.process_and_save(raw, str(tmp_path / 'c.csv'), force=True, fast=True, stream=True)
+
+def test_incremental_append_matches_full_rebuild(tmp_path):
+    full_raw = str(tmp_path / 'full.txt')
+    write_raw(full_raw, n_minutes=900)
+    with open(full_raw) as f:
+        lines = f.readlines()
+    raw = str(tmp_path / 'raw.txt')
+    out = str(tmp_path / 'hourly.csv')
+    # the raw file grows in three steps, each cut in the middle of an hour
+    for n_lines in (333, 650, len(lines)):
+        with open(raw, 'w') as f:
+            f.writelines(lines[:n_lines])
+        df_new = preprocess.process_and_save(raw, out, incremental=True, chunksize=50)
+    assert len(df_new) <= 5   # boundary hour + the few new ones, not the whole history
+    pd.testing.assert_frame_equal(df_new, hourly_cache.load_hourly(out).iloc[-len(df_new):], check_freq=False)
+    expected_path = str(tmp_path / 'expected.csv')
+    preprocess.process_and_save(full_raw, expected_path, force=True, stream=True)
+    with open(expected_path) as a, open(out) as b:
+        assert a.read() == b.read()
+
+def test_incremental_rebuilds_when_raw_file_is_replaced(tmp_path):
+    raw = str(tmp_path / 'raw.txt')
+    out = str(tmp_path / 'hourly.csv')
+    write_raw(raw, n_minutes=300)
+    preprocess.process_and_save(raw, out, incremental=True)
+    write_raw(raw, n_minutes=400, start='2009-01-01 00:00:00')
+    assert preprocess.load_watermark(raw, out) is None
+    df_new = preprocess.process_and_save(raw, out, incremental=True)
+    assert df_new.index[0] == pd.Timestamp('2009-01-01 00:00:00')
+
+def test_process_and_save_returns_writable_frame(tmp_path):
+    raw = str(tmp_path / 'raw.txt')
+    out = str(tmp_path / 'hourly.csv')
+    write_raw(raw)
+    for df in (preprocess.process_and_save(raw, out, force=True, stream=True),
+               preprocess.process_and_save(raw, out)):     # second call: warm binary cache
+        df['Voltage'] *= 2.0
+        df.iloc[0, 0] = 0.0
+    assert not hourly_cache.load_hourly(out)['Voltage'].to_numpy().flags.writeable
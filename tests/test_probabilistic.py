@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from src import forecast, probabilistic
+from tests.conftest import FEATURES
+
+def test_pool_samples_from_the_forecast_hour():
+    times = pd.date_range('2009-01-01', periods=24 * 30, freq='h').values
+    residuals = pd.DatetimeIndex(times).hour.to_numpy().astype(float)   # residual == its hour
+    pool = probabilistic.ResidualPool(residuals, times)
+    assert pool.by_hour
+    future = pd.date_range('2009-03-01 05:00', periods=30, freq='h').values
+    draws = pool.sample(np.random.default_rng(0), future, 50)
+    assert draws.shape == (50, 30)
+    assert (draws == pd.DatetimeIndex(future).hour.to_numpy()[None, :]).all()
+    # too few residuals per hour: one global pool
+    assert not probabilistic.ResidualPool(residuals[:100], times[:100]).by_hour
+
+def test_lockstep_paths_match_single_runs(hourly_df, small_model):
+    fc = forecast.RecursiveForecaster(small_model, FEATURES)
+    pool = probabilistic.fit_residuals(small_model, FEATURES, hourly_df)
+    pf = probabilistic.ProbabilisticForecaster(fc, pool, n_paths=4, seed=1)
+    times, paths = pf.paths(hourly_df, 36)
+    noise = pool.sample(np.random.default_rng(1), times, 4)
+    for j in range(4):
+        _, single, _ = fc.advance(fc.init_state(hourly_df), 36, noise=noise[j:j + 1])
+        np.testing.assert_allclose(paths[j], single[0], rtol=1e-6)
+
+def test_bands(hourly_df, small_model):
+    fc = forecast.RecursiveForecaster(small_model, FEATURES)
+    zero = probabilistic.ResidualPool(np.zeros(10))
+    bands = probabilistic.ProbabilisticForecaster(fc, zero, n_paths=8).forecast(hourly_df, 24)
+    point = fc.forecast(hourly_df, 24)
+    for col in ('p10', 'p50', 'p90', 'mean'):
+        np.testing.assert_allclose(bands[col].values, point.values, rtol=1e-6)
+
+    pool = probabilistic.fit_residuals(small_model, FEATURES, hourly_df)
+    bands = probabilistic.ProbabilisticForecaster(fc, pool, n_paths=200).forecast(hourly_df, 48)
+    assert list(bands.columns) == ['p10', 'p50', 'p90', 'mean']
+    assert bands.index.equals(point.index.append(pd.date_range(point.index[-1], periods=25, freq='h')[1:]))
+    assert (bands['p10'] <= bands['p50']).all() and (bands['p50'] <= bands['p90']).all()
+    assert (bands['p90'] - bands['p10']).mean() > 0
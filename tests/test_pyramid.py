@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from src import pyramid
+from tests.conftest import make_hourly
+
+TARGET = 'Global_active_power'
+
+def test_levels_match_pandas_resample(tmp_path):
+    df = make_hourly(n_hours=24 * 40 + 5, start='2009-01-01 03:00', seed=2)
+    df.iloc[50:60, df.columns.get_loc(TARGET)] = np.nan
+    p = pyramid.HistoryPyramid(str(tmp_path / 'h.csv'))
+    assert p.sync(df, verbose=False) == 'built'
+    for name, rule in (('day', 'D'), ('week', 'W-MON')):
+        got = p.level_frame(name)
+        expected = df[TARGET].resample(rule, label='left', closed='left').agg(['mean', 'min', 'max', 'count'])
+        expected = expected[expected['count'] > 0]
+        assert got.index.equals(expected.index)
+        np.testing.assert_allclose(got[['mean', 'min', 'max']].to_numpy(), expected[['mean', 'min', 'max']].to_numpy())
+        assert (got['count'].to_numpy() == expected['count'].to_numpy()).all()
+
+def test_incremental_sync(tmp_path):
+    df = make_hourly(n_hours=24 * 30, seed=4)
+    path = str(tmp_path / 'h.csv')
+    p = pyramid.HistoryPyramid(path)
+    p.sync(df.iloc[:24 * 20 + 7], verbose=False)       # ends mid-day and mid-week
+    assert pyramid.HistoryPyramid(path).sync(df, verbose=False) == 'extended'
+    full = pyramid.HistoryPyramid(path, root=str(tmp_path / 'full'))
+    full.sync(df, verbose=False)
+    reloaded = pyramid.HistoryPyramid(path)
+    assert reloaded.sync(df, verbose=False) == 'current'
+    for name in pyramid.LEVELS:
+        pd.testing.assert_frame_equal(reloaded.level_frame(name), full.level_frame(name))
+    edited = df.copy()
+    edited.iloc[3, edited.columns.get_loc('Voltage')] += 1.0      # not charted
+    assert reloaded.sync(edited, verbose=False) == 'current'
+    edited.iloc[3, edited.columns.get_loc(TARGET)] += 1.0
+    assert reloaded.sync(edited, verbose=False) == 'built'
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 50.0
+    keep = pyramid.lttb(x, y, 200)
+    assert len(keep) == 200 and keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 4321 in keep
+    assert (pyramid.lttb(x[:50], y[:50], 200) == np.arange(50)).all()
+
+def test_view_stays_under_budget(tmp_path):
+    df = make_hourly(n_hours=24 * 400, seed=1)
+    p = pyramid.HistoryPyramid(str(tmp_path / 'h.csv'))
+    p.sync(df, verbose=False)
+    line, envelope, level = p.view(df.index[-100], None, budget=400)
+    assert level == 'hour' and envelope is None and len(line) == 100
+    for budget in (400, 1000, 4000):
+        line, envelope, level = p.view(budget=budget)
+        assert len(line) + 2 * len(envelope) <= budget
+        assert line.index[0] == df.index[0] and line.index[-1] == df.index[-1]
+        assert np.isclose(envelope['max'].max(), df[TARGET].max())
+    assert p.view(budget=4000)[2] == 'day'
+    assert p.view(budget=400)[2] == 'week'
+    assert p.view(budget=100)[2].endswith('weeks')
@@ -0,0 +1,48 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+import numpy as np
+import pytest
+from src import forecast, service
+from tests.conftest import FEATURES
+
+@pytest.fixture
+def running_service(hourly_df, small_model):
+    histories = {'a': hourly_df, 'b': hourly_df.iloc[:-50]}
+    svc = service.ForecastService(small_model, FEATURES, histories, window_ms=50)
+    server = service.make_server(svc, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield svc, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    svc.close()
+
+def get(url):
+    with urlopen(url, timeout=30) as resp:
+        return json.loads(resp.read())
+
+def test_concurrent_requests_are_batched(running_service, hourly_df, small_model):
+    svc, url = running_service
+    reqs = [('a', 24), ('b', 48), ('a', 12)] * 4
+    with ThreadPoolExecutor(max_workers=len(reqs)) as pool:
+        results = list(pool.map(lambda r: get(f"{url}/forecast?meter_id={r[0]}&horizon={r[1]}"), reqs))
+    expected = forecast.RecursiveForecaster(small_model, FEATURES).forecast(hourly_df, 24)
+    got = next(r for r, q in zip(results, reqs) if q == ('a', 24))
+    np.testing.assert_allclose(got['forecast'], expected.values)
+    assert [len(r['forecast']) for r in results] == [h for _, h in reqs]
+    metrics = get(f"{url}/metrics")
+    assert metrics['requests'] == len(reqs)
+    assert metrics['batches'] < len(reqs)
+    assert metrics['latency_ms']['p99'] >= metrics['latency_ms']['p50'] > 0
+
+def test_bad_requests(running_service):
+    _, url = running_service
+    from urllib.error import HTTPError
+    with pytest.raises(HTTPError) as e:
+        get(f"{url}/forecast?meter_id=nope")
+    assert e.value.code == 404
+    with pytest.raises(HTTPError) as e:
+        get(f"{url}/forecast?meter_id=a&horizon=0")
+    assert e.value.code == 400
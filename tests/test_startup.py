@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+from src import hourly_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_src_imports_do_not_load_heavy_dependencies():
+    code = ("import sys; import src.preprocess, src.features, src.models, src.utils, src.forecast, src.direct; "
+            "print(','.join(m for m in ('xgboost', 'matplotlib', 'sklearn') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT, check=True)
+    assert out.stdout.strip() == ''
+
+def test_file_stamp_changes_with_file(tmp_path):
+    path = tmp_path / 'x.json'
+    path.write_text('[1]')
+    first = hourly_cache.file_stamp(str(path))
+    path.write_text('[1, 2]')
+    os.utime(path, ns=(first[0] + 10**9, first[0] + 10**9))
+    assert hourly_cache.file_stamp(str(path)) != first
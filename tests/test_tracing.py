@@ -0,0 +1,51 @@
+import json
+import tracemalloc
+import numpy as np
+import pytest
+from src import features, tracing
+from tests.conftest import FEATURES
+
+@pytest.fixture
+def trace():
+    tracing.reset()
+    tracing.enable(True)
+    yield tracing
+    tracing.enable(False)
+    tracing.reset()
+
+def test_disabled_records_nothing(hourly_df):
+    tracing.reset()
+    tracing.enable(False)
+    features.build_features(hourly_df)
+    with tracing.span('x'):
+        pass
+    assert tracing.snapshot() == {}
+
+def test_stages_and_exports(trace, hourly_df, small_model):
+    df = features.build_features(hourly_df)
+    small_model.predict(df[FEATURES].values)
+    small_model.predict(df[FEATURES].values[:10])
+    snap = trace.snapshot()
+    assert snap['features.build_features']['calls'] == 1
+    assert snap['features.add_rollings']['calls'] == 1
+    assert snap['models.dmatrix']['calls'] == snap['models.booster_predict']['calls'] == 2
+    assert snap['models.booster_predict']['p99_ms'] >= snap['models.booster_predict']['p50_ms'] > 0
+    assert json.loads(trace.to_json())['stages'].keys() == snap.keys()
+    prom = trace.to_prometheus()
+    assert 'forecast_stage_calls_total{stage="models.dmatrix"} 2' in prom
+    assert 'forecast_stage_seconds{stage="features.build_features",quantile="0.99"}' in prom
+
+def test_memory_tracking(trace):
+    tracing.enable(True, memory=True)
+    with tracing.span('alloc'):
+        keep = np.ones(1_000_000)
+    assert tracing.snapshot()['alloc']['alloc_bytes'] >= keep.nbytes
+
+def test_leaves_foreign_tracemalloc_running(trace):
+    tracemalloc.start()
+    try:
+        tracing.enable(True, memory=True)
+        tracing.enable(True, memory=False)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,49 @@
+import json
+import numpy as np
+import pytest
+from src import forecast, models, train
+from tests.conftest import FEATURES, make_hourly
+
+def test_sample_params_and_folds():
+    trials = train.sample_params(5, seed=1)
+    assert len(trials) == 5 and len({json.dumps(t, sort_keys=True) for t in trials}) == 5
+    assert all(set(t) == set(train.SEARCH_SPACE) for t in trials)
+    folds, holdout_start = train.fold_bounds(1000, n_folds=3, holdout=0.1)
+    assert holdout_start == 900
+    assert folds == [(225, 450), (450, 675), (675, 900)]
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_pipeline_writes_model_features_and_report(tmp_path, n_workers):
+    df = make_hourly(n_hours=1500, seed=4)
+    paths = dict(model_path=str(tmp_path / 'model.json'), features_path=str(tmp_path / 'features_list.json'),
+                 report_path=str(tmp_path / 'report.json'), cache_dir=str(tmp_path / 'cache'))
+    booster, feature_list, report = train.train_pipeline(
+        df, features_list=FEATURES, n_trials=2, n_workers=n_workers, threads_per_worker=1,
+        max_rounds=40, early_stopping_rounds=5, verbose=False, **paths)
+    assert models.load_features_list(paths['features_path']) == FEATURES
+    model = models.load_model_xgb(paths['model_path'])
+    assert model.booster.num_features() == len(FEATURES)
+    assert model.booster.num_boosted_rounds() == report['n_trees'] <= 40
+    assert [t['rmse'] for t in report['trials']] == sorted(t['rmse'] for t in report['trials'])
+    assert np.isfinite(report['holdout_rmse'])
+    # the cached matrix is reused on the next run
+    assert len(list((tmp_path / 'cache').glob('*.buffer'))) == 1
+    train.train_pipeline(df, features_list=FEATURES, n_trials=1, n_workers=1, max_rounds=5, verbose=False, **paths)
+    assert len(list((tmp_path / 'cache').glob('*.buffer'))) == 1
+    # a different feature list replaces the old entry instead of adding one
+    train.train_pipeline(df, features_list=FEATURES[:-1], n_trials=1, n_workers=1, max_rounds=5, verbose=False,
+                         **paths)
+    assert len(list((tmp_path / 'cache').glob('*.buffer'))) == 1
+    assert len(list((tmp_path / 'cache').glob('*.json'))) == 1
+
+def test_saved_model_predicts_on_plain_arrays(tmp_path):
+    df = make_hourly(n_hours=1500, seed=5)
+    paths = dict(model_path=str(tmp_path / 'model.json'), features_path=str(tmp_path / 'features_list.json'),
+                 report_path=None, cache_dir=str(tmp_path / 'cache'))
+    train.train_pipeline(df, features_list=FEATURES, n_trials=1, n_workers=1, threads_per_worker=1,
+                         max_rounds=20, early_stopping_rounds=5, verbose=False, **paths)
+    model = models.load_model_xgb(paths['model_path'])
+    assert model.booster.feature_names is None
+    assert model.predict(np.zeros((3, len(FEATURES)))).shape == (3,)
+    fc = forecast.RecursiveForecaster(model, FEATURES).forecast(df, 24)
+    assert len(fc) == 24 and np.isfinite(fc.to_numpy()).all()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+from xgboost import XGBRegressor
+from src import forecast, models, tree_eval
+from src.tree_eval import CompiledTrees
+from tests.conftest import FEATURES
+
+@pytest.fixture(scope='module')
+def nan_booster():
+    """Deeper trees trained on data with missing values, so both default directions occur."""
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(3000, 8))
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + (X[:, 2] > 0)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    reg = XGBRegressor(n_estimators=60, max_depth=8, verbosity=0, base_score=0.3)
+    reg.fit(X, y)
+    return reg.get_booster(), X
+
+@pytest.mark.parametrize('n_rows', [1, 32, 700])
+def test_matches_booster_predict(nan_booster, n_rows):
+    booster, X = nan_booster
+    compiled = CompiledTrees(booster, chunk_rows=256)
+    expected = booster.predict(xgb.DMatrix(X[:n_rows]))
+    np.testing.assert_allclose(compiled.predict(X[:n_rows]), expected, rtol=1e-5, atol=1e-5)
+
+def test_backends_in_recursive_forecast(small_model, hourly_df, tmp_path):
+    path = str(tmp_path / 'model.json')
+    small_model.booster.save_model(path)
+    numpy_model = models.load_model_xgb(path, backend='numpy')
+    auto_model = models.load_model_xgb(path, backend='auto')
+    assert isinstance(numpy_model, CompiledTrees) and auto_model.max_rows is not None
+    expected = forecast.RecursiveForecaster(small_model, FEATURES).forecast(hourly_df, 48)
+    got = forecast.RecursiveForecaster(numpy_model, FEATURES).forecast(hourly_df, 48)
+    np.testing.assert_allclose(got.values, expected.values, rtol=1e-5)
+    with pytest.raises(ValueError):
+        models.load_model_xgb(path, backend='onnx')
+    with pytest.raises(ValueError):
+        numpy_model.predict(np.zeros((1, len(FEATURES) + 1)))
+
+def test_rejects_unsupported_objective():
+    rng = np.random.default_rng(0)
+    clf = xgb.train({'objective': 'binary:logistic'}, xgb.DMatrix(rng.random((50, 3)), label=rng.integers(0, 2, 50)), 3)
+    with pytest.raises(ValueError):
+        CompiledTrees(clf)
+
+def test_auto_falls_back_when_tables_exceed_budget(nan_booster, tmp_path, monkeypatch):
+    booster, X = nan_booster
+    path = str(tmp_path / 'model.json')
+    booster.save_model(path)
+    monkeypatch.setattr(tree_eval, 'MAX_TABLE_BYTES', 1024)
+    with pytest.raises(ValueError):
+        models.load_model_xgb(path, backend='numpy')
+    auto_model = models.load_model_xgb(path, backend='auto')
+    assert isinstance(auto_model, models.XGBWrapper)
+    np.testing.assert_allclose(auto_model.predict(X[:5]), booster.predict(xgb.DMatrix(X[:5])), rtol=1e-6)